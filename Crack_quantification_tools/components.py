@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+from typing import Dict, Optional
+from .roi import nonzero_bbox
+
+
+def label_components(mask: np.ndarray, connectivity: int = 8):
+    """One labeling pass: ``(count, labels, stats, centroids)`` from ``cv2.connectedComponentsWithStats``.
+
+    ``count`` includes the background label 0.
+    """
+    return cv2.connectedComponentsWithStats((mask > 0).astype(np.uint8), connectivity=connectivity, ltype=cv2.CV_32S)
+
+
+def _max_by_label(point_labels: np.ndarray, values: np.ndarray, n_labels: int) -> np.ndarray:
+    """Per-label maximum of ``values`` via one sort and ``np.maximum.reduceat``."""
+    result = np.zeros(n_labels, dtype=np.float64)
+    if len(point_labels) == 0:
+        return result
+    order = np.argsort(point_labels, kind="stable")
+    sorted_labels = point_labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+    result[sorted_labels[starts]] = np.maximum.reduceat(values[order], starts)
+    return result
+
+
+def component_table(
+    mask: np.ndarray,
+    skeleton_points: Optional[np.ndarray] = None,
+    point_widths: Optional[np.ndarray] = None,
+    connectivity: int = 8,
+    min_area: int = 1
+) -> Dict[str, np.ndarray]:
+    """Per-crack metrics in pixels as a columnar table (one array per column).
+
+    Every connected component of the mask is one crack. Area and bounding
+    box come from the labeling statistics; skeleton points are mapped to
+    their component through the label image and aggregated with
+    ``np.bincount`` (length) and a sorted ``reduceat`` (max width), so the
+    cost does not grow with the number of components.
+
+    Args:
+        mask: binary mask where the crack is non-zero.
+        skeleton_points: (N, 2) skeleton coordinates [x, y] of the whole mask.
+        point_widths: (N,) width at each skeleton point, aligned with
+            ``skeleton_points``; enables ``max_width_px``.
+        min_area: components smaller than this many pixels are dropped.
+
+    Returns:
+        columns ``crack_id``, ``area_px``, ``bbox_x``, ``bbox_y``, ``bbox_w``,
+        ``bbox_h``, ``centroid_x``, ``centroid_y`` and, given skeleton
+        points, ``length_px``, ``avg_width_px`` (area / length) and
+        ``max_width_px``.
+    """
+    # label only the bounding box of the crack pixels (a 1x1 background crop when empty)
+    y0, y1, x0, x1 = nonzero_bbox(mask) or (0, 1, 0, 1)
+    n_labels, labels, stats, centroids = label_components(mask[y0:y1, x0:x1], connectivity)
+    table = {
+        "crack_id": np.arange(n_labels, dtype=np.int32),
+        "area_px": stats[:, cv2.CC_STAT_AREA].astype(np.int64),
+        "bbox_x": stats[:, cv2.CC_STAT_LEFT] + x0,
+        "bbox_y": stats[:, cv2.CC_STAT_TOP] + y0,
+        "bbox_w": stats[:, cv2.CC_STAT_WIDTH],
+        "bbox_h": stats[:, cv2.CC_STAT_HEIGHT],
+        "centroid_x": np.round(centroids[:, 0] + x0, 2),
+        "centroid_y": np.round(centroids[:, 1] + y0, 2),
+    }
+
+    if skeleton_points is not None:
+        pts = np.asarray(skeleton_points)
+        point_labels = labels[pts[:, 1] - y0, pts[:, 0] - x0] if len(pts) else np.zeros(0, dtype=np.int32)
+        length = np.bincount(point_labels, minlength=n_labels)
+        area = table["area_px"].astype(np.float64)
+        avg_width = np.divide(area, length, out=np.zeros_like(area), where=length > 0)
+        table["length_px"] = length
+        table["avg_width_px"] = np.round(avg_width, 2)
+        if point_widths is not None:
+            widths = np.asarray(point_widths, dtype=np.float64)
+            table["max_width_px"] = np.round(_max_by_label(point_labels, widths, n_labels), 2)
+
+    # drop the background row and fragments below min_area
+    keep = table["area_px"] >= max(min_area, 1)
+    keep[0] = False
+    return {name: column[keep] for name, column in table.items()}
@@ -0,0 +1,239 @@
+import cv2
+import hashlib
+import numpy as np
+from functools import cached_property
+from typing import Dict, Optional, Tuple
+from scipy.spatial import cKDTree
+
+from .binarize import binarize
+from .skeleton import extract_skeleton, estimate_normals
+from .width_profile import normal_width_profile, width_profile_summary
+from .components import component_table
+from .roi import RoiLayout, roi_layout
+from .thinning import DEFAULT_BACKEND as DEFAULT_THINNING_BACKEND
+from .width_max import extract_contour_points, max_width_from_points
+from tools.mask_format import is_compact_mask, load_mask
+from tools.render import draw_points, draw_vectors, render_layers, to_bgr
+
+# bump whenever a change to skeletonization, contours or width pairing would
+# change cached artifacts
+ALGORITHM_VERSION = "3"
+
+
+class CrackGeometry:
+    """Shared analysis state for one crack mask.
+
+    The skeleton, contours and KD-tree are computed lazily on first access
+    and reused by every metric and overlay, so a full quantification pays
+    for skeletonization only once.
+
+    Args:
+        mask: binary mask where the crack is non-zero.
+        image: optional original image (BGR or grayscale) used as the
+            background for overlays; defaults to the mask itself.
+        thinning_backend: skeletonization backend, see ``thinning.BACKENDS``.
+    """
+
+    def __init__(self, mask: np.ndarray, image: Optional[np.ndarray] = None, thinning_backend: Optional[str] = None):
+        self.mask = (mask > 0).astype(np.uint8)
+        self.image = image
+        self.thinning_backend = thinning_backend or DEFAULT_THINNING_BACKEND
+
+    @classmethod
+    def from_image(cls, image: np.ndarray, threshold: int = 127) -> "CrackGeometry":
+        """Binarize a mask image (color or grayscale) and wrap it."""
+        return cls(binarize(image, threshold), image=image)
+
+    @classmethod
+    def from_path(cls, mask_path: str, threshold: int = 127) -> "CrackGeometry":
+        """Read a mask file (image or compact ``tools.mask_format`` file) from disk and wrap it."""
+        if is_compact_mask(mask_path):
+            return cls(load_mask(mask_path))
+        image = cv2.imread(mask_path)
+        if image is None:
+            raise ValueError(f"Invalid image format: {mask_path}")
+        return cls.from_image(image, threshold)
+
+    # === content-addressed caching ===
+
+    @cached_property
+    def cache_key(self) -> str:
+        """Hash of the binary mask content, thinning backend and ``ALGORITHM_VERSION``."""
+        h = hashlib.sha256(
+            f"crack-geometry:{ALGORITHM_VERSION}:{self.thinning_backend}:{self.mask.shape}".encode("utf-8")
+        )
+        h.update(np.packbits(self.mask).tobytes())
+        return h.hexdigest()
+
+    def to_artifacts(self) -> Dict[str, np.ndarray]:
+        """Intermediate results computed so far, as plain arrays."""
+        state = self.__dict__
+        artifacts = {}
+        if "_skeleton" in state:
+            artifacts["skeleton_points"] = self.skeleton_points
+        if "normals" in state:
+            artifacts["normals"] = self.normals
+        if "normal_widths_px" in state:
+            artifacts["normal_widths"] = self.normal_widths_px
+        if "contour_points" in state:
+            artifacts["contour_points"] = self.contour_points
+        if "area_px" in state:
+            artifacts["area"] = np.asarray(self.area_px)
+        if "_max_width" in state:
+            max_width, pair, widths = self._max_width
+            artifacts["max_width"] = np.asarray(max_width)
+            artifacts["max_width_pair"] = np.empty((0, 2)) if pair is None else np.stack(pair)
+            artifacts["point_widths"] = widths
+        return artifacts
+
+    def load_artifacts(self, artifacts: Dict[str, np.ndarray]):
+        """Seed the lazy state from ``to_artifacts`` output of an identical mask."""
+        if "skeleton_points" in artifacts:
+            points = artifacts["skeleton_points"]
+            skeleton_mask = np.zeros_like(self.mask)
+            skeleton_mask[points[:, 1], points[:, 0]] = 1
+            self.__dict__["_skeleton"] = (skeleton_mask, points)
+        if "normals" in artifacts:
+            self.__dict__["normals"] = artifacts["normals"]
+        if "normal_widths" in artifacts:
+            self.__dict__["normal_widths_px"] = artifacts["normal_widths"]
+        if "contour_points" in artifacts:
+            self.__dict__["contour_points"] = artifacts["contour_points"]
+        if "area" in artifacts:
+            self.__dict__["area_px"] = int(artifacts["area"])
+        if "max_width" in artifacts:
+            pair = artifacts["max_width_pair"]
+            self.__dict__["_max_width"] = (
+                float(artifacts["max_width"]),
+                (pair[0], pair[1]) if len(pair) else None,
+                artifacts["point_widths"],
+            )
+
+    # === shared intermediate state ===
+
+    @cached_property
+    def roi(self) -> Optional[RoiLayout]:
+        """Padded crops of the crack pixels shared by skeleton and contour extraction."""
+        return roi_layout(self.mask)
+
+    @cached_property
+    def _skeleton(self) -> Tuple[np.ndarray, np.ndarray]:
+        return extract_skeleton(self.mask, self.roi, self.thinning_backend)
+
+    @property
+    def skeleton_mask(self) -> np.ndarray:
+        return self._skeleton[0]
+
+    @property
+    def skeleton_points(self) -> np.ndarray:
+        """(N, 2) skeleton coordinates [x, y]."""
+        return self._skeleton[1]
+
+    @cached_property
+    def normals(self) -> np.ndarray:
+        """(N, 2) unit normals from local PCA, aligned with ``skeleton_points``."""
+        return estimate_normals(self.skeleton_mask, self.skeleton_points)
+
+    @cached_property
+    def contour_points(self) -> np.ndarray:
+        """(M, 2) external contour coordinates [x, y]."""
+        return extract_contour_points(self.mask, self.roi)
+
+    @cached_property
+    def contour_tree(self) -> Optional[cKDTree]:
+        if len(self.contour_points) == 0:
+            return None
+        return cKDTree(self.contour_points)
+
+    @cached_property
+    def _max_width(self) -> Tuple[float, Optional[Tuple[np.ndarray, np.ndarray]], np.ndarray]:
+        return max_width_from_points(self.skeleton_points, self.contour_points, self.contour_tree)
+
+    # === metrics (pixel units) ===
+
+    @cached_property
+    def area_px(self) -> int:
+        return int(np.sum(self.mask))
+
+    @property
+    def length_px(self) -> int:
+        return len(self.skeleton_points)
+
+    @property
+    def max_width_px(self) -> float:
+        return round(self._max_width[0], 2)
+
+    @property
+    def max_width_endpoints(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Contour endpoints ``(p1, p2)`` of the widest chord, or ``None``."""
+        return self._max_width[1]
+
+    @property
+    def point_widths_px(self) -> np.ndarray:
+        """(N,) width at each skeleton point, aligned with ``skeleton_points``."""
+        return self._max_width[2]
+
+    @cached_property
+    def normal_widths_px(self) -> np.ndarray:
+        """(N,) width measured along the normal at each skeleton point."""
+        return normal_width_profile(self.mask, self.skeleton_points, self.normals)
+
+    def width_profile(self, percentiles=(10, 50, 90, 95)) -> Dict[str, float]:
+        """Percentiles of ``normal_widths_px`` and the dominant orientation, in pixels / degrees."""
+        return width_profile_summary(self.normal_widths_px, self.normals, percentiles)
+
+    def component_table(self, connectivity: int = 8, min_area: int = 1) -> Dict[str, np.ndarray]:
+        """Per-crack (connected component) metrics in pixels, see ``components.component_table``."""
+        return component_table(self.mask, self.skeleton_points, self.point_widths_px, connectivity, min_area)
+
+    @property
+    def avg_width_px(self) -> float:
+        if self.length_px == 0:
+            return 0.0
+        return round(self.area_px / self.length_px, 2)
+
+    def metrics_px(self) -> Dict[str, float]:
+        """All pixel-space metrics keyed by their short alias."""
+        return {
+            "length": self.length_px,
+            "area": self.area_px,
+            "max_width": self.max_width_px,
+            "avg_width": self.avg_width_px,
+        }
+
+    # === overlays ===
+
+    def base_image(self) -> np.ndarray:
+        """Return a BGR copy of the overlay background."""
+        if self.image is None:
+            return cv2.cvtColor(self.mask * 255, cv2.COLOR_GRAY2BGR)
+        return to_bgr(self.image)
+
+    def skeleton_overlay(self, base: Optional[np.ndarray] = None) -> np.ndarray:
+        """Skeleton points drawn in red."""
+        overlay = self.base_image() if base is None else base
+        return draw_points(overlay, self.skeleton_points, (0, 0, 255), radius=1)
+
+    def normals_overlay(self, scale: float = 10, step: int = 1, base: Optional[np.ndarray] = None) -> np.ndarray:
+        """Normal vectors drawn as green arrows from every ``step``-th skeleton point."""
+        overlay = self.base_image() if base is None else base
+        return draw_vectors(overlay, self.skeleton_points, self.normals, scale, (0, 255, 0), step=step, tip_length=0.3)
+
+    def max_width_overlay(self, base: Optional[np.ndarray] = None) -> np.ndarray:
+        """Widest chord drawn as a red line with green endpoints."""
+        vis = self.base_image() if base is None else base
+        if self.max_width_endpoints is not None:
+            p1, p2 = self.max_width_endpoints
+            p1, p2 = (int(p1[0]), int(p1[1])), (int(p2[0]), int(p2[1]))
+            cv2.line(vis, p1, p2, (0, 0, 255), 2)  # red line
+            cv2.circle(vis, p1, 3, (0, 255, 0), -1)
+            cv2.circle(vis, p2, 3, (0, 255, 0), -1)
+        return vis
+
+    def overlays(self, kinds) -> Dict[str, np.ndarray]:
+        """Render several overlays (``skeleton``, ``normals``, ``max_width``) from one base image."""
+        draw = {"skeleton": self.skeleton_overlay, "normals": self.normals_overlay, "max_width": self.max_width_overlay}
+        unknown = set(kinds) - set(draw)
+        if unknown:
+            raise ValueError(f"Unknown overlay types: {sorted(unknown)}")
+        return render_layers(self.base_image(), {kind: lambda img, fn=draw[kind]: fn(base=img) for kind in kinds})
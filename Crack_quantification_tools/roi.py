@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+from typing import NamedTuple, Optional, Tuple
+
+# zero border kept around every crop; one pixel keeps separate components
+# out of each other's 8-neighbourhood, so thinning and contours are unchanged
+ROI_PAD = 1
+# pack components separately when their boxes cover less than this fraction
+# of the global bounding box
+PACK_RATIO = 0.5
+
+
+class RoiLayout(NamedTuple):
+    """Where the crack pixels of a mask were copied for processing.
+
+    ``canvas`` is a small 0/1 image holding either the padded global
+    bounding box or every component's padded box packed side by side.
+    ``region_ids`` maps canvas pixels to the crop they belong to (``None``
+    for a single crop) and ``offsets[i]`` is the [dx, dy] from canvas to
+    image coordinates for crop ``i``.
+    """
+    canvas: np.ndarray
+    region_ids: Optional[np.ndarray]
+    offsets: np.ndarray
+    image_shape: Tuple[int, int]
+
+
+def nonzero_bbox(mask: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """``(y0, y1, x0, x1)`` half-open bounds of the non-zero pixels, or ``None``."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if len(rows) == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1
+
+
+def _shelf_pack(heights: np.ndarray, widths: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int, int]:
+    """Top-left corners for boxes placed row by row, tallest first."""
+    order = np.argsort(-heights, kind="stable")
+    canvas_w = int(max(widths.max(), np.sqrt(np.sum(heights * widths.astype(np.int64))) * 1.25))
+    ys, xs = np.zeros(len(heights), dtype=np.int64), np.zeros(len(heights), dtype=np.int64)
+    x = y = shelf_h = 0
+    for i in order:
+        if x + widths[i] > canvas_w:
+            y, x, shelf_h = y + shelf_h, 0, 0
+        ys[i], xs[i] = y, x
+        x += widths[i]
+        shelf_h = max(shelf_h, heights[i])
+    return ys, xs, int(y + shelf_h), canvas_w
+
+
+def roi_layout(mask: np.ndarray, pad: int = ROI_PAD, pack_ratio: float = PACK_RATIO) -> Optional[RoiLayout]:
+    """Copy the crack pixels of ``mask`` into a compact canvas; ``None`` if the mask is empty.
+
+    The padded global bounding box is used unless the components' own boxes
+    cover less than ``pack_ratio`` of it (cracks scattered over the image),
+    in which case each component is copied into its own padded slot.
+    """
+    fg = mask > 0
+    bbox = nonzero_bbox(fg)
+    if bbox is None:
+        return None
+    y0, y1, x0, x1 = bbox
+
+    if pack_ratio > 0:
+        n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
+            np.ascontiguousarray(fg[y0:y1, x0:x1]).view(np.uint8), connectivity=8, ltype=cv2.CV_32S
+        )
+        boxes = stats[1:]
+        box_area = int(np.sum(boxes[:, cv2.CC_STAT_WIDTH].astype(np.int64) * boxes[:, cv2.CC_STAT_HEIGHT]))
+        if n_labels > 2 and box_area < pack_ratio * (y1 - y0) * (x1 - x0):
+            return _packed_layout(labels, boxes, (y0, x0), pad, fg.shape)
+
+    canvas = np.zeros((y1 - y0 + 2 * pad, x1 - x0 + 2 * pad), dtype=np.uint8)
+    canvas[pad:-pad or None, pad:-pad or None] = fg[y0:y1, x0:x1]
+    return RoiLayout(canvas, None, np.array([[x0 - pad, y0 - pad]]), fg.shape)
+
+
+def _packed_layout(labels: np.ndarray, boxes: np.ndarray, origin: Tuple[int, int], pad: int, image_shape) -> RoiLayout:
+    lefts, tops = boxes[:, cv2.CC_STAT_LEFT], boxes[:, cv2.CC_STAT_TOP]
+    widths, heights = boxes[:, cv2.CC_STAT_WIDTH], boxes[:, cv2.CC_STAT_HEIGHT]
+    dst_y, dst_x, canvas_h, canvas_w = _shelf_pack(heights + 2 * pad, widths + 2 * pad)
+
+    canvas = np.zeros((canvas_h, canvas_w), dtype=np.uint8)
+    region_ids = np.full((canvas_h, canvas_w), -1, dtype=np.int32)
+    for i in range(len(boxes)):
+        top, left, h, w = tops[i], lefts[i], heights[i], widths[i]
+        cy, cx = dst_y[i] + pad, dst_x[i] + pad
+        # only this component's pixels: others may overlap its bounding box
+        canvas[cy:cy + h, cx:cx + w] = labels[top:top + h, left:left + w] == i + 1
+        region_ids[cy:cy + h, cx:cx + w] = i
+
+    offsets = np.stack([origin[1] + lefts - dst_x - pad, origin[0] + tops - dst_y - pad], axis=1)
+    return RoiLayout(canvas, region_ids, offsets, image_shape)
+
+
+def to_image_coords(layout: RoiLayout, points: np.ndarray) -> np.ndarray:
+    """Map (N, 2) canvas coordinates [x, y] back to image coordinates."""
+    points = np.asarray(points).reshape(-1, 2)
+    if layout.region_ids is None:
+        return points + layout.offsets[0]
+    return points + layout.offsets[layout.region_ids[points[:, 1], points[:, 0]]]
@@ -1,39 +1,106 @@
 import numpy as np
-from skimage.morphology import skeletonize
-from skimage.measure import label, regionprops
-from sklearn.neighbors import KDTree
-from typing import Tuple
-from skimage.morphology import thin, remove_small_objects
+from typing import Optional, Tuple
+from .roi import RoiLayout, roi_layout, to_image_coords
+from .thinning import skeletonize_mask
 
+# neighbourhood radius (pixels) for the local PCA behind the skeleton normals
+NORMAL_WINDOW_RADIUS = 5
 
-def extract_skeleton_and_normals(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-    """Extract the skeleton of a crack mask and return placeholder normals.
 
-    This simplified routine follows the provided script and performs
-    ``thin`` and ``remove_small_objects`` cleanup.
+def extract_skeleton(
+    mask: np.ndarray,
+    layout: Optional[RoiLayout] = None,
+    backend: Optional[str] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Extract the skeleton of a crack mask.
+
+    The mask is thinned by one ``thinning`` backend call. Only
+    the padded crops from ``roi_layout`` are processed, so the cost follows
+    the crack area rather than the image size.
 
     Args:
         mask: Binary mask where the crack is 1 and background is 0.
+        layout: precomputed ``roi_layout(mask)`` to reuse.
+        backend: thinning backend name (defaults to ``CRACK_THINNING_BACKEND``).
 
     Returns:
         skeleton_mask: binary skeleton image (0/1).
         skeleton_points: (N, 2) array of skeleton coordinates [x, y].
-        normals: zeros placeholder kept for API compatibility.
     """
-    # Step 1: extract the skeleton
-    skeleton = skeletonize(mask > 0)
-
-    # Step 2: optional refinement using ``thin``
-    skeleton = thin(skeleton)
+    layout = layout or roi_layout(mask)
+    skeleton_mask = np.zeros(mask.shape[:2], dtype=np.uint8)
+    if layout is None:
+        return skeleton_mask, np.empty((0, 2), dtype=np.int64)
 
-    # Step 3: remove small artifacts
-    skeleton = remove_small_objects(skeleton, min_size=1)
+    # Step 1: thin the cropped crack pixels to a one-pixel-wide skeleton
+    skeleton = skeletonize_mask(layout.canvas, backend)
 
-    # Step 4: obtain skeleton points
+    # Step 2: obtain skeleton points in image coordinates, in row-major order
     ys, xs = np.where(skeleton > 0)
-    skeleton_points = np.stack([xs, ys], axis=1)
+    skeleton_points = to_image_coords(layout, np.stack([xs, ys], axis=1))
+    if layout.region_ids is not None:
+        skeleton_points = skeleton_points[np.lexsort((skeleton_points[:, 0], skeleton_points[:, 1]))]
+    skeleton_mask[skeleton_points[:, 1], skeleton_points[:, 0]] = 1
+    return skeleton_mask, skeleton_points
+
+
+def estimate_normals(
+    skeleton_mask: np.ndarray,
+    skeleton_points: np.ndarray,
+    radius: int = NORMAL_WINDOW_RADIUS,
+    chunk_size: int = 16384
+) -> np.ndarray:
+    """Unit normals of the skeleton at every point from local PCA.
+
+    The (2r+1)^2 neighbourhood of every point is gathered with one flat
+    fancy index per chunk of points, and the second moments of the skeleton
+    pixels it contains come from one matrix product. The tangent is the
+    principal axis of that covariance; the normal is perpendicular to it.
+
+    Returns:
+        normals: (N, 2) float32 unit vectors [nx, ny]; (0, 1) where the
+        neighbourhood has no direction (isolated points).
+    """
+    n_points = len(skeleton_points)
+    normals = np.zeros((n_points, 2), dtype=np.float32)
+    if n_points == 0:
+        return normals
+
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    dx, dy = dx.ravel(), dy.ravel()
+    # columns: count, sum dx, sum dy, sum dx^2, sum dy^2, sum dx*dy
+    moments_kernel = np.stack([np.ones_like(dx), dx, dy, dx * dx, dy * dy, dx * dy], axis=1).astype(np.float32)
 
-    # Step 5: return values
-    skeleton_mask = skeleton.astype(np.uint8)
-    normals = np.zeros_like(skeleton_points, dtype=np.float32)
-    return skeleton_mask, skeleton_points, normals
+    # flat offsets into the padded bounding box of the points, so no window needs bounds checks
+    x0, y0 = skeleton_points.min(axis=0)
+    x1, y1 = skeleton_points.max(axis=0) + 1
+    padded = np.pad(skeleton_mask[y0:y1, x0:x1] > 0, radius).view(np.uint8).ravel()
+    row = (x1 - x0) + 2 * radius
+    offsets = dy * row + dx
+    centers = (skeleton_points[:, 1].astype(np.intp) - y0 + radius) * row + skeleton_points[:, 0] - x0 + radius
+
+    for start in range(0, n_points, chunk_size):
+        sl = slice(start, start + chunk_size)
+        m = padded[centers[sl, None] + offsets].astype(np.float32) @ moments_kernel
+        count = np.maximum(m[:, 0], 1)
+        mean_x, mean_y = m[:, 1] / count, m[:, 2] / count
+        cov_xx = m[:, 3] / count - mean_x ** 2
+        cov_yy = m[:, 4] / count - mean_y ** 2
+        cov_xy = m[:, 5] / count - mean_x * mean_y
+        # principal axis angle of the 2x2 covariance
+        tangent = 0.5 * np.arctan2(2 * cov_xy, cov_xx - cov_yy)
+        normals[sl, 0] = -np.sin(tangent)
+        normals[sl, 1] = np.cos(tangent)
+    return normals
+
+
+def extract_skeleton_and_normals(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Extract the skeleton of a crack mask together with its normals.
+
+    Returns:
+        skeleton_mask: binary skeleton image (0/1).
+        skeleton_points: (N, 2) array of skeleton coordinates [x, y].
+        normals: (N, 2) unit normal vectors, see ``estimate_normals``.
+    """
+    skeleton_mask, skeleton_points = extract_skeleton(mask)
+    return skeleton_mask, skeleton_points, estimate_normals(skeleton_mask, skeleton_points)
@@ -1,10 +1,10 @@
 import numpy as np
-from .skeleton import extract_skeleton_and_normals
+from .skeleton import extract_skeleton
 
 def compute_average_width_px(mask: np.ndarray) -> float:
     """Compute the average crack width in pixels as area divided by length."""
     area = np.sum(mask)
-    _, skeleton_points, _ = extract_skeleton_and_normals(mask)
+    _, skeleton_points = extract_skeleton(mask)
 
     length = len(skeleton_points)
     if length == 0:
@@ -1,32 +1,98 @@
 import numpy as np
 import cv2
 from scipy.spatial import cKDTree
-from .skeleton import extract_skeleton_and_normals
+from typing import Optional, Tuple
+from .skeleton import extract_skeleton
+from .roi import RoiLayout, roi_layout, to_image_coords
 
-def compute_max_width_px(mask: np.ndarray) -> float:
-    """Compute the maximum crack width in pixels.
 
-    The method pairs skeleton points to contour points and takes the
-    largest distance between paired boundaries.
-    """
-    _, skeleton_points, _ = extract_skeleton_and_normals(mask)
-    if len(skeleton_points) == 0:
-        return 0.0
+def extract_contour_points(mask: np.ndarray, layout: Optional[RoiLayout] = None) -> np.ndarray:
+    """Return all external contour points of a 0/1 mask as an (N, 2) [x, y] array.
 
-    # extract contour points
-    contours, _ = cv2.findContours((mask * 255).astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    Contours are traced on the padded crops of ``roi_layout`` and mapped
+    back to image coordinates.
+    """
+    layout = layout or roi_layout(mask)
+    if layout is None:
+        return np.empty((0, 2), dtype=np.int32)
+    contours, _ = cv2.findContours(layout.canvas, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
     if not contours:
-        return 0.0
+        return np.empty((0, 2), dtype=np.int32)
+    points = to_image_coords(layout, np.vstack(contours).reshape(-1, 2))
+    if layout.region_ids is not None:
+        # restore the full-image order (start points in reverse raster order),
+        # which decides ties in the nearest-contour pairing
+        bounds = np.cumsum([0] + [len(c) for c in contours])
+        starts = points[bounds[:-1]]
+        order = np.lexsort((-starts[:, 0], -starts[:, 1]))
+        points = np.vstack([points[bounds[i]:bounds[i + 1]] for i in order])
+    return points.astype(np.int32)
+
+
+def skeleton_point_widths(
+    skeleton_points: np.ndarray,
+    contour_pts: np.ndarray,
+    tree: Optional[cKDTree] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Width at every skeleton point from one bulk KD-tree query.
+
+    Each skeleton point is paired with its two nearest contour points; the
+    width is the distance between that pair.
+
+    Returns:
+        widths: (N,) float array of per-point widths in pixels.
+        pair_idxs: (N, 2) indices into ``contour_pts`` of each pair.
+    """
+    if len(skeleton_points) == 0 or len(contour_pts) < 2:
+        return np.zeros(len(skeleton_points), dtype=np.float64), np.zeros((len(skeleton_points), 2), dtype=np.intp)
+
+    if tree is None:
+        tree = cKDTree(contour_pts)
+
+    _, idxs = tree.query(skeleton_points, k=2, workers=-1)
+    diff = contour_pts[idxs[:, 0]].astype(np.float64) - contour_pts[idxs[:, 1]]
+    widths = np.hypot(diff[:, 0], diff[:, 1])
+    return widths, idxs
 
-    contour_pts = np.vstack([c.reshape(-1, 2) for c in contours])
-    tree = cKDTree(contour_pts)
 
-    max_dist = 0.0
-    for pt in skeleton_points:
-        dists, idxs = tree.query(pt, k=2)
-        if len(idxs) == 2:
-            p1, p2 = contour_pts[idxs[0]], contour_pts[idxs[1]]
-            dist = np.linalg.norm(p1 - p2)
-            max_dist = max(max_dist, dist)
+def max_width_from_points(
+    skeleton_points: np.ndarray,
+    contour_pts: np.ndarray,
+    tree: Optional[cKDTree] = None
+) -> Tuple[float, Optional[Tuple[np.ndarray, np.ndarray]], np.ndarray]:
+    """Largest skeleton-paired contour distance.
 
-    return round(max_dist, 2)
+    Returns:
+        max_width: widest chord in pixels (0.0 when no pair exists).
+        endpoints: contour points ``(p1, p2)`` of the widest chord, or ``None``.
+        widths: (N,) per-skeleton-point widths, see ``skeleton_point_widths``.
+    """
+    widths, idxs = skeleton_point_widths(skeleton_points, contour_pts, tree)
+    if len(widths) == 0:
+        return 0.0, None, widths
+
+    best = int(np.argmax(widths))
+    max_dist = float(widths[best])
+    if max_dist <= 0:
+        return 0.0, None, widths
+
+    best_pair = (contour_pts[idxs[best, 0]], contour_pts[idxs[best, 1]])
+    return max_dist, best_pair, widths
+
+
+def compute_max_width_details(mask: np.ndarray) -> Tuple[float, Optional[Tuple[np.ndarray, np.ndarray]], np.ndarray]:
+    """Maximum width, widest-chord endpoints and per-skeleton-point widths in pixels."""
+    _, skeleton_points = extract_skeleton(mask)
+    contour_pts = extract_contour_points(mask)
+    max_dist, best_pair, widths = max_width_from_points(skeleton_points, contour_pts)
+    return round(max_dist, 2), best_pair, widths
+
+
+def compute_max_width_px(mask: np.ndarray) -> float:
+    """Compute the maximum crack width in pixels.
+
+    The method pairs skeleton points to contour points and takes the
+    largest distance between paired boundaries.
+    """
+    max_width, _, _ = compute_max_width_details(mask)
+    return max_width
@@ -1,15 +1,39 @@
+import importlib
 
+from MCP.tool import tool
 
-
-from MCP.segment import segment_crack_image
-from MCP.quantify import quantify_crack_geometry
-from MCP.rag_answer import rag_answer
+# public names -> defining module; imported on first attribute access so that
+# ``import MCP`` does not pull in torch, openai or faiss
+_LAZY_EXPORTS = {
+    "segment_crack_image": "MCP.segment",
+    "segment_crack_images": "MCP.segment",
+    "quantify_crack_geometry": "MCP.quantify",
+    "segment_and_quantify": "MCP.pipeline",
+    "compare_results_csv": "MCP.compare",
+    "plot_comparison_graphs": "MCP.plot",
+    "rag_answer": "MCP.rag_answer",
+}
 
 __all__ = [
     "segment_crack_image",
+    "segment_crack_images",
     "quantify_crack_geometry",
+    "segment_and_quantify",
     "compare_results_csv",
     "plot_comparison_graphs",
     "tool",
     "rag_answer"
 ]
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'MCP' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,257 @@
+"""Streaming batch quantification over a directory or manifest of masks.
+
+Mask paths are streamed lazily and fanned out over a process pool with a
+bounded number of tasks in flight. Rows are committed to the results store
+every ``chunk_size`` images, so an interrupted run resumes by skipping the
+images already stored with the requested metrics and pixel size; the CSV is
+exported once at the end. Rows are named by the mask path relative to the
+source directory (or manifest) without extension, so ``a/x.png`` and
+``b/x.png`` get separate rows. A failing mask, a duplicate name or a worker
+process that dies is logged to ``error_log`` and does not stop the run.
+
+    python -m MCP.batch_quantify outputs/masks --pixel-size 0.1
+    python -m MCP.batch_quantify masks.jsonl --workers 8 --metrics max_width length
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, Optional, Tuple
+
+from tools.mask_format import MASK_SUFFIXES as COMPACT_MASK_SUFFIXES
+from tools.results_store import get_results_store, reset_results_stores, PREDICTED_METRICS_CSV
+
+# images plus the compact .bmask / .rle files of tools.mask_format
+MASK_SUFFIXES = tuple(sorted({".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", *COMPACT_MASK_SUFFIXES}))
+DEFAULT_ERROR_LOG = os.path.join("outputs", "csv", "batch_quantify_errors.jsonl")
+# stored with every row so resume can tell whether it was measured at this scale
+PIXEL_SIZE_COLUMN = "Pixel Size (mm)"
+
+
+def iter_masks(source: str, pixel_size_mm: float, recursive: bool = True) -> Iterator[Tuple[str, float]]:
+    """Yield ``(mask_path, pixel_size_mm)`` from a directory or a manifest file.
+
+    A manifest holds one mask path per line, or one JSON object per line with
+    ``mask_path`` and an optional per-image ``pixel_size_mm``.
+    """
+    if os.path.isdir(source):
+        stack = [source]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    if entry.is_dir():
+                        if recursive:
+                            stack.append(entry.path)
+                    elif entry.name.lower().endswith(MASK_SUFFIXES):
+                        yield entry.path, pixel_size_mm
+        return
+
+    base_dir = os.path.dirname(source)
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+                path, size = item["mask_path"], item.get("pixel_size_mm", pixel_size_mm)
+            else:
+                path, size = line, pixel_size_mm
+            yield (path if os.path.isabs(path) else os.path.join(base_dir, path)), size
+
+
+def mask_key(mask_path: str, root: str) -> str:
+    """Row name of a mask: its path relative to ``root`` without extension, e.g. ``x`` or ``b/x``."""
+    return os.path.splitext(os.path.relpath(mask_path, root or "."))[0].replace(os.sep, "/")
+
+
+def _init_worker():
+    # workers never write the store; drop any connections inherited by fork
+    reset_results_stores()
+
+
+def quantify_mask(mask_path: str, pixel_size_mm: float, metrics: Optional[list] = None, use_cache: bool = True) -> Dict:
+    """Worker entry point: metrics for one mask, or the error that stopped it."""
+    try:
+        from MCP.quantify import read_mask_file, load_geometry, store_geometry, select_metrics, compute_metrics
+
+        img_raw, binary = read_mask_file(mask_path)
+        geometry, cached_keys = load_geometry(img_raw, use_cache, binary)
+        values = compute_metrics(geometry, pixel_size_mm, select_metrics(metrics))
+        store_geometry(geometry, cached_keys)
+        return {"mask_path": mask_path, "values": values, "error": None}
+    except Exception as e:
+        return {"mask_path": mask_path, "values": None, "error": f"{e}\n{traceback.format_exc()}"}
+
+
+def batch_quantify(
+    source: str,
+    pixel_size_mm: float,
+    metrics: Optional[list] = None,
+    csv_path: str = PREDICTED_METRICS_CSV,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    chunk_size: int = 256,
+    resume: bool = True,
+    use_cache: bool = True,
+    error_log: Optional[str] = DEFAULT_ERROR_LOG,
+    progress_every: int = 100
+) -> Dict:
+    """Quantify every mask from ``source`` into the results store behind ``csv_path``.
+
+    Args:
+        source: directory of masks or a manifest file, see ``iter_masks``.
+        workers: process count (defaults to the CPU count).
+        max_in_flight: submitted-but-unfinished tasks (defaults to 4 per worker).
+        chunk_size: rows buffered before they are committed to SQLite.
+        resume: skip images whose stored row already has every selected
+            metric at the same pixel size.
+
+    Returns:
+        counters ``{"done", "failed", "skipped", "duplicates", "seconds"}``.
+    """
+    from MCP.quantify import select_metrics
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+    store = get_results_store(csv_path)
+    root = source if os.path.isdir(source) else os.path.dirname(source)
+    columns = select_metrics(metrics)
+    stats = {"done": 0, "failed": 0, "skipped": 0, "duplicates": 0}
+    started = time.perf_counter()
+
+    if error_log and os.path.dirname(error_log):
+        os.makedirs(os.path.dirname(error_log), exist_ok=True)
+    error_file = open(error_log, "a", encoding="utf-8") if error_log else None
+
+    def report():
+        elapsed = time.perf_counter() - started
+        rate = stats["done"] / elapsed if elapsed else 0.0
+        print(f"📊 {stats['done']} done, {stats['failed']} failed, {stats['skipped']} skipped, "
+              f"{stats['duplicates']} duplicates ({rate:.1f} masks/s)")
+
+    def log_error(mask_path, error):
+        print(f"[❌ ERROR] {mask_path}: {error.splitlines()[0]}")
+        if error_file:
+            error_file.write(json.dumps({"mask_path": mask_path, "error": error}) + "\n")
+            error_file.flush()
+
+    def is_stored(key, size):
+        row = store.get(key)
+        return row is not None and row.get(PIXEL_SIZE_COLUMN) == size and all(c in row for c in columns)
+
+    def collect(finished):
+        """Commit finished tasks; returns ``True`` if the pool broke."""
+        broken = False
+        for future in finished:
+            mask_path, key, size = tasks.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                # the worker running this mask, or another one, died (OOM kill, segfault)
+                broken = True
+                result = {"values": None, "error": f"worker process died: {e!r}; rerun to retry"}
+            if result["error"] is None:
+                store.upsert(key, {**result["values"], PIXEL_SIZE_COLUMN: size})
+                stats["done"] += 1
+                if stats["done"] % chunk_size == 0:
+                    store.flush(export=False)  # durable checkpoint for resume
+            else:
+                stats["failed"] += 1
+                log_error(mask_path, result["error"])
+            if (stats["done"] + stats["failed"]) % progress_every == 0:
+                report()
+        return broken
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+    def restart():
+        # every task still in flight died with the pool; log them and start over
+        nonlocal pool, in_flight
+        finished, in_flight = wait(in_flight)
+        collect(finished)
+        pool.shutdown(wait=False, cancel_futures=True)
+        pool = new_pool()
+        print("♻️ worker pool restarted")
+
+    def drain():
+        nonlocal in_flight
+        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+        if collect(finished):
+            restart()
+
+    def submit(mask_path, key, size):
+        try:
+            future = pool.submit(quantify_mask, mask_path, size, metrics, use_cache)
+        except BrokenProcessPool:
+            restart()
+            future = pool.submit(quantify_mask, mask_path, size, metrics, use_cache)
+        tasks[future] = (mask_path, key, size)
+        in_flight.add(future)
+
+    tasks = {}  # future -> (mask_path, key, pixel_size_mm)
+    seen = {}  # key -> first mask path queued under it in this run
+    in_flight = set()
+    pool = new_pool()
+    try:
+        with store.batch():
+            for mask_path, size in iter_masks(source, pixel_size_mm):
+                key = mask_key(mask_path, root)
+                if key in seen:
+                    stats["duplicates"] += 1
+                    log_error(mask_path, f"duplicate image name {key!r}, already used by {seen[key]}; not quantified")
+                    continue
+                seen[key] = mask_path
+                if resume and is_stored(key, size):
+                    stats["skipped"] += 1
+                    continue
+                if len(in_flight) >= max_in_flight:
+                    drain()
+                submit(mask_path, key, size)
+            while in_flight:
+                drain()
+    finally:
+        pool.shutdown(wait=True)
+        if error_file:
+            error_file.close()
+
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    report()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch crack quantification over a directory or manifest of masks")
+    parser.add_argument("source", help="mask directory, or manifest with one path / JSON object per line")
+    parser.add_argument("--pixel-size", type=float, required=True, help="pixel size in mm (manifest entries may override)")
+    parser.add_argument("--metrics", nargs="*", default=None, help="e.g. max_width length; default: all")
+    parser.add_argument("--csv", default=PREDICTED_METRICS_CSV)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--no-resume", action="store_true", help="recompute images already in the store")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the geometry artifact cache")
+    parser.add_argument("--error-log", default=DEFAULT_ERROR_LOG)
+    args = parser.parse_args()
+
+    stats = batch_quantify(
+        args.source, args.pixel_size, args.metrics,
+        csv_path=args.csv,
+        workers=args.workers,
+        max_in_flight=args.max_in_flight,
+        chunk_size=args.chunk_size,
+        resume=not args.no_resume,
+        use_cache=not args.no_cache,
+        error_log=args.error_log
+    )
+    print(f"✅ batch quantification finished: {stats}")
+    sys.exit(1 if stats["failed"] or stats["duplicates"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 #from mcp.server.fastmcp import tool
 from MCP.tool import tool
+from tools.results_store import sync_csv
 
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
@@ -20,6 +21,7 @@ def compare_results_csv(gt_csv_path: str, pred_csv_path: str) -> dict:
     Calculates MAE, MSE, R², MAPE and average relative error (percent).
     """
     try:
+        sync_csv(pred_csv_path)  # rows upserted in this process may not be exported yet
         if not os.path.exists(gt_csv_path) or not os.path.exists(pred_csv_path):
             raise FileNotFoundError("Ground truth or prediction CSV not found")
 
@@ -0,0 +1,122 @@
+import os
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from MCP.tool import tool
+from MCP.segment import segment_mask, mask_output_path, write_mask
+from MCP.quantify import load_geometry, quantify_geometry
+from tools.tracing import span, in_context
+
+# "async": write the mask file on a background thread, "sync": before returning,
+# "off": keep the mask in memory only
+SAVE_MASK_MODES = ("async", "sync", "off")
+
+_writer = None
+_pending_writes: Dict[str, Future] = {}
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> ThreadPoolExecutor:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mask-writer")
+        return _writer
+
+
+def _save_mask_async(output_path: str, binary_mask):
+    # the write may outlive the tool call: keep its span in the trace, not in the tool's timings
+    future = _get_writer().submit(in_context(write_mask, detached=True), output_path, binary_mask)
+    with _writer_lock:
+        _pending_writes[os.path.normpath(output_path)] = future
+    future.add_done_callback(lambda f, key=os.path.normpath(output_path): _forget_write(key, f))
+
+
+def _forget_write(key: str, future: Future):
+    with _writer_lock:
+        if _pending_writes.get(key) is future:
+            del _pending_writes[key]
+
+
+def wait_for_masks(paths: Optional[Iterable[str]] = None):
+    """Block until queued mask writes for ``paths`` (all of them by default) are on disk."""
+    with _writer_lock:
+        if paths is None:
+            futures = list(_pending_writes.values())
+        else:
+            futures = [f for f in (_pending_writes.get(os.path.normpath(p)) for p in paths) if f is not None]
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"[ERROR] mask write failed: {e}")
+
+
+@tool(name="segment_and_quantify")
+def segment_and_quantify(
+    image_path: str,
+    pixel_size_mm: float,
+    metrics: list = None,
+    visuals: list = None,
+    per_crack: bool = False,
+    save_mask: str = "async",
+    checkpoint_path: str = "checkpoints/unet_best.pth",
+    tile_size: int = None,
+    overlap: int = 64,
+    blend: str = "gaussian",
+    tile_batch_size: int = 4,
+    use_cache: bool = True
+) -> dict:
+    """Segment an image and quantify the predicted mask in one call.
+
+    The 0/1 mask goes straight from the model to the geometry engine, with
+    no PNG encode / decode and no second binarization in between. The mask
+    file is still written to ``outputs/masks`` for later steps, on a
+    background thread by default (``save_mask="async"``); ``"sync"`` writes
+    it before returning and ``"off"`` skips it. Results match
+    ``segment_crack_image`` followed by ``quantify_crack_geometry``, with
+    ``mask_path`` added to ``outputs``.
+    """
+    mask_path, stage = None, "Segmentation"
+    try:
+        if save_mask not in SAVE_MASK_MODES:
+            raise ValueError(f"Unsupported save_mask mode: {save_mask}. Available: {list(SAVE_MASK_MODES)}")
+
+        # 1. segmentation, kept in memory
+        binary_mask, cached = segment_mask(
+            image_path, checkpoint_path, tile_size, overlap, blend, tile_batch_size, use_cache
+        )
+
+        # 2. optional mask persistence, off the critical path by default
+        if save_mask != "off":
+            mask_path = mask_output_path(image_path)
+            if save_mask == "async":
+                _save_mask_async(mask_path, binary_mask)
+            else:
+                write_mask(mask_path, binary_mask)
+
+        # 3. quantification on the in-memory mask
+        stage = "Quantification"
+        with span("quantify.load") as s:
+            geometry, cached_keys = load_geometry(binary_mask, use_cache, binary=True)
+            if s is not None:
+                s["attrs"]["cached"] = sorted(cached_keys or ())
+        image_name = os.path.splitext(os.path.basename(image_path))[0]
+        result = quantify_geometry(geometry, cached_keys, image_name, pixel_size_mm, metrics, visuals, per_crack)
+
+        result["outputs"]["mask_path"] = mask_path
+        result["summary"] = "Segmentation complete" + (" (cached)" if cached else "") + "; " + result["summary"]
+        return result
+
+    except Exception as e:
+        print("[ERROR] segment_and_quantify exception:", str(e))
+        traceback.print_exc()
+        return {
+            "status": "error",
+            "summary": f"{stage} failed",
+            "outputs": {"mask_path": mask_path} if mask_path else None,
+            "visualizations": None,
+            "error": str(e)
+        }
@@ -3,6 +3,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 #from mcp.server.fastmcp import tool
 from MCP.tool import tool
+from tools.results_store import sync_csv
 
 # placeholder decorator
 def tool(name=None):
@@ -17,6 +18,7 @@ def plot_comparison_graphs(gt_csv_path: str, pred_csv_path: str, output_dir: str
     try:
         os.makedirs(output_dir, exist_ok=True)
 
+        sync_csv(pred_csv_path)  # rows upserted in this process may not be exported yet
         df_gt = pd.read_csv(gt_csv_path).set_index("Image")
         df_pred = pd.read_csv(pred_csv_path).set_index("Image")
         df = df_gt.join(df_pred, lsuffix="_gt", rsuffix="_pred").dropna()
@@ -1,17 +1,205 @@
 import os
+import csv
 import cv2
 import numpy as np
 import traceback
 from MCP.tool import tool
 
-from Crack_quantification_tools.binarize import binarize
-from Crack_quantification_tools.area import compute_crack_area_px
-from Crack_quantification_tools.length import compute_crack_length_px
-from Crack_quantification_tools.width_max import compute_max_width_px
-from Crack_quantification_tools.width_avg import compute_average_width_px
-from Crack_quantification_tools.skeleton import extract_skeleton_and_normals
-from tools.visualize import visualize_max_width, save_visual
-from tools.io_utils import append_to_csv
+from Crack_quantification_tools.geometry import CrackGeometry
+from tools.visualize import save_visual
+from tools.results_store import get_results_store, PREDICTED_METRICS_CSV
+from tools.artifact_cache import ArtifactCache
+from tools.mask_format import is_compact_mask, load_mask
+from tools.tracing import span
+
+# persistent cache of skeleton / contour / width artifacts keyed by mask content
+GEOMETRY_CACHE_DIR = os.getenv("CRACK_GEOMETRY_CACHE", os.path.join("outputs", "cache", "geometry"))
+GEOMETRY_CACHE_MAX_BYTES = int(os.getenv("CRACK_GEOMETRY_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# per-crack tables, one CSV per image
+COMPONENTS_CSV_DIR = os.path.join("outputs", "csv", "components")
+
+_geometry_cache = None
+
+# CSV column (with units) -> short alias used in tool outputs
+METRIC_ALIASES = {
+    "Length (mm)": "length",
+    "Area (mm^2)": "area",
+    "Max Width (mm)": "max_width",
+    "Avg Width (mm)": "avg_width"
+}
+
+# overlay layer -> file name suffix in outputs/visuals and key in ``visualizations``
+VISUAL_FILE_SUFFIXES = {"skeleton": "skeleton", "normals": "skeleton_normals", "max_width": "max_width"}
+VISUAL_RESULT_KEYS = {"skeleton": "skeleton_overlay", "normals": "skeleton_normals", "max_width": "max_width_overlay"}
+
+
+def get_geometry_cache() -> ArtifactCache:
+    global _geometry_cache
+    if _geometry_cache is None:
+        _geometry_cache = ArtifactCache(GEOMETRY_CACHE_DIR, max_bytes=GEOMETRY_CACHE_MAX_BYTES)
+    return _geometry_cache
+
+
+def read_mask_file(mask_path: str):
+    """Read a mask for ``load_geometry``; returns ``(image, binary)``.
+
+    Compact ``.bmask`` / ``.rle`` files decode straight to a 0/1 mask;
+    image files are read as BGR and binarized by ``load_geometry``.
+    """
+    if is_compact_mask(mask_path):
+        return load_mask(mask_path), True
+    img_raw = cv2.imread(mask_path)
+    if img_raw is None:
+        raise ValueError(f"Invalid image format: {mask_path}")
+    return img_raw, False
+
+
+def load_geometry(img_raw: np.ndarray, use_cache: bool = True, binary: bool = False):
+    """Wrap a mask image, seeding it from the geometry cache on a hit.
+
+    With ``binary`` the input is already a 0/1 mask (e.g. straight from
+    segmentation) and is used as is instead of being binarized again.
+
+    Returns ``(geometry, cached_keys)``; pass both to ``store_geometry``
+    once the needed metrics have been computed.
+    """
+    geometry = CrackGeometry(img_raw) if binary else CrackGeometry.from_image(img_raw)
+    if not use_cache:
+        return geometry, None
+    cached = get_geometry_cache().get(geometry.cache_key) or {}
+    if cached:
+        print(f"♻️ geometry cache hit: {geometry.cache_key[:12]}")
+        geometry.load_artifacts(cached)
+    return geometry, set(cached)
+
+
+def store_geometry(geometry: CrackGeometry, cached_keys):
+    """Write back artifacts that were not already in the cache entry."""
+    if cached_keys is None:
+        return
+    artifacts = geometry.to_artifacts()
+    if set(artifacts) - cached_keys:
+        get_geometry_cache().put(geometry.cache_key, artifacts)
+
+
+def select_metrics(metrics: list = None) -> list:
+    """Map loosely written metric names (``max_width``, ``Area``) to CSV column names."""
+    if not metrics:
+        return list(METRIC_ALIASES.keys())
+    selected = []
+    for m in metrics:
+        for k in METRIC_ALIASES:
+            if m.lower().replace(" ", "").replace("_", "") in k.lower().replace(" ", "").replace("_", ""):
+                selected.append(k)
+    return selected
+
+
+def compute_metrics(geometry: CrackGeometry, pixel_size_mm: float, selected_metrics: list) -> dict:
+    """Evaluate each selected metric once, in millimetres, keyed by CSV column name."""
+    # resolve the lazy intermediates up front so each stage is timed on its own
+    if any(name != "Area (mm^2)" for name in selected_metrics):
+        with span("quantify.skeletonize"):
+            geometry.skeleton_points
+    if "Max Width (mm)" in selected_metrics:
+        with span("quantify.kd_query"):
+            geometry.max_width_px
+
+    all_metrics = {
+        "Length (mm)": lambda: round(geometry.length_px * pixel_size_mm, 2),
+        "Area (mm^2)": lambda: round(geometry.area_px * pixel_size_mm ** 2, 2),
+        "Max Width (mm)": lambda: round(geometry.max_width_px * pixel_size_mm, 2),
+        "Avg Width (mm)": lambda: round(geometry.avg_width_px * pixel_size_mm, 2),
+    }
+    return {name: all_metrics[name]() for name in selected_metrics}
+
+
+def write_component_csv(table: dict, pixel_size_mm: float, csv_path: str) -> str:
+    """Write a ``CrackGeometry.component_table`` as one row per crack, lengths in mm."""
+    columns = {
+        "Crack ID": table["crack_id"],
+        "Length (mm)": np.round(table["length_px"] * pixel_size_mm, 2),
+        "Area (mm^2)": np.round(table["area_px"] * pixel_size_mm ** 2, 2),
+        "Max Width (mm)": np.round(table["max_width_px"] * pixel_size_mm, 2),
+        "Avg Width (mm)": np.round(table["avg_width_px"] * pixel_size_mm, 2),
+        "BBox X (px)": table["bbox_x"],
+        "BBox Y (px)": table["bbox_y"],
+        "BBox W (px)": table["bbox_w"],
+        "BBox H (px)": table["bbox_h"],
+    }
+    os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+    tmp_path = f"{csv_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(zip(*(column.tolist() for column in columns.values())))
+    os.replace(tmp_path, csv_path)
+    return csv_path
+
+
+def quantify_geometry(
+    geometry: CrackGeometry,
+    cached_keys,
+    image_name: str,
+    pixel_size_mm: float,
+    metrics: list = None,
+    visuals: list = None,
+    per_crack: bool = False
+) -> dict:
+    """Metrics, CSV rows, per-crack table and overlays for an already loaded mask.
+
+    Shared by ``quantify_crack_geometry`` (mask read from disk) and
+    ``segment_and_quantify`` (mask handed over in memory). Returns the
+    tool result dict.
+    """
+    # compute metrics
+    selected_metrics = select_metrics(metrics)
+    print(f"\U0001F4D0 selected metrics: {selected_metrics}")
+
+    # evaluate each metric once; CSV keeps the original column names with units
+    results_for_csv = compute_metrics(geometry, pixel_size_mm, selected_metrics)
+    results = {METRIC_ALIASES[name]: value for name, value in results_for_csv.items()}
+
+    with span("quantify.csv_write"):
+        get_results_store(PREDICTED_METRICS_CSV).upsert(image_name, results_for_csv)
+
+    # per-crack inventory
+    outputs = dict(results)
+    if per_crack:
+        with span("quantify.components"):
+            table = geometry.component_table()
+            outputs["crack_count"] = len(table["crack_id"])
+            outputs["components_csv"] = write_component_csv(
+                table, pixel_size_mm, os.path.join(COMPONENTS_CSV_DIR, f"{image_name}_components.csv")
+            )
+
+    # visualization results
+    vis_results = {}
+    if visuals:
+        with span("quantify.visuals", visuals=list(visuals)):
+            visual_dir = os.path.join("outputs", "visuals")
+            os.makedirs(visual_dir, exist_ok=True)
+
+            # skeleton points (red), normal vectors (green), widest chord (red line);
+            # all layers share one decoded base image
+            kinds = [k for k in ("skeleton", "normals", "max_width") if k in visuals or "all" in visuals]
+            for kind, image in geometry.overlays(kinds).items():
+                path = save_visual(image, os.path.join(visual_dir, f"{image_name}_{VISUAL_FILE_SUFFIXES[kind]}.png"))
+                vis_results[VISUAL_RESULT_KEYS[kind]] = path
+
+    with span("quantify.cache_store"):
+        store_geometry(geometry, cached_keys)
+
+    summary = f"Quantification complete: {len(results)} metrics, {len(vis_results)} visuals"
+    if per_crack:
+        summary += f", {outputs['crack_count']} cracks"
+    return {
+        "status": "success",
+        "summary": summary,
+        "outputs": outputs,
+        "visualizations": vis_results,
+        "error": None
+    }
 
 
 @tool(name="quantify_crack_geometry")
@@ -19,103 +207,34 @@ def quantify_crack_geometry(
     mask_path: str,
     pixel_size_mm: float,
     metrics: list = None,
-    visuals: list = None
+    visuals: list = None,
+    use_cache: bool = True,
+    per_crack: bool = False
 ) -> dict:
     """Crack image quantification tool with optional visualization.
 
-    Selected metrics are computed and written to CSV.
+    Selected metrics are computed and written to CSV. Pixel-space
+    intermediates are reused from the geometry cache when a mask with the
+    same content was analysed before. With ``per_crack`` every connected
+    component is also measured and written to its own table under
+    ``COMPONENTS_CSV_DIR``.
     """
     try:
         if not os.path.exists(mask_path):
             raise FileNotFoundError(f"Mask not found: {mask_path}")
 
         # original image for visualization
-        img_raw = cv2.imread(mask_path)
-        if img_raw is None:
-            raise ValueError(f"Invalid image format: {mask_path}")
-
-        # binarize image for analysis
-        mask = binarize(img_raw)
-
-        # compute metrics
-        all_metrics = {
-            "Length (mm)": lambda: round(compute_crack_length_px(mask) * pixel_size_mm, 2),
-            "Area (mm^2)": lambda: round(compute_crack_area_px(mask) * pixel_size_mm ** 2, 2),
-            "Max Width (mm)": lambda: round(compute_max_width_px(mask) * pixel_size_mm, 2),
-            "Avg Width (mm)": lambda: round(compute_average_width_px(mask) * pixel_size_mm, 2),
-        }
-
-        metric_alias_map = {
-            "Length (mm)": "length",
-            "Area (mm^2)": "area",
-            "Max Width (mm)": "max_width",
-            "Avg Width (mm)": "avg_width"
-        }
-
-        if not metrics:
-            selected_metrics = list(all_metrics.keys())
-        else:
-            selected_metrics = []
-            for m in metrics:
-                for k in all_metrics:
-                    if m.lower().replace(" ", "").replace("_", "") in k.lower().replace(" ", "").replace("_", ""):
-                        selected_metrics.append(k)
+        with span("quantify.decode"):
+            img_raw, binary = read_mask_file(mask_path)
 
-        print(f"\U0001F4D0 selected metrics: {selected_metrics}")
+        # binarize once; skeleton, contours and KD-tree are shared lazily
+        with span("quantify.binarize") as s:
+            geometry, cached_keys = load_geometry(img_raw, use_cache, binary)
+            if s is not None:
+                s["attrs"]["cached"] = sorted(cached_keys or ())
 
-        results = {
-            metric_alias_map[name]: all_metrics[name]() for name in selected_metrics
-        }
-
-        # write to CSV (keep original column names with units)
-        results_for_csv = {name: all_metrics[name]() for name in selected_metrics}
         image_name = os.path.splitext(os.path.basename(mask_path))[0]
-        os.makedirs("outputs/csv", exist_ok=True)
-        append_to_csv("outputs/csv/predicted_metrics.csv", image_name, results_for_csv)
-
-        # visualization results
-        vis_results = {}
-        if visuals:
-            image_base = os.path.splitext(os.path.basename(mask_path))[0]
-            visual_dir = os.path.join("outputs", "visuals")
-            os.makedirs(visual_dir, exist_ok=True)
-
-            # skeleton and normals
-            _, centers, normals = extract_skeleton_and_normals(mask)
-
-            # 1. skeleton points (red)
-            if "skeleton" in visuals or "all" in visuals:
-                overlay = img_raw.copy()
-                for pt in centers:
-                    x, y = int(pt[0]), int(pt[1])
-                    cv2.circle(overlay, (x, y), radius=1, color=(0, 0, 255), thickness=-1)
-                path = save_visual(overlay, os.path.join(visual_dir, f"{image_base}_skeleton.png"))
-                vis_results["skeleton_overlay"] = path
-
-            # 2. normal vectors (green lines)
-            if "normals" in visuals or "all" in visuals:
-                normal_overlay = img_raw.copy()
-                for pt, n in zip(centers, normals):
-                    x, y = int(pt[0]), int(pt[1])
-                    dx, dy = n[0], n[1]
-                    pt2 = (int(x + dx * 10), int(y + dy * 10))
-                    cv2.arrowedLine(normal_overlay, (x, y), pt2, (0, 255, 0), 1, tipLength=0.3)
-                path = save_visual(normal_overlay, os.path.join(visual_dir, f"{image_base}_skeleton_normals.png"))
-                vis_results["skeleton_normals"] = path
-
-            # 3. maximum width line (overlaid on original image)
-            if "max_width" in visuals or "all" in visuals:
-                vis_width, max_width = visualize_max_width(img_raw)
-                path = save_visual(vis_width, os.path.join(visual_dir, f"{image_base}_max_width.png"))
-                vis_results["max_width_overlay"] = path
-
-        return {
-            "status": "success",
-            "summary": f"Quantification complete: {len(results)} metrics, {len(vis_results)} visuals",
-            "outputs": results,
-            "visualizations": vis_results,
-            "error": None
-        }
+        return quantify_geometry(geometry, cached_keys, image_name, pixel_size_mm, metrics, visuals, per_crack)
 
     except Exception as e:
         try:
@@ -129,4 +248,4 @@ def quantify_crack_geometry(
             "outputs": None,
             "visualizations": None,
             "error": str(e)
-        }
\ No newline at end of file
+        }
@@ -1,11 +1,10 @@
 import re
 from typing import List, Optional
 from langdetect import detect
-from openai import OpenAI
 from RAG_knowledge.retriever import retrieve_context
 from MCP.tool import tool
-
-client = OpenAI()
+from tools.openai_client import get_openai_client
+from tools.tracing import span
 
 
 def detect_lang(text: str) -> str:
@@ -32,10 +31,12 @@ def format_context(contexts: List[dict], lang: str) -> str:
 @tool(name="rag_answer")
 def rag_answer(query: str, lang: Optional[str] = "auto", top_k: int = 5, model: str = "gpt-4") -> dict:
     # auto-detect language
-    detected_lang = detect_lang(query) if lang == "auto" else lang
+    with span("rag.detect_lang"):
+        detected_lang = detect_lang(query) if lang == "auto" else lang
 
     # retrieve relevant paragraphs
-    contexts = retrieve_context(query, lang=detected_lang, top_k=top_k)
+    with span("rag.retrieve", lang=detected_lang, top_k=top_k):
+        contexts = retrieve_context(query, lang=detected_lang, top_k=top_k)
 
     # ⚠️ print retrieved content (debug)
     print("\n====== [🔍 Retrieved paragraphs] ======")
@@ -76,11 +77,12 @@ You may summarize or rephrase content, but do not invent or hallucinate.
 """
 
     # generate answer with GPT
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2
-    )
+    with span("rag.llm_call", model=model):
+        response = get_openai_client().chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2
+        )
     answer = response.choices[0].message.content.strip()
 
     return {
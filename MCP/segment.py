@@ -1,68 +1,334 @@
 import os
+import json
+import uuid
+import threading
 import torch
 import numpy as np
 import cv2
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from PIL import Image as PILImage
 from torchvision import transforms
 from MCP.tool import tool
 
-from model.unet import UNet
+from model.inference_backend import load_backend
 from tools.preprocess import resolve_output_path
+from tools.artifact_cache import ArtifactCache, hash_bytes, hash_file
+from tools.mask_format import mask_suffix, save_mask
+from tools.tracing import span, in_context
 
 # Initialize model (load only once)
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 _model = None
+_model_key = None
 
-def load_model(checkpoint_path: str = "checkpoints/unet_best.pth") -> torch.nn.Module:
-    global _model
-    if _model is None:
-        model = UNet(in_channels=3, num_classes=1)
-        model.load_state_dict(torch.load(checkpoint_path, map_location=device))
-        model.to(device)
-        model.eval()
-        _model = model
+# eager / torchscript / onnx, see model/inference_backend.py
+INFERENCE_BACKEND = os.getenv("CRACK_INFERENCE_BACKEND", "eager")
+INTRA_OP_THREADS = int(os.getenv("CRACK_INTRA_OP_THREADS", 0)) or None
+INTER_OP_THREADS = int(os.getenv("CRACK_INTER_OP_THREADS", 0)) or None
+
+# Preprocessing shared by every call
+INPUT_SIZE = (896, 896)
+MASK_THRESHOLD = 0.9
+_transform = transforms.Compose([
+    transforms.Resize(INPUT_SIZE),
+    transforms.ToTensor()
+])
+
+# segmentation masks, one file per input image in the ``CRACK_MASK_FORMAT`` format
+MASK_OUTPUT_DIR = os.path.join("outputs", "masks")
+
+# Mask cache keyed by image bytes, checkpoint weights and inference params
+SEGMENT_CACHE_DIR = os.getenv("CRACK_SEGMENT_CACHE", os.path.join("outputs", "cache", "segment"))
+SEGMENT_CACHE_MAX_BYTES = int(os.getenv("CRACK_SEGMENT_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# bump when preprocessing or post-processing changes the produced masks
+SEGMENT_CACHE_VERSION = "1"
+
+_segment_cache = None
+_checkpoint_hashes: Dict[tuple, str] = {}
+_cache_lock = threading.Lock()
+
+def load_model(checkpoint_path: str = "checkpoints/unet_best.pth", backend: str = None):
+    """Return the inference callable for ``checkpoint_path`` (cached per checkpoint and backend)."""
+    global _model, _model_key
+    key = (os.path.abspath(checkpoint_path), backend or INFERENCE_BACKEND)
+    if _model is None or _model_key != key:
+        _model = load_backend(
+            checkpoint_path, key[1], device=device,
+            intra_op=INTRA_OP_THREADS, inter_op=INTER_OP_THREADS
+        )
+        _model_key = key
     return _model
 
 
-@tool(name="segment_crack_image")
-def segment_crack_image(image_path: str, checkpoint_path: str = "checkpoints/unet_best.pth") -> dict:
-    """Image segmentation tool.
+def get_segment_cache() -> ArtifactCache:
+    global _segment_cache
+    with _cache_lock:
+        if _segment_cache is None:
+            _segment_cache = ArtifactCache(SEGMENT_CACHE_DIR, max_bytes=SEGMENT_CACHE_MAX_BYTES)
+        return _segment_cache
 
-    Given an image path, output the mask image path (single channel 0/255).
-    """
-    try:
-        # 1. read original image (BGR)
+
+def get_segment_cache_stats() -> Dict[str, int]:
+    """Hit / miss / eviction counters and current size of the mask cache."""
+    return get_segment_cache().get_stats()
+
+
+def checkpoint_fingerprint(checkpoint_path: str) -> str:
+    """SHA-256 of the checkpoint weights, memoized per (path, mtime, size)."""
+    stat = os.stat(checkpoint_path)
+    key = (os.path.abspath(checkpoint_path), stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        fingerprint = _checkpoint_hashes.get(key)
+    if fingerprint is None:
+        fingerprint = hash_file(checkpoint_path)
+        with _cache_lock:
+            _checkpoint_hashes[key] = fingerprint
+    return fingerprint
+
+
+def _inference_params(tile_size: Optional[int], overlap: int, blend: str) -> Dict:
+    """Parameters that change the produced mask (tile batch size does not)."""
+    # folded / exported graphs differ from eager by float rounding, which can flip threshold pixels
+    common = {"threshold": MASK_THRESHOLD, "backend": INFERENCE_BACKEND}
+    if tile_size:
+        return {"mode": "tiled", "tile_size": tile_size, "overlap": overlap, "blend": blend, **common}
+    return {"mode": "resize", "input_size": list(INPUT_SIZE), **common}
+
+
+def _mask_cache_key(image_path: str, weights_hash: str, params: Dict) -> str:
+    return hash_bytes(
+        "segment", SEGMENT_CACHE_VERSION, hash_file(image_path), weights_hash,
+        json.dumps(params, sort_keys=True)
+    )
+
+
+def _cached_mask(key: str) -> Optional[np.ndarray]:
+    entry = get_segment_cache().get(key)
+    if entry is None:
+        return None
+    shape = tuple(entry["shape"])
+    return np.unpackbits(entry["bits"], count=shape[0] * shape[1]).reshape(shape)
+
+
+def _store_mask(key: str, binary_mask: np.ndarray, image_path: str, params: Dict):
+    get_segment_cache().put(
+        key,
+        {"bits": np.packbits(binary_mask), "shape": np.asarray(binary_mask.shape)},
+        meta=json.dumps({"image_path": image_path, **params})
+    )
+
+
+def _read_rgb(image_path: str) -> np.ndarray:
+    """Read an image from disk as an (H, W, 3) uint8 RGB array."""
+    with span("segment.decode"):
         image_np = cv2.imread(image_path)
         if image_np is None:
             raise FileNotFoundError(f"Image not found: {image_path}")
+        return cv2.cvtColor(image_np, cv2.COLOR_BGR2RGB)
+
+
+def _decode_image(image_path: str) -> torch.Tensor:
+    """Read an image from disk and return the preprocessed (3, H, W) tensor."""
+    # read original image (BGR), convert to PIL RGB and preprocess
+    image_rgb = _read_rgb(image_path)
+    with span("segment.preprocess"):
+        return _transform(PILImage.fromarray(image_rgb).convert("RGB"))
+
+
+def _predict_masks(model: Callable, batch: torch.Tensor) -> np.ndarray:
+    """Run one forward pass and return (B, H, W) binary 0/1 masks."""
+    with torch.inference_mode():
+        with span("segment.forward", batch=len(batch)):
+            logits = model(batch.to(device))
+        with span("segment.threshold"):
+            return (torch.sigmoid(logits)[:, 0] > MASK_THRESHOLD).to(torch.uint8).cpu().numpy()
+
+
+def _tile_starts(length: int, tile_size: int, stride: int) -> List[int]:
+    """Start offsets covering ``length`` with tiles of ``tile_size``; the last tile is flush with the edge."""
+    starts = list(range(0, length - tile_size + 1, stride))
+    if starts[-1] + tile_size < length:
+        starts.append(length - tile_size)
+    return starts
+
+
+def _blend_window(tile_size: int, overlap: int, blend: str) -> np.ndarray:
+    """Per-pixel weights used to blend overlapping tile predictions."""
+    if blend == "mean":
+        return np.ones((tile_size, tile_size), dtype=np.float32)
+    if blend == "linear":
+        ramp = np.ones(tile_size, dtype=np.float32)
+        if overlap > 0:
+            edge = (np.arange(overlap, dtype=np.float32) + 1) / (overlap + 1)
+            ramp[:overlap] = edge
+            ramp[-overlap:] = edge[::-1]
+        return np.outer(ramp, ramp)
+    if blend == "gaussian":
+        coords = np.arange(tile_size, dtype=np.float32) - (tile_size - 1) / 2
+        g = np.exp(-0.5 * (coords / (tile_size / 4)) ** 2)
+        window = np.outer(g, g)
+        return np.maximum(window / window.max(), 1e-3).astype(np.float32)
+    raise ValueError(f"Unsupported blend mode: {blend}. Available: ['gaussian', 'linear', 'mean']")
+
+
+def _predict_tiled(
+    model: Callable,
+    image_rgb: np.ndarray,
+    tile_size: int = 512,
+    overlap: int = 64,
+    blend: str = "gaussian",
+    tile_batch_size: int = 4
+) -> np.ndarray:
+    """Sliding-window inference at native resolution.
+
+    Tiles are run through the model ``tile_batch_size`` at a time and blended
+    into a rolling accumulator one tile-row tall; rows are thresholded as soon
+    as no later tile can touch them, so float buffers stay ``tile_size x W``
+    regardless of image height.
+
+    Returns an (H, W) uint8 0/1 mask the same size as ``image_rgb``.
+    """
+    if tile_size % 16 != 0:
+        raise ValueError(f"tile_size must be a multiple of 16, got {tile_size}")
+    if not 0 <= overlap < tile_size:
+        raise ValueError(f"overlap must be in [0, tile_size), got {overlap}")
+
+    height, width = image_rgb.shape[:2]
+    pad_h, pad_w = max(tile_size - height, 0), max(tile_size - width, 0)
+    if pad_h or pad_w:
+        image_rgb = cv2.copyMakeBorder(image_rgb, 0, pad_h, 0, pad_w, cv2.BORDER_REFLECT_101)
+    padded_h, padded_w = image_rgb.shape[:2]
+
+    stride = tile_size - overlap
+    ys = _tile_starts(padded_h, tile_size, stride)
+    xs = _tile_starts(padded_w, tile_size, stride)
+    window = _blend_window(tile_size, overlap, blend)
+
+    mask = np.zeros((padded_h, padded_w), dtype=np.uint8)
+    acc_prob = np.zeros((tile_size, padded_w), dtype=np.float32)
+    acc_weight = np.zeros((tile_size, padded_w), dtype=np.float32)
+    top = 0  # image row stored at acc[0]
+
+    for y0 in ys:
+        # rows above y0 are final: threshold them and shift the accumulator
+        shift = y0 - top
+        if shift > 0:
+            with span("segment.threshold"):
+                done = acc_prob[:shift] / np.maximum(acc_weight[:shift], 1e-6)
+                mask[top:y0] = done > MASK_THRESHOLD
+            acc_prob[:-shift] = acc_prob[shift:]
+            acc_weight[:-shift] = acc_weight[shift:]
+            acc_prob[-shift:] = 0
+            acc_weight[-shift:] = 0
+            top = y0
+
+        for i in range(0, len(xs), tile_batch_size):
+            batch_xs = xs[i:i + tile_batch_size]
+            tiles = np.stack([image_rgb[y0:y0 + tile_size, x0:x0 + tile_size] for x0 in batch_xs])
+            batch = torch.from_numpy(tiles).permute(0, 3, 1, 2).float().div_(255)
+            with torch.inference_mode(), span("segment.forward", batch=len(batch_xs), tiled=True):
+                probs = torch.sigmoid(model(batch.to(device)))[:, 0].cpu().numpy()
+            for x0, prob in zip(batch_xs, probs):
+                acc_prob[:, x0:x0 + tile_size] += prob * window
+                acc_weight[:, x0:x0 + tile_size] += window
+
+    rest = padded_h - top
+    with span("segment.threshold"):
+        done = acc_prob[:rest] / np.maximum(acc_weight[:rest], 1e-6)
+        mask[top:] = done > MASK_THRESHOLD
+    return mask[:height, :width]
+
 
-        # 2. convert to PIL RGB and preprocess
-        pil_img = PILImage.fromarray(cv2.cvtColor(image_np, cv2.COLOR_BGR2RGB)).convert("RGB")
-        transform = transforms.Compose([
-            transforms.Resize((896, 896)),
-            transforms.ToTensor()
-        ])
-        input_tensor = transform(pil_img).unsqueeze(0).to(device)
+def write_mask(output_path: str, binary_mask: np.ndarray) -> str:
+    # write under a unique name and rename so concurrent writers never leave a torn file
+    root, ext = os.path.splitext(output_path)
+    tmp_path = f"{root}.{uuid.uuid4().hex}.tmp{ext}"
+    with span("segment.write"):
+        save_mask(tmp_path, binary_mask)
+        os.replace(tmp_path, output_path)
+    return output_path
 
-        # 3. inference
+
+def segment_mask(
+    image_path: str,
+    checkpoint_path: str = "checkpoints/unet_best.pth",
+    tile_size: int = None,
+    overlap: int = 64,
+    blend: str = "gaussian",
+    tile_batch_size: int = 4,
+    use_cache: bool = True
+) -> Tuple[np.ndarray, bool]:
+    """Segment one image in memory; returns ``(binary_mask, cached)``.
+
+    ``binary_mask`` is an (H, W) uint8 0/1 array. See
+    ``segment_crack_image`` for the parameters.
+    """
+    key = binary_mask = None
+    if use_cache:
+        with span("segment.cache_lookup"):
+            params = _inference_params(tile_size, overlap, blend)
+            key = _mask_cache_key(image_path, checkpoint_fingerprint(checkpoint_path), params)
+            binary_mask = _cached_mask(key)
+    cached = binary_mask is not None
+
+    if cached:
+        print(f"♻️ segmentation cache hit: {image_path}")
+    elif tile_size:
+        model = load_model(checkpoint_path)
+        # 1-2. tiled inference over the full-resolution image
+        binary_mask = _predict_tiled(model, _read_rgb(image_path), tile_size, overlap, blend, tile_batch_size)
+    else:
         model = load_model(checkpoint_path)
-        with torch.no_grad():
-            pred = model(input_tensor)
-            pred = torch.sigmoid(pred)
-            pred_mask = pred[0, 0].cpu().numpy()
-            binary_mask = (pred_mask > 0.9).astype(np.uint8)
+        # 1. read and preprocess
+        input_tensor = _decode_image(image_path).unsqueeze(0)
+
+        # 2. inference
+        binary_mask = _predict_masks(model, input_tensor)[0]
+
+    if key is not None and not cached:
+        _store_mask(key, binary_mask, image_path, params)
+    return binary_mask, cached
+
+
+def mask_output_path(image_path: str) -> str:
+    """Where the mask of ``image_path`` is saved."""
+    root, _ = os.path.splitext(resolve_output_path(image_path, suffix="mask", output_dir=MASK_OUTPUT_DIR))
+    return root + mask_suffix()
+
+
+@tool(name="segment_crack_image")
+def segment_crack_image(
+    image_path: str,
+    checkpoint_path: str = "checkpoints/unet_best.pth",
+    tile_size: int = None,
+    overlap: int = 64,
+    blend: str = "gaussian",
+    tile_batch_size: int = 4,
+    use_cache: bool = True
+) -> dict:
+    """Image segmentation tool.
 
-        # 4. save mask image
-        output_path = resolve_output_path(image_path, suffix="mask", output_dir="outputs/masks")
-        cv2.imwrite(output_path, binary_mask * 255)
+    Given an image path, output the mask image path (single channel 0/255).
+    By default the image is resized to 896x896; pass ``tile_size`` to run
+    sliding-window inference at native resolution instead, so the mask
+    matches the input size. Masks are reused from the segmentation cache
+    when the same image was segmented with the same weights and parameters.
+    """
+    try:
+        # 1-2. decode and inference (or cache hit)
+        binary_mask, cached = segment_mask(
+            image_path, checkpoint_path, tile_size, overlap, blend, tile_batch_size, use_cache
+        )
 
-        if not os.path.exists(output_path):
-            raise RuntimeError(f"Mask save failed, file not found: {output_path}")
+        # 3. save mask image
+        output_path = mask_output_path(image_path)
+        write_mask(output_path, binary_mask)
 
         return {
             "status": "success",
-            "summary": "Segmentation complete; mask saved",
+            "summary": "Segmentation complete; mask saved" + (" (cached)" if cached else ""),
             "outputs": {
                 "mask_path": output_path
             },
@@ -78,3 +344,124 @@ def segment_crack_image(image_path: str, checkpoint_path: str = "checkpoints/une
             "outputs": None,
             "error": str(e)
         }
+
+
+@tool(name="segment_crack_images")
+def segment_crack_images(
+    image_paths: List[str],
+    checkpoint_path: str = "checkpoints/unet_best.pth",
+    batch_size: int = 8,
+    num_workers: int = 4,
+    tile_size: int = None,
+    overlap: int = 64,
+    blend: str = "gaussian",
+    use_cache: bool = True
+) -> dict:
+    """Batched segmentation tool for many images.
+
+    Images are decoded on a thread pool one batch ahead of inference, each
+    batch runs through the UNet in a single forward pass, and masks are
+    written asynchronously. A failing image is reported in ``outputs.results``
+    without aborting the rest of the batch. With ``tile_size`` each image is
+    segmented at native resolution and its tiles are batched ``batch_size``
+    at a time instead. Images found in the segmentation cache skip inference.
+    """
+    try:
+        per_image = {path: {"image_path": path, "mask_path": None, "status": "error", "error": None} for path in image_paths}
+        pending_writes = []
+        keys = {}
+        cached_count = 0
+
+        # pool threads record their spans under this tool's span
+        write, store = in_context(write_mask), in_context(_store_mask)
+        with ThreadPoolExecutor(max_workers=num_workers) as decode_pool, \
+                ThreadPoolExecutor(max_workers=1) as write_pool:
+            # resolve cache hits first; only misses go through the model
+            todo = list(image_paths)
+            if use_cache:
+                params = _inference_params(tile_size, overlap, blend)
+                weights_hash = checkpoint_fingerprint(checkpoint_path)
+
+                @in_context
+                def lookup(path):
+                    with span("segment.cache_lookup"):
+                        key = _mask_cache_key(path, weights_hash, params)
+                        return key, _cached_mask(key)
+
+                todo = []
+                for path, future in [(p, decode_pool.submit(lookup, p)) for p in image_paths]:
+                    try:
+                        key, binary_mask = future.result()
+                    except Exception as e:
+                        print(f"[ERROR] segment_crack_images failed to read {path}: {e}")
+                        per_image[path]["error"] = str(e)
+                        continue
+                    if binary_mask is None:
+                        keys[path] = key
+                        todo.append(path)
+                    else:
+                        cached_count += 1
+                        output_path = mask_output_path(path)
+                        pending_writes.append((path, write_pool.submit(write, output_path, binary_mask)))
+
+            model = load_model(checkpoint_path) if todo else None
+            batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+
+            # prefetch the first batch; always keep one batch decoding ahead
+            decode = in_context(_read_rgb if tile_size else _decode_image)
+            next_futures = [decode_pool.submit(decode, p) for p in batches[0]] if batches else []
+            for b, paths in enumerate(batches):
+                futures = next_futures
+                next_futures = [decode_pool.submit(decode, p) for p in batches[b + 1]] if b + 1 < len(batches) else []
+
+                tensors, valid_paths = [], []
+                for path, future in zip(paths, futures):
+                    try:
+                        tensors.append(future.result())
+                        valid_paths.append(path)
+                    except Exception as e:
+                        print(f"[ERROR] segment_crack_images failed to decode {path}: {e}")
+                        per_image[path]["error"] = str(e)
+                if not tensors:
+                    continue
+
+                if tile_size:
+                    masks = [_predict_tiled(model, image, tile_size, overlap, blend, batch_size) for image in tensors]
+                else:
+                    masks = _predict_masks(model, torch.stack(tensors))
+                for path, binary_mask in zip(valid_paths, masks):
+                    output_path = mask_output_path(path)
+                    pending_writes.append((path, write_pool.submit(write, output_path, binary_mask)))
+                    if path in keys:
+                        write_pool.submit(store, keys[path], binary_mask, path, params)
+
+            for path, future in pending_writes:
+                try:
+                    per_image[path]["mask_path"] = future.result()
+                    per_image[path]["status"] = "success"
+                except Exception as e:
+                    per_image[path]["error"] = str(e)
+
+        results = [per_image[p] for p in image_paths]
+        mask_paths = [r["mask_path"] for r in results if r["status"] == "success"]
+        failed = len(results) - len(mask_paths)
+
+        return {
+            "status": "success" if mask_paths or not results else "error",
+            "summary": f"Segmentation complete; {len(mask_paths)}/{len(results)} masks saved ({cached_count} cached)",
+            "outputs": {
+                "mask_paths": mask_paths,
+                "results": results
+            },
+            "error": f"{failed} images failed" if failed else None
+        }
+
+    except Exception as e:
+        print("[ERROR] segment_crack_images exception:", str(e))
+        traceback.print_exc()
+        return {
+            "status": "error",
+            "summary": "Batch segmentation failed",
+            "outputs": None,
+            "error": str(e)
+        }
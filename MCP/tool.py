@@ -1,7 +1,40 @@
 # MCP/tool.py
+import importlib
 
 tool_registry = {}
 
+
+class LazyTool:
+    """Registry placeholder for a tool whose module has not been imported yet.
+
+    Calling it imports ``module``; the module's ``@tool`` decorator then
+    replaces this placeholder in ``tool_registry`` with the real function.
+    """
+
+    def __init__(self, name: str, module: str):
+        self._tool_name = name
+        self.module = module
+
+    def load(self):
+        importlib.import_module(self.module)
+        fn = tool_registry.get(self._tool_name)
+        if fn is None or fn is self:
+            raise ImportError(f"Module {self.module} did not register tool {self._tool_name}")
+        return fn
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"LazyTool({self._tool_name!r}, {self.module!r})"
+
+
+def register_lazy_tool(name: str, module: str):
+    """Declare a tool by name without importing its (heavy) module."""
+    if name not in tool_registry:
+        tool_registry[name] = LazyTool(name, module)
+
+
 def tool(name=None):
     def decorator(fn):
         fn._tool_name = name or fn.__name__
@@ -9,3 +42,15 @@ def tool(name=None):
         return fn
 
     return decorator
+
+
+# built-in tools, imported on first call
+for _name, _module in {
+    "segment_crack_image": "MCP.segment",
+    "segment_crack_images": "MCP.segment",
+    "quantify_crack_geometry": "MCP.quantify",
+    "segment_and_quantify": "MCP.pipeline",
+    "visualize_crack_result": "MCP.visualize_tools",
+    "rag_answer": "MCP.rag_answer",
+}.items():
+    register_lazy_tool(_name, _module)
@@ -2,8 +2,9 @@ import matplotlib.pyplot as plt
 import cv2
 import os
 from pathlib import Path
-from MCP.quantify import quantify_crack_geometry
+from MCP.quantify import quantify_crack_geometry, VISUAL_FILE_SUFFIXES, VISUAL_RESULT_KEYS
 from MCP.tool import tool
+from tools.mask_format import find_mask, is_compact_mask, load_mask
 
 @tool(name="visualize_crack_result")
 def visualize_crack_result(subject_name: str, memory, visual_types: list = None, show: bool = True):
@@ -26,9 +27,10 @@ def visualize_crack_result(subject_name: str, memory, visual_types: list = None,
         path = None
 
         # try to fetch path from memory
-        if vtype in {"mask", "skeleton", "max_width"}:
+        if vtype == "mask" or vtype in VISUAL_RESULT_KEYS:
 
-            path = memory.get_visualization_path(subject_name, vtype) if vtype != "mask" else memory.get_mask_path(subject_name)
+            path = (memory.get_visualization_path(subject_name, vtype, key=VISUAL_RESULT_KEYS[vtype])
+                    if vtype != "mask" else memory.get_mask_path(subject_name))
             print(f"[🧪 DEBUG] vtype={vtype}, raw path from memory = {path}, type = {type(path)}")
             if not isinstance(path, (str, os.PathLike)):
                 print(f"[❌ Type error] invalid path type for {vtype}: {type(path)} -> {path}")
@@ -44,23 +46,25 @@ def visualize_crack_result(subject_name: str, memory, visual_types: list = None,
         # if not found in memory, try default paths
         if not path or not path.exists():
             if vtype == "mask":
-                path = Path(f"outputs/masks/{subject_name}.png")
-            elif vtype == "skeleton":
-                path = Path(f"outputs/visuals/{subject_name}_skeleton.png")
-            elif vtype == "max_width":
-                path = Path(f"outputs/visuals/{subject_name}_max_width.png")
+                path = find_mask("outputs/masks", subject_name)
+                path = Path(path) if path else None
+            elif vtype in VISUAL_FILE_SUFFIXES:
+                path = Path(f"outputs/visuals/{subject_name}_{VISUAL_FILE_SUFFIXES[vtype]}.png")
 
         # mark fallback if still missing
         if not path or not path.exists():
-            if vtype in {"skeleton", "max_width"}:
+            if vtype in VISUAL_RESULT_KEYS:
                 fallback_needed.append(vtype)
                 continue
             else:
                 print(f"[⚠️ Missing] path for {vtype} not found")
                 continue
 
-        # load image
-        img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        # load image; compact mask files decode to 0/1
+        if is_compact_mask(str(path)):
+            img = cv2.cvtColor(load_mask(str(path)) * 255, cv2.COLOR_GRAY2BGR)
+        else:
+            img = cv2.imread(str(path), cv2.IMREAD_COLOR)
         if img is not None:
             img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
             images[vtype] = img
@@ -68,22 +72,24 @@ def visualize_crack_result(subject_name: str, memory, visual_types: list = None,
         else:
             print(f"[❌ Error] unable to read image file: {path}")
 
-    # === fallback: automatically generate skeleton / max_width etc ===
+    # === fallback: automatically generate skeleton / normals / max_width ===
     if fallback_needed:
-        mask_path = memory.get_mask_path(subject_name) or f"outputs/masks/{subject_name}.png"
+        mask_path = memory.get_mask_path(subject_name) or find_mask("outputs/masks", subject_name)
         pixel_size = memory.get_pixel_size(subject_name) or 0.5
 
         if mask_path and os.path.exists(mask_path):
             print(f"[⚙️ fallback] generating layers: {fallback_needed}")
+            # reuses cached skeleton / width artifacts when the mask is unchanged
             result = quantify_crack_geometry(
                 mask_path=mask_path,
                 pixel_size_mm=pixel_size,
                 metrics=[],
-                visuals=fallback_needed
+                visuals=fallback_needed,
+                use_cache=True
             )
             if result.get("status") == "success":
                 for vtype in fallback_needed:
-                    gen_path = result["visualizations"].get(vtype)
+                    gen_path = result["visualizations"].get(VISUAL_RESULT_KEYS[vtype])
                     if gen_path and os.path.exists(gen_path):
                         img = cv2.imread(gen_path, cv2.IMREAD_COLOR)
                         if img is not None:
@@ -1,12 +1,18 @@
 # rag_knowledge/builder.py
 import os
 import json
-import pickle
 import numpy as np
 import faiss
+from RAG_knowledge.chunk_store import write_chunk_store
 
-def build_vector_store(data_path, output_dir, lang="zh"):
+def build_vector_store(data_path, output_dir, lang="zh", country=None):
+    """Build a FAISS index plus slim chunk metadata for one language.
+
+    Metadata is written as JSON lines with a byte-offset index and without
+    the embedding vectors, which are already stored in the index.
+    """
     os.makedirs(output_dir, exist_ok=True)
+    prefix = f"{country}_crack_{lang}" if country else f"crack_{lang}"
 
     with open(data_path, "r", encoding="utf-8") as f:
         data = json.load(f)
@@ -19,23 +25,21 @@ def build_vector_store(data_path, output_dir, lang="zh"):
     valid_data = [item for item in data if embedding_key in item and item[embedding_key]]
 
     embeddings = np.array([item[embedding_key] for item in valid_data], dtype=np.float32)
-    metadata = [item for item in valid_data]  # keep full paragraph structure
 
     # build and save FAISS index
     dim = embeddings.shape[1]
     index = faiss.IndexFlatL2(dim)
     index.add(embeddings)
 
-    faiss.write_index(index, os.path.join(output_dir, f"crack_{lang}.index"))
-    with open(os.path.join(output_dir, f"crack_{lang}_chunks.pkl"), "wb") as f:
-        pickle.dump(metadata, f)
+    faiss.write_index(index, os.path.join(output_dir, f"{prefix}.index"))
+    write_chunk_store(valid_data, os.path.join(output_dir, f"{prefix}_chunks.jsonl"))
 
-    print(f"✅ {lang} vectors and metadata saved to {output_dir}/crack_{lang}.*")
+    print(f"✅ {lang} vectors and metadata saved to {output_dir}/{prefix}*")
 
 
 if __name__ == "__main__":
     DATA_PATH = r"E:\UTS_work_code\Agentic_AI\Agentic_AI_MCP_1\RAG_knowledge\regulations_embeddings\USA_crack_control_chunks_with_dual_embeddings.json"
     OUTPUT_DIR = "rag_knowledge/vector_store"
 
-    build_vector_store(DATA_PATH, OUTPUT_DIR, lang="zh")
-    build_vector_store(DATA_PATH, OUTPUT_DIR, lang="en")
+    build_vector_store(DATA_PATH, OUTPUT_DIR, lang="zh", country="USA")
+    build_vector_store(DATA_PATH, OUTPUT_DIR, lang="en", country="USA")
@@ -0,0 +1,106 @@
+# rag_knowledge/chunk_store.py
+import json
+import mmap
+import os
+import pickle
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+def offsets_path_for(jsonl_path: str) -> str:
+    """Offset index that sits next to a chunk JSON-lines file."""
+    return os.path.splitext(jsonl_path)[0] + ".offsets.npy"
+
+
+def strip_embeddings(chunk: Dict) -> Dict:
+    """Drop ``embedding_*`` vectors; they already live in the FAISS index."""
+    return {k: v for k, v in chunk.items() if not k.startswith("embedding_")}
+
+
+def write_chunk_store(chunks: Iterable[Dict], jsonl_path: str) -> str:
+    """Write chunk metadata as JSON lines plus a byte-offset index.
+
+    Row ``i`` of the file corresponds to vector ``i`` of the FAISS index.
+    Embeddings are stripped before writing. Both files are written to temp
+    paths and swapped in jsonl first, so the offsets on disk never describe
+    a file that is not there yet; ``ChunkStore`` rejects a mismatched pair.
+    """
+    offsets = [0]
+    tmp_path = jsonl_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for chunk in chunks:
+            f.write(json.dumps(strip_embeddings(chunk), ensure_ascii=False).encode("utf-8") + b"\n")
+            offsets.append(f.tell())
+    offsets_path = offsets_path_for(jsonl_path)
+    tmp_offsets_path = offsets_path + ".tmp"
+    with open(tmp_offsets_path, "wb") as f:
+        np.save(f, np.asarray(offsets, dtype=np.int64))
+    os.replace(tmp_path, jsonl_path)
+    os.replace(tmp_offsets_path, offsets_path)
+    return jsonl_path
+
+
+class ChunkStore:
+    """Read-only, lazily decoded view over a chunk JSON-lines file.
+
+    The file is memory-mapped and only the requested rows are parsed, so
+    opening a store costs one small offset array regardless of corpus size.
+    Supports ``len()``, integer indexing and iteration like the chunk list
+    it replaces.
+    """
+
+    def __init__(self, jsonl_path: str):
+        self.path = jsonl_path
+        self._offsets = np.load(offsets_path_for(jsonl_path))
+        self._file = open(jsonl_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if int(self._offsets[-1]) != size:
+            self._file.close()
+            raise ValueError(
+                f"Chunk offsets do not match {jsonl_path} (index ends at byte {int(self._offsets[-1])}, "
+                f"file has {size}); the store is being rewritten or is corrupt, rebuild it with FAISS_builder"
+            )
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> Dict:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(f"Chunk index {i} out of range; total {n} chunks")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._data[start:end])
+
+    def get_many(self, ids: Iterable[int]) -> List[Dict]:
+        return [self[i] for i in ids]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+def convert_pickle_store(pkl_path: str, jsonl_path: str = None) -> str:
+    """Convert a legacy ``*_chunks.pkl`` file to the slim JSON-lines format."""
+    jsonl_path = jsonl_path or os.path.splitext(pkl_path)[0] + ".jsonl"
+    with open(pkl_path, "rb") as f:
+        chunks = pickle.load(f)
+    return write_chunk_store(chunks, jsonl_path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    store_dir = sys.argv[1] if len(sys.argv) > 1 else "RAG_knowledge/vector_store"
+    for name in sorted(os.listdir(store_dir)):
+        if name.endswith("_chunks.pkl"):
+            out = convert_pickle_store(os.path.join(store_dir, name))
+            print(f"✅ {name} -> {os.path.basename(out)}")
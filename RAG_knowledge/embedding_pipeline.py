@@ -0,0 +1,254 @@
+# rag_knowledge/embedding_pipeline.py
+import asyncio
+import hashlib
+import json
+import os
+import random
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_MODEL = "text-embedding-3-large"
+DEFAULT_LANGS = ("zh", "en")
+
+
+def content_hash(model: str, text: str) -> str:
+    """Stable key for one (model, text) embedding."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCheckpoint:
+    """Append-only JSON-lines store of finished embeddings keyed by content hash.
+
+    Every completed batch is appended immediately, so an interrupted run
+    resumes with only the missing texts. The same file doubles as the
+    incremental cache across runs: unchanged chunks hash to known keys.
+    Each line records the model and dimension; only lines of ``model`` are
+    loaded, and ``dim`` is fixed by the first vector so an index never mixes
+    vector sizes.
+    """
+
+    def __init__(self, path: str, model: str = DEFAULT_MODEL):
+        self.path = path
+        self.model = model
+        self.dim: Optional[int] = None
+        self.vectors: Dict[str, List[float]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        obj = json.loads(line)
+                        vector = obj["embedding"]
+                    except Exception:
+                        continue  # tolerate a torn last line after a crash
+                    if obj.get("model", model) != model or len(vector) != (self.dim or len(vector)):
+                        continue
+                    self.dim = len(vector)
+                    self.vectors[obj["hash"]] = vector
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.vectors
+
+    def add_batch(self, items: Dict[str, List[float]]):
+        dims = {len(v) for v in items.values()} | ({self.dim} if self.dim else set())
+        if len(dims) > 1:
+            raise ValueError(f"{self.path} holds {self.dim}-d vectors for {self.model}, got {sorted(dims)}; "
+                             f"use a fresh checkpoint for a different model or backend")
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for key, vector in items.items():
+                f.write(json.dumps({"hash": key, "model": self.model, "dim": len(vector), "embedding": vector}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.vectors.update(items)
+        if items:
+            self.dim = len(next(iter(items.values())))
+
+
+def _is_retryable(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    name = type(exc).__name__
+    return name in {"RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError"}
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingPipeline:
+    """Batched, concurrent, resumable embedding builder.
+
+    Texts are de-duplicated by content hash, skipped when already present in
+    the checkpoint, grouped into multi-input requests of ``batch_size`` and
+    sent with at most ``concurrency`` requests in flight. Rate-limit and
+    server errors are retried with exponential backoff (honouring
+    ``Retry-After``).
+
+    Args:
+        checkpoint_path: JSON-lines checkpoint / incremental cache file.
+        model: embedding model name.
+        base_url: API base URL; point it at a local fake server for tests.
+        client: optional pre-built ``AsyncOpenAI``-compatible client.
+    """
+
+    def __init__(
+        self,
+        checkpoint_path: str,
+        model: str = DEFAULT_MODEL,
+        batch_size: int = 64,
+        concurrency: int = 4,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        client=None
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.checkpoint = EmbeddingCheckpoint(checkpoint_path, model)
+        self._client = client
+        self._client_kwargs = {"base_url": base_url, "api_key": api_key or os.getenv("OPENAI_API_KEY")}
+        self.stats = {"requests": 0, "retries": 0, "embedded": 0, "reused": 0, "failed": 0}
+
+    def _get_client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+            # retries are handled here, with backoff shared across batches
+            self._client = AsyncOpenAI(max_retries=0, **{k: v for k, v in self._client_kwargs.items() if v is not None})
+        return self._client
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        client = self._get_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.stats["requests"] += 1
+                response = await client.embeddings.create(model=self.model, input=texts)
+                data = sorted(response.data, key=lambda d: d.index)
+                return [d.embedding for d in data]
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    raise
+                self.stats["retries"] += 1
+                delay = _retry_after(e) or min(self.max_delay, self.base_delay * 2 ** attempt)
+                await asyncio.sleep(delay * (0.5 + random.random() / 2))
+
+    async def embed_texts(self, texts: Sequence[str]) -> Dict[str, Optional[List[float]]]:
+        """Embed texts, returning ``{content_hash: embedding or None on failure}``."""
+        wanted = {content_hash(self.model, t): t for t in texts}
+        pending = [(k, t) for k, t in wanted.items() if k not in self.checkpoint]
+        self.stats["reused"] += len(wanted) - len(pending)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        failed = set()
+
+        async def run(batch):
+            async with semaphore:
+                try:
+                    vectors = await self._embed_batch([t for _, t in batch])
+                except Exception as e:
+                    print(f"❌ Embedding batch of {len(batch)} failed: {e}")
+                    failed.update(k for k, _ in batch)
+                    self.stats["failed"] += len(batch)
+                    return
+                self.checkpoint.add_batch({k: v for (k, _), v in zip(batch, vectors)})
+                self.stats["embedded"] += len(batch)
+                print(f"✅ Embedded batch of {len(batch)} ({self.stats['embedded']}/{len(pending)})")
+
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        await asyncio.gather(*(run(b) for b in batches))
+
+        return {k: (None if k in failed else self.checkpoint.vectors.get(k)) for k in wanted}
+
+    def seed_from_chunks(self, chunks: List[Dict], langs: Sequence[str] = DEFAULT_LANGS):
+        """Reuse embeddings already present in a previous output file.
+
+        Only vectors written by this model (``embedding_model``) with the
+        checkpoint's dimension are reused; anything else is re-embedded.
+        """
+        seeded, skipped = {}, 0
+        dim = self.checkpoint.dim
+        for chunk in chunks:
+            for lang in langs:
+                text, vector = chunk.get(f"text_{lang}"), chunk.get(f"embedding_{lang}")
+                if not (text and vector):
+                    continue
+                if chunk.get("embedding_model") != self.model or len(vector) != (dim or len(vector)):
+                    skipped += 1
+                    continue
+                dim = len(vector)
+                key = content_hash(self.model, text)
+                if key not in self.checkpoint:
+                    seeded[key] = vector
+        if skipped:
+            print(f"⚠️ Not reusing {skipped} embeddings from another model or dimension")
+        if seeded:
+            self.checkpoint.add_batch(seeded)
+
+    async def embed_chunks(self, chunks: List[Dict], langs: Sequence[str] = DEFAULT_LANGS):
+        """Attach ``embedding_{lang}`` to each chunk.
+
+        Returns ``(embedded_chunks, error_chunks)``; a chunk goes to the error
+        list if any of its language texts is missing or failed to embed.
+        """
+        texts = [chunk.get(f"text_{lang}") for chunk in chunks for lang in langs]
+        vectors = await self.embed_texts([t for t in texts if t])
+
+        embedded, errors = [], []
+        for idx, chunk in enumerate(chunks):
+            out = {**chunk, "embedding_model": self.model}
+            missing, failed = [], []
+            for lang in langs:
+                text = chunk.get(f"text_{lang}")
+                vector = vectors.get(content_hash(self.model, text)) if text else None
+                if not text:
+                    missing.append(lang)
+                elif vector is None:
+                    failed.append(lang)
+                else:
+                    out[f"embedding_{lang}"] = vector
+            if missing or failed:
+                out["error"] = "; ".join(
+                    f"{label}: {', '.join(langs_)}"
+                    for label, langs_ in (("missing text", missing), ("embedding failed", failed)) if langs_
+                )
+                print(f"[{idx+1}] ❌ Error embedding chunk: {out['error']}")
+                errors.append(out)
+            else:
+                embedded.append(out)
+        return embedded, errors
+
+    def run(self, input_path: str, output_path: str, error_log_path: Optional[str] = None, langs: Sequence[str] = DEFAULT_LANGS):
+        """Embed every chunk of ``input_path`` and write the dual-embedding JSON."""
+        with open(input_path, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+
+        if os.path.exists(output_path):
+            with open(output_path, "r", encoding="utf-8") as f:
+                self.seed_from_chunks(json.load(f), langs)
+
+        embedded, errors = asyncio.run(self.embed_chunks(chunks, langs))
+
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(embedded, f, ensure_ascii=False, indent=2)
+
+        if errors and error_log_path:
+            with open(error_log_path, "w", encoding="utf-8") as f:
+                json.dump(errors, f, ensure_ascii=False, indent=2)
+            print(f"\n⚠️ {len(errors)} chunks failed. See {error_log_path}")
+
+        print(f"\n🎉 {len(embedded)} chunks with embeddings saved to:\n{output_path}")
+        print(f"📊 {self.stats}")
+        return embedded, errors
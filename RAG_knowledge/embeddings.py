@@ -0,0 +1,172 @@
+# rag_knowledge/embeddings.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-large"
+DEFAULT_CACHE_PATH = "outputs/cache/embeddings.sqlite"
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a query for cache keying (NFKC, trimmed, collapsed whitespace)."""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# === embedding backends ===
+
+class OpenAIEmbeddingBackend:
+    """Embeddings from the OpenAI API; the client is created on first use."""
+
+    def __init__(self, model: str = DEFAULT_EMBEDDING_MODEL, client=None):
+        self.model = model
+        self._client = client
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        response = self._client.embeddings.create(model=self.model, input=list(texts))
+        return np.array([d.embedding for d in response.data], dtype=np.float32)
+
+
+class HashingEmbeddingBackend:
+    """Deterministic local stand-in that needs no network access.
+
+    Tokens are hashed into a fixed-size vector and L2-normalized, so equal
+    texts always map to equal vectors. Intended for offline tests and
+    benchmarks, not for retrieval quality.
+    """
+
+    def __init__(self, dim: int = 3072, model: str = "local-hashing"):
+        self.dim = dim
+        self.model = f"{model}-{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+            norm = np.linalg.norm(out[row])
+            if norm > 0:
+                out[row] /= norm
+        return out
+
+
+# === two-tier cache ===
+
+class EmbeddingCache:
+    """Content-addressed embedding cache keyed by (model, normalized text).
+
+    Lookups hit an in-memory LRU first, then an SQLite store on disk. The
+    disk tier is evicted least-recently-used once it exceeds ``max_bytes``
+    of vector data.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, memory_size: int = 1024, max_bytes: int = 512 * 1024 * 1024):
+        self.db_path = db_path
+        self.memory_size = memory_size
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT, dim INTEGER, vector BLOB, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        key = self.make_key(model, text)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._memory[key]
+
+            row = self._conn.execute("SELECT dim, vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            vector = np.frombuffer(row[1], dtype=np.float32).reshape(row[0])
+            self._conn.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self._remember(key, vector)
+            self.stats["disk_hits"] += 1
+            return vector
+
+    def put(self, model: str, text: str, vector: np.ndarray):
+        key = self.make_key(model, text)
+        vector = np.ascontiguousarray(vector, dtype=np.float32).reshape(-1)
+        blob = vector.tobytes()
+        with self._lock:
+            old = self._conn.execute("SELECT LENGTH(vector) FROM embeddings WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, len(vector), blob, time.time())
+            )
+            self._disk_bytes += len(blob) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+            self._remember(key, vector)
+
+    def _evict(self):
+        while self._disk_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._disk_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._memory.pop(key, None)
+                self._disk_bytes -= size
+                self.stats["evictions"] += 1
+
+    def get_or_compute(self, model: str, text: str, compute: Callable[[str], np.ndarray]) -> np.ndarray:
+        vector = self.get(model, text)
+        if vector is None:
+            vector = np.asarray(compute(text), dtype=np.float32).reshape(-1)
+            self.put(model, text, vector)
+        return vector
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {**self.stats, "memory_entries": len(self._memory), "disk_entries": entries, "disk_bytes": self._disk_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._disk_bytes = 0
@@ -0,0 +1,72 @@
+# rag_knowledge/fake_embedding_server.py
+"""Minimal local stand-in for the ``/v1/embeddings`` endpoint.
+
+Vectors come from ``HashingEmbeddingBackend`` so runs are deterministic and
+offline. ``rate_limit_every`` makes every N-th request return HTTP 429 to
+exercise the pipeline's retry path.
+
+    python -m RAG_knowledge.fake_embedding_server --port 8765
+    python -m RAG_knowledge.generate_embeddings_openai --base-url http://127.0.0.1:8765/v1 ...
+"""
+import argparse
+import itertools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from RAG_knowledge.embeddings import HashingEmbeddingBackend
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, dim: int = 3072, rate_limit_every: int = 0) -> ThreadingHTTPServer:
+    backend = HashingEmbeddingBackend(dim=dim)
+    counter = itertools.count(1)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: dict, headers: dict = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/embeddings"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            with lock:
+                n = next(counter)
+            if rate_limit_every and n % rate_limit_every == 0:
+                self._send(429, {"error": {"message": "rate limited", "type": "rate_limit_error"}}, {"retry-after": "0.01"})
+                return
+
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            texts = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            vectors = backend.embed(texts)
+            self._send(200, {
+                "object": "list",
+                "model": request.get("model", backend.model),
+                "data": [{"object": "embedding", "index": i, "embedding": v.tolist()} for i, v in enumerate(vectors)],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake embedding server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.dim, args.rate_limit_every)
+    print(f"🧪 Fake embedding server on http://{args.host}:{server.server_address[1]}/v1")
+    server.serve_forever()
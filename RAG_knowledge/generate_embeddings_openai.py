@@ -1,60 +1,36 @@
-from openai import OpenAI
-import json
-import time
+import argparse
 import os
 from dotenv import load_dotenv
-
-# initialize OpenAI client
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-
-# file paths
-INPUT_PATH = r"E:\UTS_work_code\Agentic_AI\Agentic_AI_MCP_1\RAG_knowledge\regulations_data\USA_crack_control_chunks_translated_en.json"
-OUTPUT_PATH = r"E:\UTS_work_code\Agentic_AI\Agentic_AI_MCP_1\RAG_knowledge\regulations_embeddings\USA_crack_control_chunks_with_dual_embeddings.json"
-ERROR_LOG_PATH = r"E:\UTS_work_code\Agentic_AI\Agentic_AI_MCP\RAG\embedding_dual_errors.json"
-
-# load bilingual structured text
-with open(INPUT_PATH, "r", encoding="utf-8") as f:
-    chunks = json.load(f)
-
-embedded_chunks = []
-error_chunks = []
-
-for idx, chunk in enumerate(chunks):
-    try:
-        # Chinese embedding
-        embedding_zh = client.embeddings.create(
-            model="text-embedding-3-large",
-            input=chunk["text_zh"]
-        ).data[0].embedding
-        chunk["embedding_zh"] = embedding_zh
-
-        # English embedding
-        embedding_en = client.embeddings.create(
-            model="text-embedding-3-large",
-            input=chunk["text_en"]
-        ).data[0].embedding
-        chunk["embedding_en"] = embedding_en
-
-        embedded_chunks.append(chunk)
-        print(f"[{idx+1}/{len(chunks)}] ✅ Embedded (ZH + EN)")
-        time.sleep(1)
-
-    except Exception as e:
-        print(f"[{idx+1}] ❌ Error embedding chunk: {e}")
-        chunk["error"] = str(e)
-        error_chunks.append(chunk)
-        continue
-
-# save embeddings with both languages
-with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-    json.dump(embedded_chunks, f, ensure_ascii=False, indent=2)
-
-# save error log
-if error_chunks:
-    with open(ERROR_LOG_PATH, "w", encoding="utf-8") as f:
-        json.dump(error_chunks, f, ensure_ascii=False, indent=2)
-    print(f"\n⚠️ {len(error_chunks)} chunks failed. See {ERROR_LOG_PATH}")
-
-print(f"\n🎉 All done! {len(embedded_chunks)} chunks with dual embeddings saved to:\n{OUTPUT_PATH}")
+from RAG_knowledge.embedding_pipeline import EmbeddingPipeline, DEFAULT_MODEL
+
+# default file paths (relative to the repository root)
+INPUT_PATH = "RAG_knowledge/regulations_data/USA_crack_control_chunks_translated_en.json"
+OUTPUT_PATH = "RAG_knowledge/regulations_embeddings/USA_crack_control_chunks_with_dual_embeddings.json"
+ERROR_LOG_PATH = "RAG_knowledge/regulations_embeddings/embedding_dual_errors.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed bilingual regulation chunks (ZH + EN)")
+    parser.add_argument("--input", default=INPUT_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--error-log", default=ERROR_LOG_PATH)
+    parser.add_argument("--checkpoint", default=None, help="defaults to <output>.checkpoint.jsonl")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--base-url", default=None, help="e.g. a local fake server for tests")
+    args = parser.parse_args()
+
+    load_dotenv()
+    pipeline = EmbeddingPipeline(
+        checkpoint_path=args.checkpoint or os.path.splitext(args.output)[0] + ".checkpoint.jsonl",
+        model=args.model,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        base_url=args.base_url,
+    )
+    pipeline.run(args.input, args.output, args.error_log)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,16 @@
 from dotenv import load_dotenv
 import os
 import pickle
+import threading
 import faiss
 import numpy as np
-from openai import OpenAI
+from RAG_knowledge.chunk_store import ChunkStore
+from RAG_knowledge.embeddings import EmbeddingCache, OpenAIEmbeddingBackend, DEFAULT_CACHE_PATH
+from tools.openai_client import get_openai_client
+from tools.tracing import span
 
-# initialize OpenAI client (requires API key)
+# the OpenAI client (requires API key) is created on the first embedding request
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # vector store directory
 VECTOR_STORE_DIR = "rag_knowledge/vector_store"
@@ -17,45 +20,151 @@ VECTOR_STORE_DIR = "rag_knowledge/vector_store"
 AVAILABLE_COUNTRIES = ["USA", "AU"]
 AVAILABLE_LANGS = ["zh", "en"]
 
+# memory-map FAISS indexes instead of reading them into RAM
+USE_MMAP = os.getenv("RAG_FAISS_MMAP", "0") == "1"
 
-def load_vector_store(country: str = "USA", lang: str = "zh"):
+# process-wide vector store registry: (country, lang) -> loaded store
+_vector_stores = {}
+_vector_store_lock = threading.Lock()
+_vector_store_stats = {"hits": 0, "misses": 0, "reloads": 0}
+
+
+def _vector_store_paths(country: str, lang: str):
+    """Index and chunk paths; the slim .jsonl chunk store is preferred over legacy .pkl."""
+    index_path = os.path.join(VECTOR_STORE_DIR, f"{country}_crack_{lang}.index")
+    chunks_path = os.path.join(VECTOR_STORE_DIR, f"{country}_crack_{lang}_chunks.jsonl")
+    if not os.path.exists(chunks_path):
+        chunks_path = os.path.join(VECTOR_STORE_DIR, f"{country}_crack_{lang}_chunks.pkl")
+    return index_path, chunks_path
+
+
+def load_vector_store(country: str = "USA", lang: str = "zh", use_mmap: bool = None):
     """Load vector index and paragraphs for the given country and language.
-    File format: {country}_crack_{lang}.index / .pkl"""
+    File format: {country}_crack_{lang}.index / _chunks.jsonl (or legacy .pkl)
+
+    Each store is read from disk once per process and reused; it is reloaded
+    automatically when either file's mtime changes.
+    """
     # sanity checks
     if country not in AVAILABLE_COUNTRIES:
         raise ValueError(f"Unsupported country: {country}. Available: {AVAILABLE_COUNTRIES}")
     if lang not in AVAILABLE_LANGS:
         raise ValueError(f"Unsupported language: {lang}. Available: {AVAILABLE_LANGS}")
 
-    index_path = os.path.join(VECTOR_STORE_DIR, f"{country}_crack_{lang}.index")
-    chunks_path = os.path.join(VECTOR_STORE_DIR, f"{country}_crack_{lang}_chunks.pkl")
+    index_path, chunks_path = _vector_store_paths(country, lang)
 
     if not os.path.exists(index_path) or not os.path.exists(chunks_path):
         raise FileNotFoundError(f"Missing vector file or paragraph data:\n{index_path}\n{chunks_path}")
 
-    index = faiss.read_index(index_path)
-    with open(chunks_path, "rb") as f:
-        chunks = pickle.load(f)
+    if use_mmap is None:
+        use_mmap = USE_MMAP
+    mtimes = (os.path.getmtime(index_path), os.path.getmtime(chunks_path))
+    key = (country, lang)
+
+    with _vector_store_lock:
+        cached = _vector_stores.get(key)
+        if cached is not None and cached["mtimes"] == mtimes:
+            _vector_store_stats["hits"] += 1
+            return cached["index"], cached["chunks"]
+
+        _vector_store_stats["misses"] += 1
+        if cached is not None:
+            _vector_store_stats["reloads"] += 1
+
+        if use_mmap:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        else:
+            index = faiss.read_index(index_path)
+        if chunks_path.endswith(".jsonl"):
+            chunks = ChunkStore(chunks_path)
+        else:
+            with open(chunks_path, "rb") as f:
+                chunks = pickle.load(f)
+
+        _vector_stores[key] = {"index": index, "chunks": chunks, "mtimes": mtimes, "mmap": use_mmap}
 
     return index, chunks
 
 
-def embed_query(text: str) -> np.ndarray:
-    """Call OpenAI embedding API to convert text into a vector."""
-    response = client.embeddings.create(
-        model="text-embedding-3-large",
-        input=[text]
-    )
-    embedding = np.array(response.data[0].embedding, dtype=np.float32)
-    return embedding.reshape(1, -1)
+def warmup_vector_stores(combos=None):
+    """Load the given (country, lang) stores ahead of the first query.
+
+    Defaults to every combination available on disk; returns the loaded keys.
+    """
+    combos = combos if combos is not None else list_available_knowledge_bases()
+    for country, lang in combos:
+        load_vector_store(country, lang)
+    return list(combos)
+
+
+def get_vector_store_stats() -> dict:
+    """Return registry hit/miss counters and the currently loaded stores."""
+    with _vector_store_lock:
+        return {
+            **_vector_store_stats,
+            "loaded": {
+                f"{country}_{lang}": {"vectors": store["index"].ntotal, "chunks": len(store["chunks"]), "mmap": store["mmap"]}
+                for (country, lang), store in _vector_stores.items()
+            }
+        }
+
+
+def clear_vector_store_cache():
+    """Drop every loaded store and reset the counters."""
+    with _vector_store_lock:
+        _vector_stores.clear()
+        for k in _vector_store_stats:
+            _vector_store_stats[k] = 0
+
+
+# query embedding backend and cache (created on first use)
+EMBEDDING_CACHE_PATH = os.getenv("RAG_EMBED_CACHE", DEFAULT_CACHE_PATH)
+_embedding_backend = None
+_embedding_cache = None
+
+
+def get_embedding_backend():
+    global _embedding_backend
+    if _embedding_backend is None:
+        _embedding_backend = OpenAIEmbeddingBackend(model="text-embedding-3-large", client=get_openai_client())
+    return _embedding_backend
+
+
+def set_embedding_backend(backend):
+    """Swap the query embedding backend, e.g. for ``HashingEmbeddingBackend`` offline."""
+    global _embedding_backend
+    _embedding_backend = backend
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+    return _embedding_cache
+
+
+def embed_query(text: str, use_cache: bool = True) -> np.ndarray:
+    """Convert text into a vector with the configured embedding backend.
+
+    Repeated queries are served from the (model, normalized text) cache.
+    """
+    backend = get_embedding_backend()
+    with span("rag.embed", model=backend.model, cached=use_cache):
+        if use_cache:
+            embedding = get_embedding_cache().get_or_compute(backend.model, text, lambda t: backend.embed([t])[0])
+        else:
+            embedding = backend.embed([text])[0]
+    return np.asarray(embedding, dtype=np.float32).reshape(1, -1)
 
 
 def retrieve_context(query: str, country: str = "USA", lang: str = "zh", top_k: int = 5):
     """Retrieve top-k relevant paragraphs from the knowledge base."""
-    index, chunks = load_vector_store(country, lang)
+    with span("rag.load_store", country=country, lang=lang):
+        index, chunks = load_vector_store(country, lang)
     query_vec = embed_query(query)
-    D, I = index.search(query_vec, top_k)
-    results = [chunks[i] for i in I[0]]
+    with span("rag.search", top_k=top_k):
+        D, I = index.search(query_vec, top_k)
+    results = [chunks[int(i)] for i in I[0] if i >= 0]
     return results
 
 
@@ -74,8 +183,7 @@ def list_available_knowledge_bases():
     combos = []
     for country in AVAILABLE_COUNTRIES:
         for lang in AVAILABLE_LANGS:
-            index_path = os.path.join(VECTOR_STORE_DIR, f"{country}_crack_{lang}.index")
-            chunks_path = os.path.join(VECTOR_STORE_DIR, f"{country}_crack_{lang}_chunks.pkl")
+            index_path, chunks_path = _vector_store_paths(country, lang)
             if os.path.exists(index_path) and os.path.exists(chunks_path):
                 combos.append((country, lang))
     return combos
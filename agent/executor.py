@@ -1,11 +1,34 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
 import os
+import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
 from MCP.tool import tool_registry
 from agent.object_memory_manager import ObjectMemoryManager
+from tools.mask_format import mask_suffix
+from tools.results_store import (
+    get_results_store, reset_results_stores, capture_upserts, apply_upserts, PREDICTED_METRICS_CSV
+)
+from tools.tracing import span, collect_spans, record_spans, summarize_spans, reset_tracing, write_prometheus
 
 object_store = ObjectMemoryManager()
 
+# CPU-bound tools run in worker processes; everything else (torch inference,
+# which releases the GIL, and network-bound tools) runs on threads
+PROCESS_POOL_TOOLS = {"quantify_crack_geometry"}
+# tools with no data dependencies on image steps
+INDEPENDENT_TOOLS = {"rag_answer"}
+DEFAULT_MAX_WORKERS = os.cpu_count() or 1
+# tools that run the UNet; one forward pass peaks at several GB, so at most
+# MAX_MODEL_WORKERS of them are in flight regardless of max_workers
+MODEL_TOOLS = {"segment_crack_image", "segment_crack_images", "segment_and_quantify"}
+MAX_MODEL_WORKERS = int(os.getenv("CRACK_MAX_MODEL_WORKERS", 1))
+# run segment -> quantify pairs on one subject as a single segment_and_quantify step;
+# by default only for serial plans, see execute_plan
+FUSE_PIPELINE = os.getenv("CRACK_FUSE_PIPELINE", "1") != "0"
+# where segment_crack_image saves masks (MCP.segment.MASK_OUTPUT_DIR, not imported to keep torch out)
+MASK_OUTPUT_DIR = os.path.join("outputs", "masks")
+
 def patch_image_paths(plan: list, base_folder: str = "data") -> list:
     for step in plan:
         args = step.get("args", {})
@@ -16,108 +39,414 @@ def patch_image_paths(plan: list, base_folder: str = "data") -> list:
                     args[key] = os.path.join(base_folder, path)
     return plan
 
-def execute_plan(plan: List[Dict[str, Any]], memory=None) -> List[Dict[str, Any]]:
+def expand_batch_segmentation(result: Dict[str, Any], args: Dict[str, Any], action: str = "") -> List[Dict[str, Any]]:
+    """Split a ``segment_crack_images`` result into per-image ``segment_crack_image`` records.
+
+    Downstream memory and object-store logic keys on single-image records, so
+    the batch is reported as if each image had been segmented on its own.
+    """
+    outputs = result.get("outputs") or {}
+    per_image = outputs.get("results")
+    if per_image is None:
+        per_image = [
+            {"image_path": p, "mask_path": None, "status": "error", "error": result.get("error")}
+            for p in args.get("image_paths", [])
+        ]
+
+    records = []
+    for item in per_image:
+        ok = item["status"] == "success"
+        records.append({
+            "tool": "segment_crack_image",
+            "status": item["status"],
+            "summary": "Segmentation complete; mask saved" if ok else "Segmentation failed",
+            "outputs": {"mask_path": item["mask_path"]} if ok else None,
+            "visualizations": {},
+            "error": item.get("error"),
+            "args": {"image_path": item["image_path"]},
+            "subject": os.path.splitext(os.path.basename(item["image_path"]))[0],
+            "action": action
+        })
+    return records
+
+def _segment_output_path(image_path: str) -> str:
+    return os.path.join(MASK_OUTPUT_DIR, os.path.splitext(os.path.basename(image_path))[0] + mask_suffix())
+
+def fuse_segment_quantify(plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge each ``segment_crack_image`` step with the next quantify step on its mask.
+
+    The pair becomes one ``segment_and_quantify`` step that hands the mask
+    over in memory. A pair is only fused when the quantify step reads the
+    mask this segmentation writes and no step in between touches the same
+    subject. The original steps are kept under ``fused`` so the result can
+    be reported as the two records the plan asked for.
+    """
+    fused_plan = list(plan)
+    for i, step in enumerate(plan):
+        if step.get("tool") != "segment_crack_image" or "image_path" not in step.get("args", {}):
+            continue
+        mask_path = os.path.normpath(_segment_output_path(step["args"]["image_path"]))
+        mine = _step_subjects(step)
+        for j in range(i + 1, len(plan)):
+            other = plan[j]
+            if (other.get("tool") == "quantify_crack_geometry" and fused_plan[j] is other
+                    and os.path.normpath(other.get("args", {}).get("mask_path", "")) == mask_path):
+                quantify_args = {k: v for k, v in other["args"].items() if k != "mask_path"}
+                fused_plan[i] = {
+                    **other,
+                    "tool": "segment_and_quantify",
+                    "args": {**step["args"], **quantify_args},
+                    "fused": [step, other],
+                }
+                fused_plan[j] = None
+                break
+            theirs = _step_subjects(other)
+            if other.get("tool") not in INDEPENDENT_TOOLS and (mine is None or theirs is None or mine & theirs):
+                break
+    return [step for step in fused_plan if step is not None]
+
+def split_fused_result(result: Dict[str, Any]):
+    """Split a ``segment_and_quantify`` result into segment and quantify results."""
+    outputs = dict(result.get("outputs") or {})
+    mask_path = outputs.pop("mask_path", None)
+    segmented = not str(result.get("summary", "")).startswith("Segmentation failed")
+    segment_result = {
+        "status": "success" if segmented else "error",
+        "summary": "Segmentation complete; mask saved" if segmented else "Segmentation failed",
+        "outputs": {"mask_path": mask_path} if segmented else None,
+        "error": None if segmented else result.get("error"),
+    }
+    quantify_result = {**result, "outputs": outputs or None}
+    if not segmented:
+        quantify_result["error"] = "Segmentation failed; nothing to quantify"
+    return segment_result, quantify_result
+
+def restore_plan_order(plan: List[Dict[str, Any]], executed: List[Dict[str, Any]],
+                       groups: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Flatten the records of ``executed`` steps in the order of the original ``plan``.
+
+    ``groups[k]`` holds the records of ``executed[k]``. A fused step's segment
+    and quantify records go back to the plan positions of the two steps it
+    replaced, so fused and unfused runs report the same sequence.
+    """
+    position = {id(step): k for k, step in enumerate(plan)}
+    placed = []
+    for step, records in zip(executed, groups):
+        fused = step.get("fused")
+        if fused and len(records) == 2:
+            placed += [(position[id(fused[0])], records[:1]), (position[id(fused[1])], records[1:])]
+        else:
+            placed.append((position[id(fused[0] if fused else step)], records))
+    placed.sort(key=lambda item: item[0])
+    return [record for _, records in placed for record in records]
+
+def _step_subjects(step: Dict[str, Any]) -> Optional[Set[str]]:
+    """Subjects a step reads or writes; ``None`` means it touches everything."""
+    if step.get("tool") == "segment_crack_images":
+        return {os.path.splitext(os.path.basename(p))[0] for p in step.get("args", {}).get("image_paths", [])}
+    subject = step.get("subject")
+    return {subject} if subject else None
+
+def build_dependencies(plan: List[Dict[str, Any]]) -> List[Set[int]]:
+    """Dependency graph of a plan: ``deps[i]`` holds the indices step ``i`` waits for.
+
+    Steps on the same subject keep their plan order (segment -> quantify ->
+    generate). Steps without a subject act as barriers, and tools in
+    ``INDEPENDENT_TOOLS`` depend on nothing.
+    """
+    deps: List[Set[int]] = []
+    subjects = [_step_subjects(step) for step in plan]
+    for i, step in enumerate(plan):
+        if step.get("tool") in INDEPENDENT_TOOLS:
+            deps.append(set())
+            continue
+        mine = subjects[i]
+        deps.append({
+            j for j in range(i)
+            if plan[j].get("tool") not in INDEPENDENT_TOOLS
+            and (mine is None or subjects[j] is None or mine & subjects[j])
+        })
+    return deps
+
+def _init_worker():
+    # forked workers must not share the parent's SQLite connections or trace file
+    reset_results_stores()
+    reset_tracing()
+
+def _call_tool(tool_fn, tool_name: str, args: Dict[str, Any]):
+    """Run one tool under a ``tool.<name>`` span; returns ``(result, spans)``."""
+    with collect_spans() as spans, span(f"tool.{tool_name}"):
+        result = tool_fn(**args)
+    return result, spans
+
+def _call_tool_deferred(tool_fn, tool_name: str, args: Dict[str, Any]):
+    """Like ``_call_tool`` but hold back result-store rows; returns ``(result, spans, rows)``.
+
+    The caller applies the rows when it commits the step, so CSV rows follow
+    plan order instead of completion order.
+    """
+    with capture_upserts() as rows:
+        result, spans = _call_tool(tool_fn, tool_name, args)
+    return result, spans, rows
+
+def _run_tool(tool_name: str, args: Dict[str, Any]):
+    """Worker-process entry point: resolve the tool by name and run it."""
+    tool_fn = tool_registry[tool_name]  # lazy entries import their module here
+    return _call_tool_deferred(tool_fn, tool_name, args)
+
+def _error_record(tool_name, args, subject, action, summary, error) -> Dict[str, Any]:
+    return {
+        "tool": tool_name,
+        "status": "error",
+        "summary": summary,
+        "outputs": None,
+        "visualizations": None,
+        "error": error,
+        "args": args,
+        "subject": subject,
+        "action": action
+    }
+
+def _prepare_step(step: Dict[str, Any], memory=None):
+    """Normalize args before dispatch; returns the tool function or ``None``."""
+    tool_name = step.get("tool")
+    args = step.setdefault("args", {})
+    subject = step.get("subject", "")
+
+    # masks from fused steps may still be queued for writing
+    if "MCP.pipeline" in sys.modules and args.get("mask_path"):
+        sys.modules["MCP.pipeline"].wait_for_masks([args["mask_path"]])
+
+    # remove empty visuals field
+    if tool_name in ["quantify_crack_geometry", "segment_and_quantify"]:
+        visuals = args.get("visuals", None)
+        if visuals is not None and len(visuals) == 0:
+            del args["visuals"]
+
+    # auto fill pixel_size_mm
+    if tool_name in ["quantify_crack_geometry", "segment_and_quantify", "generate_crack_visuals"]:
+        if "pixel_size_mm" not in args or args["pixel_size_mm"] is None:
+            if memory is not None and hasattr(memory, "get_pixel_size"):
+                pixel_from_memory = memory.get_pixel_size(subject)
+                if pixel_from_memory is not None:
+                    args["pixel_size_mm"] = pixel_from_memory
+                    print(f"[🔁] auto-filled pixel_size_mm={pixel_from_memory} for subject={subject}")
+
+    tool_fn = tool_registry.get(tool_name)
+    return tool_fn if callable(tool_fn) else None
+
+def _commit_result(step: Dict[str, Any], result: Dict[str, Any], memory=None, spans=()) -> List[Dict[str, Any]]:
+    """Turn a tool result into result records and apply object-store / memory updates."""
+    timings = summarize_spans(spans)
+    tool_name = step.get("tool")
+    args = step.get("args", {})
+    subject = step.get("subject", "")
+    action = step.get("action", "")  # explicitly get the action field
+
+    # batched segmentation expands into one record per image
+    if tool_name == "segment_crack_images":
+        records = expand_batch_segmentation(result, args, action)
+        for record in records:
+            record["timings"] = timings  # shared by every image of the batch
+            record_args = record["args"]
+            object_id = object_store.find_id_by_image_path(record_args["image_path"])
+            if object_id and record["status"] == "success":
+                object_store.update(object_id, "segmentation_path", record["outputs"]["mask_path"])
+                object_store.add_status(object_id, "segmented")
+            if memory is not None and hasattr(memory, "handle_result"):
+                memory.handle_result(record["subject"], record["tool"], record, step)
+        return records
+
+    # a fused segment -> quantify step reports the two steps it replaced
+    if tool_name == "segment_and_quantify" and step.get("fused"):
+        segment_step, quantify_step = step["fused"]
+        segment_result, quantify_result = split_fused_result(result)
+        # keep auto-filled args such as pixel_size_mm on the quantify record
+        quantify_args = {k: v for k, v in args.items() if k not in segment_step["args"]}
+        quantify_step = {**quantify_step, "args": {**quantify_step["args"], **quantify_args}}
+        return (_commit_result(segment_step, segment_result, memory, spans)
+                + _commit_result(quantify_step, quantify_result, memory, spans))
+
+    # update object store
+    if tool_name == "segment_crack_image" and result.get("status") == "success":
+        image_path = args.get("image_path", "")
+        object_id = object_store.find_id_by_image_path(image_path)
+        mask_path = result["outputs"].get("mask_path")
+        if object_id and mask_path:
+            object_store.update(object_id, "segmentation_path", mask_path)
+            object_store.add_status(object_id, "segmented")
+
+    elif tool_name == "quantify_crack_geometry" and result.get("status") == "success":
+        mask_path = args.get("mask_path", "")
+        object_id = object_store.find_id_by_mask_path(mask_path)
+        vis_path = result.get("visualizations", {}).get("max_width_overlay")
+        if object_id:
+            if vis_path:
+                object_store.update(object_id, "visualization_path", vis_path)
+            object_store.add_status(object_id, "quantified")
+
+    # compose result record
+    outputs = result.get("outputs", {}) or {}
+    visuals = result.get("visualizations", {}) or {}
+
+    merged_outputs = {**outputs, **visuals}
+
+    result_record = {
+        "tool": tool_name,
+        "status": result.get("status", "unknown"),
+        "summary": result.get("summary", ""),
+        "outputs": merged_outputs,
+        "visualizations": visuals,
+        "error": result.get("error", None),
+        "args": args,
+        "subject": subject,
+        "action": action,
+        "timings": timings
+    }
+
+    # write to memory based on action
+    if memory is not None and hasattr(memory, "handle_result"):
+        memory.handle_result(subject, tool_name, result, step)
+
+    return [result_record]
+
+def execute_plan(plan: List[Dict[str, Any]], memory=None, max_workers: int = None, fuse: bool = None) -> List[Dict[str, Any]]:
+    """Run a plan, dispatching independent steps concurrently.
+
+    With ``fuse`` segment -> quantify pairs run as one ``segment_and_quantify``
+    step, see ``fuse_segment_quantify``. A fused step quantifies on the
+    thread that ran the model instead of in the process pool, so by default
+    (``fuse=None``) plans are only fused when ``FUSE_PIPELINE`` is set and
+    they run serially; concurrent plans keep quantification in worker
+    processes. Records come back in plan order either way.
+
+    Steps are scheduled as soon as their dependencies (see
+    ``build_dependencies``) finish, with at most ``max_workers`` in flight.
+    Results are committed, and object-store / memory updates and metric
+    rows applied, in plan order on the calling thread. Model-bound tools
+    (``MODEL_TOOLS``) are further capped at ``MAX_MODEL_WORKERS`` to bound
+    peak memory. ``max_workers=1`` runs serially in-process.
+    """
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    if fuse is None:
+        fuse = FUSE_PIPELINE and max_workers <= 1
+    executed = fuse_segment_quantify(plan) if fuse else plan
+    store = get_results_store(PREDICTED_METRICS_CSV)
+    # metric rows from every step are flushed and exported to CSV once at the end
+    with store.batch():
+        if max_workers <= 1 or len(executed) <= 1:
+            groups = _execute_serial(executed, memory)
+        else:
+            groups = _execute_concurrent(executed, memory, max_workers)
+    results = restore_plan_order(plan, executed, groups)
+    # every mask a fused step saved asynchronously is on disk once the plan returns
+    if "MCP.pipeline" in sys.modules:
+        sys.modules["MCP.pipeline"].wait_for_masks()
+    write_prometheus()
+    return results
+
+def _execute_serial(plan: List[Dict[str, Any]], memory=None) -> List[List[Dict[str, Any]]]:
     results = []
 
     for step in plan:
         tool_name = step.get("tool")
+        tool_fn = _prepare_step(step, memory)
         args = step.get("args", {})
-        subject = step.get("subject", "")
-        action = step.get("action", "")  # explicitly get the action field
-
-        tool_fn = tool_registry.get(tool_name)
-        print("🧰 available tools:", list(tool_registry.keys()))
-
-
-        # remove empty visuals field
-        if tool_name == "quantify_crack_geometry":
-            visuals = args.get("visuals", None)
-            if visuals is not None and len(visuals) == 0:
-                del args["visuals"]
 
         # tool not registered
-        if not callable(tool_fn):
-            results.append({
-                "tool": tool_name,
-                "status": "error",
-                "summary": f"Tool not registered: {tool_name}",
-                "outputs": None,
-                "visualizations": None,
-                "error": "Tool not found in registry",
-                "args": args,
-                "subject": subject,
-                "action": action
-            })
+        if tool_fn is None:
+            results.append([_error_record(tool_name, args, step.get("subject", ""), step.get("action", ""),
+                                          f"Tool not registered: {tool_name}", "Tool not found in registry")])
             continue
 
         try:
-            # auto fill pixel_size_mm
-            if tool_name in ["quantify_crack_geometry", "generate_crack_visuals"]:
-                if "pixel_size_mm" not in args or args["pixel_size_mm"] is None:
-                    if memory is not None and hasattr(memory, "get_pixel_size"):
-                        pixel_from_memory = memory.get_pixel_size(subject)
-                        if pixel_from_memory is not None:
-                            args["pixel_size_mm"] = pixel_from_memory
-                            print(f"[🔁] auto-filled pixel_size_mm={pixel_from_memory} for subject={subject}")
-
             # execute tool function
-            result = tool_fn(**args)
-
-            # update object store
-            if tool_name == "segment_crack_image" and result.get("status") == "success":
-                image_path = args.get("image_path", "")
-                object_id = object_store.find_id_by_image_path(image_path)
-                mask_path = result["outputs"].get("mask_path")
-                if object_id and mask_path:
-                    object_store.update(object_id, "segmentation_path", mask_path)
-                    object_store.add_status(object_id, "segmented")
-
-            elif tool_name == "quantify_crack_geometry" and result.get("status") == "success":
-                mask_path = args.get("mask_path", "")
-                object_id = object_store.find_id_by_mask_path(mask_path)
-                vis_path = result.get("visualizations", {}).get("max_width_overlay")
-                if object_id:
-                    if vis_path:
-                        object_store.update(object_id, "visualization_path", vis_path)
-                    object_store.add_status(object_id, "quantified")
-
-            # compose result record
-            outputs = result.get("outputs", {}) or {}
-            visuals = result.get("visualizations", {}) or {}
-
-            merged_outputs = {**outputs, **visuals}
-
-            result_record = {
-                "tool": tool_name,
-                "status": result.get("status", "unknown"),
-                "summary": result.get("summary", ""),
-                "outputs": merged_outputs,
-                "visualizations": visuals,
-                "error": result.get("error", None),
-                "args": args,
-                "subject": subject,
-                "action": action
-            }
-
-            results.append(result_record)
-
-            # write to memory based on action
-            if memory is not None and hasattr(memory, "handle_result"):
-                memory.handle_result(subject, tool_name, result, step)
+            result, spans = _call_tool(tool_fn, tool_name, args)
+            results.append(_commit_result(step, result, memory, spans))
 
         except Exception as e:
             print(f"[❌ ERROR] tool {tool_name} failed: {e}")
             traceback.print_exc()
-            results.append({
-                "tool": tool_name,
-                "status": "error",
-                "summary": f"Execution of {tool_name} failed",
-                "outputs": None,
-                "visualizations": None,
-                "error": traceback.format_exc(),
-                "args": args,
-                "subject": subject,
-                "action": action
-            })
+            results.append([_error_record(tool_name, args, step.get("subject", ""), step.get("action", ""),
+                                          f"Execution of {tool_name} failed", traceback.format_exc())])
 
     return results
+
+def _execute_concurrent(plan: List[Dict[str, Any]], memory, max_workers: int) -> List[List[Dict[str, Any]]]:
+    deps = build_dependencies(plan)
+    done: Set[int] = set()
+    outcomes: Dict[int, List[Dict[str, Any]]] = {}
+    raw: Dict[int, Any] = {}
+    running = {}
+    next_commit = 0
+
+    thread_pool = ThreadPoolExecutor(max_workers=max_workers)
+    process_pool = None
+    try:
+        pending = list(range(len(plan)))
+        while pending or running:
+            # dispatch every ready step while under the parallelism caps
+            for i in list(pending):
+                if len(running) >= max_workers:
+                    break
+                step = plan[i]
+                tool_name = step.get("tool")
+                if not deps[i] <= done:
+                    continue
+                if tool_name in MODEL_TOOLS and sum(plan[k].get("tool") in MODEL_TOOLS for k in running.values()) >= MAX_MODEL_WORKERS:
+                    continue
+                pending.remove(i)
+                tool_fn = _prepare_step(step, memory)
+                if tool_fn is None:
+                    raw[i] = _error_record(tool_name, step.get("args", {}), step.get("subject", ""), step.get("action", ""),
+                                           f"Tool not registered: {tool_name}", "Tool not found in registry")
+                    done.add(i)
+                    continue
+                if tool_name in PROCESS_POOL_TOOLS:
+                    if process_pool is None:
+                        process_pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+                    future = process_pool.submit(_run_tool, tool_name, step["args"])
+                else:
+                    future = thread_pool.submit(_call_tool_deferred, tool_fn, tool_name, step["args"])
+                running[future] = i
+
+            if running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    i = running.pop(future)
+                    try:
+                        raw[i] = future.result()
+                        if plan[i].get("tool") in PROCESS_POOL_TOOLS:
+                            record_spans(raw[i][1])  # fold worker timings into this process's summary
+                    except Exception as e:
+                        tool_name = plan[i].get("tool")
+                        print(f"[❌ ERROR] tool {tool_name} failed: {e}")
+                        raw[i] = e
+                    done.add(i)
+
+            # commit finished steps strictly in plan order
+            while next_commit < len(plan) and next_commit in done:
+                step = plan[next_commit]
+                result = raw.pop(next_commit)
+                tool_name = step.get("tool")
+                if isinstance(result, Exception):
+                    error = "".join(traceback.format_exception(type(result), result, result.__traceback__))
+                    outcomes[next_commit] = [_error_record(tool_name, step.get("args", {}), step.get("subject", ""), step.get("action", ""),
+                                                           f"Execution of {tool_name} failed", error)]
+                elif isinstance(result, dict):
+                    outcomes[next_commit] = [result]  # error record built at dispatch
+                else:
+                    try:
+                        apply_upserts(result[2])
+                        outcomes[next_commit] = _commit_result(step, result[0], memory, result[1])
+                    except Exception:
+                        traceback.print_exc()
+                        outcomes[next_commit] = [_error_record(tool_name, step.get("args", {}), step.get("subject", ""), step.get("action", ""),
+                                                               f"Execution of {tool_name} failed", traceback.format_exc())]
+                next_commit += 1
+    finally:
+        thread_pool.shutdown(wait=True)
+        if process_pool is not None:
+            process_pool.shutdown(wait=True)
+
+    return [outcomes[i] for i in range(len(plan))]
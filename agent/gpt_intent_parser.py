@@ -1,10 +1,9 @@
 import os
 import json
 from dotenv import load_dotenv
-from openai import OpenAI
+from tools.openai_client import get_openai_client
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 SYSTEM_PROMPT = (
     "You are a planning assistant for crack image analysis tasks.\n"
@@ -92,7 +91,7 @@ def generate_composite_plan(user_input: str) -> dict:
     """Use GPT function calling to output a multi-step analysis plan.
     Each step is a structured object for stability.
     """
-    response = client.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model="gpt-4o",
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
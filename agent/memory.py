@@ -1,13 +1,32 @@
 import os
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
 
 class MemoryController:
-    def __init__(self, filepath: str = "memory_store.jsonl"):
+    """Session memory of segment / quantify / save records.
+
+    Records live in ``self.records`` and are indexed by subject, by
+    (subject, task) and by (subject, task, pixel_size_mm) so lookups do not
+    scan the whole history. Every record carries a ``record_id``; mutations
+    append the updated record to the JSONL log and replay as replacements.
+    Once ``compact_every`` lines accumulate in the log, all records are
+    written to ``<name>.snapshot.jsonl`` and the log is truncated, so startup
+    reads the snapshot plus a short tail.
+    """
+
+    def __init__(self, filepath: str = "memory_store.jsonl", compact_every: int = 500):
         self.filepath = Path(filepath)
+        self.snapshot_path = self.filepath.with_suffix(".snapshot.jsonl")
+        self.compact_every = compact_every
         self.records: List[Dict[str, Any]] = []
+        self._positions: Dict[int, int] = {}
+        self._by_subject: Dict[str, List[int]] = {}
+        self._by_task: Dict[Tuple[str, str], List[int]] = {}
+        self._by_pixel: Dict[Tuple[str, str, Optional[float]], List[int]] = {}
+        self._next_id = 1
+        self._log_lines = 0
         self.alias_map = {
             "最大宽度": "max_width",
             "平均宽度": "avg_width",
@@ -18,20 +37,91 @@ class MemoryController:
         }
         self._load_memory()
 
-    def _load_memory(self):
-        if not self.filepath.exists():
+    @staticmethod
+    def _pixel_key(pixel_size) -> Optional[float]:
+        return None if pixel_size is None else round(float(pixel_size), 6)
+
+    def _index(self, pos: int):
+        r = self.records[pos]
+        subject = r.get("subject")
+        context = r.get("context", {})
+        task = context.get("task")
+        self._by_subject.setdefault(subject, []).append(pos)
+        self._by_task.setdefault((subject, task), []).append(pos)
+        self._by_pixel.setdefault((subject, task, self._pixel_key(context.get("pixel_size_mm"))), []).append(pos)
+
+    def _rebuild_indexes(self):
+        self._positions = {}
+        self._by_subject, self._by_task, self._by_pixel = {}, {}, {}
+        for pos, r in enumerate(self.records):
+            self._positions[r["record_id"]] = pos
+            self._index(pos)
+
+    def _replay(self, obj: Dict[str, Any]):
+        """Apply one persisted record: replace by ``record_id`` or append."""
+        rid = obj.get("record_id")
+        if rid is not None and rid in self._positions:
+            self.records[self._positions[rid]] = obj
             return
-        with open(self.filepath, "r", encoding="utf-8") as f:
+        if rid is None:
+            obj["record_id"] = self._next_id
+        self._positions[obj["record_id"]] = len(self.records)
+        self.records.append(obj)
+        self._next_id = max(self._next_id, obj["record_id"] + 1)
+
+    def _read_jsonl(self, path: Path) -> int:
+        count = 0
+        with open(path, "r", encoding="utf-8") as f:
             for line in f:
                 try:
                     obj = json.loads(line.strip())
-                    self.records.append(obj)
+                    self._replay(obj)
+                    count += 1
                 except Exception:
                     continue
+        return count
+
+    def _load_memory(self):
+        if self.snapshot_path.exists():
+            self._read_jsonl(self.snapshot_path)
+        if self.filepath.exists():
+            self._log_lines = self._read_jsonl(self.filepath)
+        self._rebuild_indexes()
+        if self.compact_every and self._log_lines >= self.compact_every:
+            self.compact()
 
     def _save_record(self, record: Dict):
         with open(self.filepath, "a", encoding="utf-8") as f:
             f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._log_lines += 1
+        if self.compact_every and self._log_lines >= self.compact_every:
+            self.compact()
+
+    def _add_record(self, record: Dict):
+        record["record_id"] = self._next_id
+        self._next_id += 1
+        self._positions[record["record_id"]] = len(self.records)
+        self.records.append(record)
+        self._index(len(self.records) - 1)
+        self._save_record(record)
+
+    def compact(self):
+        """Write every record to the snapshot and truncate the append log."""
+        if not self.records and not self.filepath.exists():
+            return
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for r in self.records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.snapshot_path)
+        # the snapshot already holds everything; replaying a stale log is idempotent
+        open(self.filepath, "w", encoding="utf-8").close()
+        self._log_lines = 0
+
+    def _latest(self, subject: str, task: str = None) -> Optional[Dict[str, Any]]:
+        positions = self._by_subject.get(subject) if task is None else self._by_task.get((subject, task))
+        return self.records[positions[-1]] if positions else None
 
     def normalize(self, s: str) -> str:
         return s.lower().replace(" ", "").replace("_", "").replace("(", "").replace(")", "")
@@ -44,13 +134,9 @@ class MemoryController:
         return name
 
     def _record_exists(self, subject: str, task: str, pixel_size: float = None) -> bool:
-        for r in self.records:
-            if r.get("subject") == subject and r.get("context", {}).get("task") == task:
-                if pixel_size is None:
-                    return True
-                if abs(r["context"].get("pixel_size_mm", -1) - pixel_size) < 1e-6:
-                    return True
-        return False
+        if pixel_size is None:
+            return bool(self._by_task.get((subject, task)))
+        return bool(self._by_pixel.get((subject, task, self._pixel_key(pixel_size))))
 
     def update_context(self, intent: str, indices: List[int], pixel_size: float, results: List[Dict], plan: List[Dict] = None):
         for r in results:
@@ -74,8 +160,7 @@ class MemoryController:
                     }
                 }
                 if not self._record_exists(subject, "segment"):
-                    self.records.append(record)
-                    self._save_record(record)
+                    self._add_record(record)
 
             elif tool == "quantify_crack_geometry":
                 pixel_size = args.get("pixel_size_mm", 0.5)
@@ -93,8 +178,7 @@ class MemoryController:
                         "observation": outputs
                     }
                     if not self._record_exists(subject, "quantify", pixel_size):
-                        self.records.append(record)
-                        self._save_record(record)
+                        self._add_record(record)
 
                 if visuals:
                     record = {
@@ -107,8 +191,7 @@ class MemoryController:
                         "observation": visuals
                     }
                     if not self._record_exists(subject, "save", pixel_size):
-                        self.records.append(record)
-                        self._save_record(record)
+                        self._add_record(record)
 
     def save_mask_path(self, subject_name: str, mask_path: str):
         record = {
@@ -121,8 +204,7 @@ class MemoryController:
                 "mask_path": mask_path
             }
         }
-        self.records.append(record)
-        self._save_record(record)
+        self._add_record(record)
 
     def save_metrics(self, subject_name: str, pixel_size: float, metrics: Dict[str, Any]):
         record = {
@@ -134,36 +216,27 @@ class MemoryController:
             },
             "observation": metrics
         }
-        self.records.append(record)
-        self._save_record(record)
+        self._add_record(record)
 
     def get_metrics_by_name(self, name: str, pixel_size: float = None) -> Dict[str, Any]:
-        matches = [
-            r for r in self.records
-            if r.get("subject") == name and r.get("context", {}).get("task") == "quantify"
-        ]
-        if pixel_size is not None:
-            matches = [
-                r for r in matches
-                if abs(r["context"].get("pixel_size_mm", 0) - pixel_size) < 1e-6
-            ]
-        if not matches:
+        if pixel_size is None:
+            positions = self._by_task.get((name, "quantify"))
+        else:
+            positions = self._by_pixel.get((name, "quantify", self._pixel_key(pixel_size)))
+        if not positions:
             return {}
-        return matches[-1].get("observation", {})
+        return self.records[positions[-1]].get("observation", {})
 
     def get_mask_path(self, name: str) -> str:
-        for r in reversed(self.records):
-            if r.get("subject") == name:
-                obs = r.get("observation", {})
-                if isinstance(obs, dict) and "mask_path" in obs:
-                    return obs["mask_path"]
+        for pos in reversed(self._by_subject.get(name, [])):
+            obs = self.records[pos].get("observation", {})
+            if isinstance(obs, dict) and "mask_path" in obs:
+                return obs["mask_path"]
         return ""
 
     def get_pixel_size(self, subject_name: str) -> float:
-        for r in reversed(self.records):
-            if r.get("subject") == subject_name and r.get("context", {}).get("task") == "quantify":
-                return r.get("context", {}).get("pixel_size_mm")
-        return None
+        r = self._latest(subject_name, "quantify")
+        return r.get("context", {}).get("pixel_size_mm") if r else None
 
     def get_last_metrics(self, count: int = 5) -> Dict[str, Dict[str, Any]]:
         latest = self.records[-count:]
@@ -180,7 +253,7 @@ class MemoryController:
     def to_dict(self) -> Dict[str, Any]:
         return {
             "last_task": self.records[-1]["context"]["task"] if self.records else None,
-            "known_subjects": list({r["subject"] for r in self.records}),
+            "known_subjects": list(self._by_subject),
             "recent_metrics": self.get_last_metrics()
         }
 
@@ -190,31 +263,35 @@ class MemoryController:
 
     def clear(self):
         self.records = []
-        if self.filepath.exists():
-            self.filepath.unlink()
+        self._rebuild_indexes()
+        self._log_lines = 0
+        for path in (self.filepath, self.snapshot_path):
+            if path.exists():
+                path.unlink()
 
-    def get_visualization_path(self, subject_name: str, visual_type: str) -> str:
+    def get_visualization_path(self, subject_name: str, visual_type: str, key: str = None) -> str:
         """Retrieve a visualization path from observations.
 
-        Automatically matches the ``*_overlay`` field, e.g. ``visual_type='max_width'`` searches for ``max_width_overlay``.
+        Looks up ``key`` (the tool's result key, e.g. ``skeleton_normals``) and
+        defaults to the ``*_overlay`` field, e.g. ``visual_type='max_width'``
+        searches for ``max_width_overlay``.
         """
-        overlay_key = f"{visual_type}_overlay"
+        overlay_key = key or f"{visual_type}_overlay"
 
-        for r in reversed(self.records):
-            if r.get("subject") == subject_name:
-                vis = r.get("observation", {})
-                if isinstance(vis, dict) and overlay_key in vis:
-                    return vis[overlay_key]
+        for pos in reversed(self._by_subject.get(subject_name, [])):
+            vis = self.records[pos].get("observation", {})
+            if isinstance(vis, dict) and overlay_key in vis:
+                return vis[overlay_key]
         return ""
 
     def update_visualization_path(self, subject_name: str, visual_type: str, path: str):
-        for r in reversed(self.records):
-            if r.get("subject") == subject_name and r.get("context", {}).get("task") == "save":
-                if "observation" not in r or not isinstance(r["observation"], dict):
-                    r["observation"] = {}
-                r["observation"][visual_type] = path
-                self._save_record(r)
-                return
+        r = self._latest(subject_name, "save")
+        if r is not None:
+            if "observation" not in r or not isinstance(r["observation"], dict):
+                r["observation"] = {}
+            r["observation"][visual_type] = path
+            self._save_record(r)
+            return
         new_record = {
             "subject": subject_name,
             "context": {
@@ -226,17 +303,16 @@ class MemoryController:
                 visual_type: path
             }
         }
-        self.records.append(new_record)
-        self._save_record(new_record)
+        self._add_record(new_record)
 
     def save_visualizations(self, subject_name: str, pixel_size_mm: float, visual_paths: Dict[str, str]):
-        for r in reversed(self.records):
-            if r.get("subject") == subject_name and r.get("context", {}).get("task") == "save":
-                if "observation" not in r or not isinstance(r["observation"], dict):
-                    r["observation"] = {}
-                r["observation"].update(visual_paths)
-                self._save_record(r)
-                return
+        r = self._latest(subject_name, "save")
+        if r is not None:
+            if "observation" not in r or not isinstance(r["observation"], dict):
+                r["observation"] = {}
+            r["observation"].update(visual_paths)
+            self._save_record(r)
+            return
         new_record = {
             "subject": subject_name,
             "context": {
@@ -246,5 +322,4 @@ class MemoryController:
             },
             "observation": visual_paths
         }
-        self.records.append(new_record)
-        self._save_record(new_record)
+        self._add_record(new_record)
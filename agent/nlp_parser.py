@@ -1,11 +1,9 @@
 # agent/nlp_parser.py
 
-from openai import OpenAI
 import os
 import json
 import re
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from tools.openai_client import get_openai_client
 
 def parse_image_indices_with_gpt(text: str) -> list:
     """Use GPT to extract image indices (0-based) from natural language.
@@ -20,7 +18,7 @@ def parse_image_indices_with_gpt(text: str) -> list:
         f"Instruction:\n{text}\n\nJSON output:"
     )
 
-    response = client.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
             {"role": "system", "content": "You extract image indices from user instructions."},
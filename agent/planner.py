@@ -6,6 +6,7 @@ from tools.path_utils import (
     get_test_image_paths,
     list_image_paths
 )
+from tools.mask_format import list_masks
 from agent.nlp_parser import parse_image_indices_with_gpt
 from agent.nlp_parser import parse_visual_types_from_text
 
@@ -44,7 +45,7 @@ def generate_plan(user_input: str, memory: Dict = None) -> List[Dict]:
     # === QUANTIFY ===
     if any(word in user_input for word in ["quantify", "geometry", "width"]):
         mask_dir = "outputs/masks"
-        mask_paths = list_image_paths(mask_dir, suffixes=[".png"])
+        mask_paths = list_masks(mask_dir)
         selected = []
 
         if "all" in user_input:
@@ -73,7 +74,7 @@ def generate_plan(user_input: str, memory: Dict = None) -> List[Dict]:
     # === GENERATE VISUALS ===
     if any(word in user_input for word in ["skeleton", "max width image", "width map", "visualize", "save"]):
         mask_dir = "outputs/masks"
-        mask_paths = list_image_paths(mask_dir, suffixes=[".png"])
+        mask_paths = list_masks(mask_dir)
         selected = []
 
         if "all" in user_input:
@@ -0,0 +1,110 @@
+"""Cold-start import regression check.
+
+Each entry point is imported in a fresh interpreter with ``-X importtime``.
+The run fails if a heavy dependency leaks into an entry point's import graph
+or an import takes longer than its budget. ``--heavy-only`` skips the timing
+budgets; CI runs it (``.github/workflows/import-guard.yml``) in an
+environment without the heavy packages, where a leaked import shows up as a
+missing module.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --heavy-only
+    python -m benchmarks.import_time --top 15 --json outputs/benchmarks/import_time.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# entry point -> cumulative import budget in milliseconds
+ENTRY_POINTS = {
+    "MCP": 300,
+    "MCP.tool": 100,
+    "agent.executor": 500,
+    "main_agent": 800,
+}
+
+# must only be imported when a tool actually runs
+HEAVY_MODULES = ["torch", "torchvision", "openai", "faiss", "langdetect", "cv2", "pandas", "matplotlib", "skimage", "scipy"]
+
+
+def measure_import(module: str) -> Dict:
+    """Import ``module`` in a subprocess and parse the ``-X importtime`` report."""
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "dummy")}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        missing = re.findall(r"No module named '([\w.]+)'", proc.stderr)
+        if missing and missing[-1].split(".")[0] in HEAVY_MODULES:
+            # heavy packages are not installed where this runs, e.g. in CI
+            return {"module": module, "total_ms": 0.0, "heavy": [missing[-1].split(".")[0]], "rows": []}
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+
+    top_level = {r["module"].split(".")[0] for r in rows}
+    total_us = next((r["cumulative_us"] for r in reversed(rows) if r["module"] == module), 0)
+    return {
+        "module": module,
+        "total_ms": total_us / 1000,
+        "heavy": [m for m in HEAVY_MODULES if m in top_level],
+        "rows": rows,
+    }
+
+
+def report(result: Dict, budget_ms: Optional[float], top: int) -> List[str]:
+    """Print one entry point's report and return its failures; ``budget_ms=None`` skips the timing check."""
+    failures = []
+    print(f"\n📦 import {result['module']}: {result['total_ms']:.1f} ms"
+          + (f" (budget {budget_ms} ms)" if budget_ms is not None else ""))
+    for row in sorted(result["rows"], key=lambda r: -r["cumulative_us"])[:top]:
+        print(f"   {row['cumulative_us'] / 1000:8.1f} ms  {row['module']}")
+    if result["heavy"]:
+        failures.append(f"{result['module']} imports heavy modules: {', '.join(result['heavy'])}")
+    if budget_ms is not None and result["total_ms"] > budget_ms:
+        failures.append(f"{result['module']} took {result['total_ms']:.1f} ms > {budget_ms} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import regression check")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per entry point")
+    parser.add_argument("--json", default=None, help="also write the measurements to this file")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply every budget, e.g. on slow CI")
+    parser.add_argument("--heavy-only", action="store_true", help="only check for heavy imports, skip the timing budgets")
+    args = parser.parse_args()
+
+    failures, results = [], []
+    for module, budget_ms in ENTRY_POINTS.items():
+        result = measure_import(module)
+        results.append({k: v for k, v in result.items() if k != "rows"})
+        failures += report(result, None if args.heavy_only else budget_ms * args.budget_scale, args.top)
+
+    if args.json:
+        if os.path.dirname(args.json):
+            os.makedirs(os.path.dirname(args.json), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if failures:
+        print("\n❌ import-time regressions:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("\n✅ all entry points within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Numerical parity and throughput of the UNet inference backends.
+
+Every backend is compared against eager PyTorch on the same random batch:
+max absolute logit difference and the fraction of mask pixels that flip at
+``MASK_THRESHOLD``. The run fails if a backend exceeds the tolerances.
+
+    python -m benchmarks.inference_backends --checkpoint checkpoints/unet_best.pth
+    python -m benchmarks.inference_backends --size 512 --batch 2 --repeat 5
+
+Without ``--checkpoint`` a randomly initialised UNet with randomised
+BatchNorm statistics is used, so folding is still exercised.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+from model.inference_backend import BACKENDS, load_backend
+from model.unet import UNet
+
+MASK_THRESHOLD = 0.9
+
+
+def random_checkpoint(path: str, seed: int = 0) -> str:
+    torch.manual_seed(seed)
+    model = UNet(in_channels=3, num_classes=1)
+    for module in model.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.running_mean.uniform_(-0.5, 0.5)
+            module.running_var.uniform_(0.5, 2.0)
+            module.weight.data.uniform_(0.5, 1.5)
+            module.bias.data.uniform_(-0.2, 0.2)
+    torch.save(model.state_dict(), path)
+    return path
+
+
+def time_backend(backend, batch: torch.Tensor, repeat: int, warmup: int = 1) -> float:
+    """Mean seconds per forward pass."""
+    for _ in range(warmup):
+        backend(batch)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        backend(batch)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UNet inference backend parity and throughput")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--size", type=int, default=896)
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--intra-op", type=int, default=None)
+    parser.add_argument("--inter-op", type=int, default=None)
+    parser.add_argument("--atol", type=float, default=1e-3, help="max allowed |logit - eager logit|")
+    parser.add_argument("--max-flip", type=float, default=1e-4, help="max allowed fraction of flipped mask pixels")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = args.checkpoint or random_checkpoint(os.path.join(tmp, "unet_random.pth"))
+        torch.manual_seed(1)
+        batch = torch.rand(args.batch, 3, args.size, args.size)
+
+        reference = load_backend(checkpoint, "eager", intra_op=args.intra_op, inter_op=args.inter_op)
+        expected = reference(batch)
+        expected_mask = torch.sigmoid(expected) > MASK_THRESHOLD
+
+        results, failures = [], []
+        for name in args.backends:
+            try:
+                backend = reference if name == "eager" else load_backend(
+                    checkpoint, name, artifact_dir=tmp, intra_op=args.intra_op, inter_op=args.inter_op
+                )
+            except ImportError as e:
+                print(f"⚠️ skipping {name}: {e}")
+                continue
+            logits = backend(batch)
+            max_abs = (logits - expected).abs().max().item()
+            flipped = ((torch.sigmoid(logits) > MASK_THRESHOLD) != expected_mask).float().mean().item()
+            seconds = time_backend(backend, batch, args.repeat)
+            results.append({
+                "backend": name,
+                "max_abs_diff": max_abs,
+                "flipped_fraction": flipped,
+                "seconds_per_batch": seconds,
+                "images_per_second": args.batch / seconds,
+            })
+            print(f"🧪 {name:12s} max|Δ|={max_abs:.2e} flipped={flipped:.2e} "
+                  f"{seconds * 1000:8.1f} ms/batch  {args.batch / seconds:6.2f} img/s")
+            if max_abs > args.atol or flipped > args.max_flip:
+                failures.append(name)
+
+    eager = next((r for r in results if r["backend"] == "eager"), None)
+    if eager:
+        for r in results:
+            print(f"   {r['backend']:12s} speedup vs eager: {eager['seconds_per_batch'] / r['seconds_per_batch']:.2f}x")
+
+    if args.json:
+        if os.path.dirname(args.json):
+            os.makedirs(os.path.dirname(args.json), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"size": args.size, "batch": args.batch, "results": results}, f, indent=2)
+
+    if failures:
+        print(f"❌ parity check failed for: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ all backends match eager within tolerance")
+
+
+if __name__ == "__main__":
+    main()
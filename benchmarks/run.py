@@ -0,0 +1,352 @@
+"""Benchmark suite for the crack-analysis hot paths.
+
+Every case builds its inputs once (synthetic masks, temp stores, random
+UNet weights, a stubbed embedder) and then times only the operation itself.
+Results are written as JSON; with ``--baseline`` each case is compared
+against an earlier run, and the process exits non-zero when a case is more
+than ``--threshold`` times slower.
+
+    python -m benchmarks.run --output outputs/benchmarks/latest.json
+    python -m benchmarks.run --baseline outputs/benchmarks/baseline.json --threshold 1.25
+    python -m benchmarks.run --filter skeleton max_width --sizes 512 2048
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import generate_crack_mask
+
+# name -> factory(args, tmp_dir) returning {label: zero-arg callable}
+CASES: Dict[str, Callable] = {}
+
+
+def case(name: str):
+    def decorator(factory):
+        CASES[name] = factory
+        return factory
+    return decorator
+
+
+def _masks(sizes: List[int], branches: int = 2) -> Dict[int, np.ndarray]:
+    return {s: generate_crack_mask(s, s, crack_width=max(3, s // 150), branches=branches, seed=s) for s in sizes}
+
+
+# === crack geometry ===
+
+@case("binarize")
+def bench_binarize(args, tmp):
+    from Crack_quantification_tools.binarize import binarize
+    images = {s: np.repeat((m * 255)[:, :, None], 3, axis=2) for s, m in _masks(args.sizes).items()}
+    return {f"{s}px": (lambda img=img: binarize(img)) for s, img in images.items()}
+
+
+@case("skeleton")
+def bench_skeleton(args, tmp):
+    from Crack_quantification_tools.skeleton import extract_skeleton_and_normals
+    return {f"{s}px": (lambda m=m: extract_skeleton_and_normals(m)) for s, m in _masks(args.sizes).items()}
+
+
+@case("thinning")
+def bench_thinning(args, tmp):
+    from Crack_quantification_tools.thinning import skeletonize_mask
+    return {
+        f"{backend}_{s}px": (lambda m=m, b=backend: skeletonize_mask(m, b))
+        for s, m in _masks(args.sizes).items()
+        for backend in ("zhang_suen", "skimage")
+    }
+
+
+@case("sparse_geometry")
+def bench_sparse_geometry(args, tmp):
+    from Crack_quantification_tools.geometry import CrackGeometry
+    masks = {}
+    for s in args.sizes:
+        # one crack confined to a quarter-size region of a large frame
+        mask = np.zeros((2 * s, 2 * s), dtype=np.uint8)
+        mask[s // 2:s, s // 2:s] = generate_crack_mask(s // 2, s // 2, crack_width=max(3, s // 150), branches=2, seed=s)
+        masks[2 * s] = mask
+    return {f"{s}px": (lambda m=m: CrackGeometry(m).metrics_px()) for s, m in masks.items()}
+
+
+@case("max_width")
+def bench_max_width(args, tmp):
+    from Crack_quantification_tools.width_max import compute_max_width_px
+    return {f"{s}px": (lambda m=m: compute_max_width_px(m)) for s, m in _masks(args.sizes).items()}
+
+
+@case("avg_width")
+def bench_avg_width(args, tmp):
+    from Crack_quantification_tools.width_avg import compute_average_width_px
+    return {f"{s}px": (lambda m=m: compute_average_width_px(m)) for s, m in _masks(args.sizes).items()}
+
+
+@case("width_profile")
+def bench_width_profile(args, tmp):
+    from Crack_quantification_tools.geometry import CrackGeometry
+    geometries = {s: CrackGeometry(m) for s, m in _masks(args.sizes).items()}
+    for g in geometries.values():
+        g.skeleton_points  # time normals and ray marching only
+
+    def profile(g):
+        g.__dict__.pop("normals", None)
+        g.__dict__.pop("normal_widths_px", None)
+        return g.width_profile()
+
+    return {f"{s}px": (lambda g=g: profile(g)) for s, g in geometries.items()}
+
+
+@case("components")
+def bench_components(args, tmp):
+    from Crack_quantification_tools.geometry import CrackGeometry
+    geometries = {s: CrackGeometry(m) for s, m in _masks(args.sizes, branches=6).items()}
+    for g in geometries.values():
+        g.point_widths_px  # time labeling and aggregation only
+    return {f"{s}px": (lambda g=g: g.component_table()) for s, g in geometries.items()}
+
+
+@case("mask_handoff")
+def bench_mask_handoff(args, tmp):
+    # segment -> quantify: PNG write + read + binarize vs passing the 0/1 mask in memory
+    import cv2
+    from Crack_quantification_tools.geometry import CrackGeometry
+
+    def png_roundtrip(mask, path):
+        cv2.imwrite(path, mask * 255)
+        return CrackGeometry.from_image(cv2.imread(path)).mask
+
+    cases = {}
+    for s, m in _masks(args.sizes).items():
+        path = os.path.join(tmp, f"handoff_{s}.png")
+        cases[f"png_{s}px"] = lambda m=m, p=path: png_roundtrip(m, p)
+        cases[f"in_memory_{s}px"] = lambda m=m: CrackGeometry(m).mask
+    return cases
+
+
+@case("mask_format")
+def bench_mask_format(args, tmp):
+    from tools.mask_format import FORMAT_SUFFIXES, load_mask, save_mask
+    cases = {}
+    for s, m in _masks(args.sizes).items():
+        for fmt, suffix in FORMAT_SUFFIXES.items():
+            path = save_mask(os.path.join(tmp, f"mask_{s}{suffix}"), m)
+            cases[f"load_{fmt}_{s}px"] = lambda p=path: load_mask(p)
+    return cases
+
+
+@case("geometry_all_metrics")
+def bench_geometry(args, tmp):
+    from Crack_quantification_tools.geometry import CrackGeometry
+    return {f"{s}px": (lambda m=m: CrackGeometry(m).metrics_px()) for s, m in _masks(args.sizes).items()}
+
+
+@case("overlays")
+def bench_overlays(args, tmp):
+    from Crack_quantification_tools.geometry import CrackGeometry
+    geometries = {s: CrackGeometry(m) for s, m in _masks(args.sizes).items()}
+    for g in geometries.values():
+        g.max_width_px  # time rendering only
+    kinds = ["skeleton", "normals", "max_width"]
+    return {f"{s}px": (lambda g=g: g.overlays(kinds)) for s, g in geometries.items()}
+
+
+# === results / memory ===
+
+@case("append_to_csv")
+def bench_append_to_csv(args, tmp):
+    from tools.io_utils import append_to_csv
+    from tools.results_store import get_results_store
+    row = {"Length (mm)": 12.3, "Area (mm^2)": 45.6, "Max Width (mm)": 1.2, "Avg Width (mm)": 0.8}
+    csv_path = os.path.join(tmp, "bench_metrics.csv")
+    for i in range(args.rows):
+        append_to_csv(csv_path, f"seed_{i}", row)
+    counter = iter(range(10 ** 9))
+
+    def single():
+        append_to_csv(csv_path, f"img_{next(counter) % args.rows}", row)
+
+    def batched():
+        with get_results_store(csv_path).batch():
+            for i in range(100):
+                append_to_csv(csv_path, f"img_{i}", row)
+
+    return {f"single_{args.rows}rows": single, "batch100": batched}
+
+
+@case("memory_lookup")
+def bench_memory(args, tmp):
+    from agent.memory import MemoryController
+    memory = MemoryController(os.path.join(tmp, "bench_memory.jsonl"), compact_every=10 ** 9)
+    for i in range(args.rows):
+        memory.save_mask_path(f"img_{i}", f"outputs/masks/img_{i}.png")
+        memory.save_metrics(f"img_{i}", 0.1, {"max_width": 1.0, "length": 2.0})
+    names = [f"img_{i}" for i in range(0, args.rows, max(1, args.rows // 100))]
+
+    def lookups():
+        for name in names:
+            memory.has_metrics(name, ["max_width", "length"], 0.1)
+            memory.get_mask_path(name)
+            memory.get_pixel_size(name)
+
+    return {f"{len(names)}x3_of_{args.rows}": lookups}
+
+
+# === models / retrieval ===
+
+@case("unet_forward")
+def bench_unet(args, tmp):
+    import torch
+    from model.unet import UNet
+    torch.manual_seed(0)
+    model = UNet(in_channels=3, num_classes=1).eval()
+
+    def forward(x):
+        with torch.inference_mode():
+            return model(x)
+
+    return {f"{s}px": (lambda x=torch.rand(1, 3, s, s): forward(x)) for s in args.unet_sizes}
+
+
+@case("faiss_retrieval")
+def bench_retrieval(args, tmp):
+    import faiss
+    import RAG_knowledge.retriever as retriever
+    from RAG_knowledge.chunk_store import write_chunk_store
+    from RAG_knowledge.embeddings import HashingEmbeddingBackend
+
+    dim = 3072
+    backend = HashingEmbeddingBackend(dim=dim)
+    texts = [f"Crack width limit clause {i}: members in exposure class {i % 4} ..." for i in range(args.chunks)]
+    index = faiss.IndexFlatL2(dim)
+    index.add(backend.embed(texts).astype(np.float32))
+
+    retriever.VECTOR_STORE_DIR = tmp
+    retriever.EMBEDDING_CACHE_PATH = os.path.join(tmp, "bench_embeddings.sqlite")
+    retriever.set_embedding_backend(backend)
+    faiss.write_index(index, os.path.join(tmp, "USA_crack_en.index"))
+    write_chunk_store(
+        [{"id": i, "text_en": t, "text_zh": t} for i, t in enumerate(texts)],
+        os.path.join(tmp, "USA_crack_en_chunks.jsonl")
+    )
+    counter = iter(range(10 ** 9))
+
+    return {
+        f"cold_query_{args.chunks}chunks": lambda: retriever.retrieve_context(f"max crack width {next(counter)}", "USA", "en"),
+        f"repeat_query_{args.chunks}chunks": lambda: retriever.retrieve_context("max crack width", "USA", "en"),
+    }
+
+
+# === runner ===
+
+def time_callable(fn: Callable, repeat: int, warmup: int = 1, min_time: float = 0.0) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeat or time.perf_counter() - start < min_time:
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "mean_s": statistics.fmean(times),
+        "runs": len(times),
+    }
+
+
+def environment() -> Dict[str, str]:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "cpu_count": str(os.cpu_count()),
+        "git_rev": rev,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, noise_floor_s: float = 1e-3) -> List[str]:
+    """Print ratios against ``baseline`` and return the regressed case names.
+
+    Best-of-runs times are compared, being the least noisy; cases faster
+    than ``noise_floor_s`` in both runs are reported but never flagged.
+    """
+    regressions = []
+    print("\n📈 comparison with baseline (best run, new / old):")
+    for name, entry in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            print(f"   {name:45s} (new)")
+            continue
+        ratio = entry["min_s"] / old["min_s"] if old["min_s"] else float("inf")
+        if max(entry["min_s"], old["min_s"]) < noise_floor_s:
+            print(f"   ·  {name:43s} {ratio:6.2f}x (below noise floor)")
+            continue
+        flag = "❌" if ratio > threshold else ("✅" if ratio < 1 / threshold else "  ")
+        print(f"   {flag} {name:43s} {ratio:6.2f}x")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the crack-analysis hot paths")
+    parser.add_argument("--filter", nargs="*", default=None, help="only cases whose name contains one of these")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[512, 1024, 2048], help="synthetic mask sizes")
+    parser.add_argument("--unet-sizes", nargs="+", type=int, default=[256, 512])
+    parser.add_argument("--rows", type=int, default=2000, help="rows for the CSV and memory cases")
+    parser.add_argument("--chunks", type=int, default=5000, help="vectors in the FAISS case")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="keep repeating until this many seconds")
+    parser.add_argument("--output", default=os.path.join("outputs", "benchmarks", "latest.json"))
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio counted as a regression")
+    parser.add_argument("--noise-floor-ms", type=float, default=1.0, help="never flag cases faster than this")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in CASES.items():
+            if args.filter and not any(f in name for f in args.filter):
+                continue
+            try:
+                callables = factory(args, tmp)
+            except ImportError as e:
+                print(f"⚠️ skipping {name}: {e}")
+                continue
+            for label, fn in callables.items():
+                key = f"{name}/{label}"
+                results[key] = time_callable(fn, args.repeat, min_time=args.min_time)
+                print(f"⏱️ {key:45s} {results[key]['median_s'] * 1000:10.2f} ms (min {results[key]['min_s'] * 1000:.2f})")
+
+    report = {"environment": environment(), "results": results}
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold, args.noise_floor_ms / 1000)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions over {args.threshold}x: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ no regressions")
+
+
+if __name__ == "__main__":
+    main()
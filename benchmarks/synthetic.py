@@ -0,0 +1,91 @@
+"""Synthetic crack masks with controllable size, length, width and branching.
+
+A crack is a smoothed random walk drawn with ``cv2.polylines``; each branch
+starts at a random point of the main crack and walks off at an angle.
+
+    python -m benchmarks.synthetic outputs/synthetic --count 20 --size 2048 --branches 3
+"""
+import argparse
+import os
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def _random_walk(
+    rng: np.random.Generator,
+    start: Tuple[float, float],
+    heading: float,
+    length: int,
+    step: float = 4.0,
+    wiggle: float = 0.08
+) -> np.ndarray:
+    """Polyline of ``length`` pixels whose heading drifts smoothly."""
+    n = max(int(length / step), 2)
+    turns = np.convolve(rng.normal(0, wiggle, n), np.ones(5) / 5, mode="same")
+    headings = heading + np.cumsum(turns)
+    steps = np.stack([np.cos(headings), np.sin(headings)], axis=1) * step
+    return np.asarray(start) + np.vstack([[0, 0], np.cumsum(steps, axis=0)])
+
+
+def generate_crack_mask(
+    height: int = 1024,
+    width: int = 1024,
+    length: Optional[int] = None,
+    crack_width: int = 5,
+    branches: int = 0,
+    width_jitter: float = 0.5,
+    seed: int = 0
+) -> np.ndarray:
+    """Return an (H, W) uint8 0/1 crack mask.
+
+    Args:
+        length: main crack length in pixels (defaults to the image diagonal).
+        crack_width: nominal stroke width in pixels.
+        branches: number of side cracks, each 20-50% of ``length``.
+        width_jitter: relative width variation along the crack.
+    """
+    rng = np.random.default_rng(seed)
+    length = length or int(np.hypot(height, width))
+    mask = np.zeros((height, width), dtype=np.uint8)
+
+    start = (rng.uniform(0.05, 0.2) * width, rng.uniform(0.2, 0.8) * height)
+    main = _random_walk(rng, start, heading=rng.uniform(-0.4, 0.4), length=length)
+    paths = [main]
+    for _ in range(branches):
+        origin = main[rng.integers(len(main) // 5, max(len(main) - 1, len(main) // 5 + 1))]
+        heading = rng.choice([-1, 1]) * rng.uniform(0.5, 1.2)
+        paths.append(_random_walk(rng, origin, heading, length=int(length * rng.uniform(0.2, 0.5))))
+
+    for i, path in enumerate(paths):
+        nominal = crack_width if i == 0 else max(1, crack_width // 2)
+        # draw in short segments so the width can vary along the crack
+        segment = 8
+        for j in range(0, len(path) - 1, segment):
+            w = max(1, int(round(nominal * (1 + rng.uniform(-width_jitter, width_jitter)))))
+            pts = path[j:j + segment + 1].round().astype(np.int32).reshape(-1, 1, 2)
+            cv2.polylines(mask, [pts], isClosed=False, color=1, thickness=w)
+    return mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic crack masks as PNGs")
+    parser.add_argument("output_dir")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--length", type=int, default=None)
+    parser.add_argument("--width", type=int, default=5)
+    parser.add_argument("--branches", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for i in range(args.count):
+        mask = generate_crack_mask(args.size, args.size, args.length, args.width, args.branches, seed=args.seed + i)
+        cv2.imwrite(os.path.join(args.output_dir, f"synthetic_{i:04d}.png"), mask * 255)
+    print(f"✅ {args.count} masks written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Parity and speed of the skeletonization backends.
+
+Every backend is compared against ``skimage`` (``skeletonize`` + ``thin``,
+the original two-pass pipeline) on the sample ground-truth masks and on
+synthetic masks at several resolutions:
+
+- misplaced: fraction of skeleton pixels farther than ``--tolerance-px``
+  from the other skeleton (worst of both directions),
+- drift: relative change of length, max width and avg width.
+
+The ``legacy`` row also applies the ``remove_small_objects(min_size=1)``
+step that the pipeline used to run. On scikit-image >= 0.26 that step
+removes isolated 4-connected pixels, i.e. diagonal skeleton runs.
+
+Checked backends (``--check``) are held to three bounds:
+
+- ``--max-misplaced`` / ``--max-drift`` against ``skimage``,
+- ``--max-legacy-drift`` against the legacy pipeline, i.e. the metrics the
+  tools reported before the thinning backends. Dropping
+  ``remove_small_objects`` lengthens skeletons by up to ~25% and lets max
+  width reach the widest section it used to skip (up to +64% on the
+  sample masks), so the default bound is 0.7,
+- ``--max-baseline-drift`` against the metrics recorded in
+  ``thinning_baseline.json``, so any change to reported numbers shows up.
+  After an intended change, re-record with ``--update-baseline`` and
+  mention it in the commit.
+
+The run fails if any bound is exceeded.
+
+    python -m benchmarks.thinning
+    python -m benchmarks.thinning --sizes 1024 4096 8192 --backends zhang_suen opencv
+    python -m benchmarks.thinning --update-baseline
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import warnings
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import generate_crack_mask
+from Crack_quantification_tools.geometry import CrackGeometry
+from Crack_quantification_tools.roi import roi_layout
+from Crack_quantification_tools.skeleton import extract_skeleton
+from Crack_quantification_tools.thinning import BACKENDS
+
+REFERENCE = "skimage"
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thinning_baseline.json")
+
+
+def legacy_skeleton(mask: np.ndarray) -> np.ndarray:
+    from skimage.morphology import remove_small_objects, skeletonize, thin
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        return remove_small_objects(thin(skeletonize(mask > 0)), min_size=1).astype(np.uint8)
+
+
+def misplaced_fraction(skeleton: np.ndarray, reference: np.ndarray, tolerance_px: float) -> float:
+    """Worst-direction fraction of skeleton pixels farther than ``tolerance_px`` from the other skeleton."""
+    def one_way(a, b):
+        if not a.any():
+            return 0.0
+        if not b.any():
+            return 1.0
+        distance = cv2.distanceTransform((b == 0).astype(np.uint8), cv2.DIST_L2, 5)
+        return float(np.mean(distance[a > 0] > tolerance_px))
+    return max(one_way(skeleton, reference), one_way(reference, skeleton))
+
+
+def metrics_with(mask: np.ndarray, backend: str, skeleton=None):
+    geometry = CrackGeometry(mask, thinning_backend=backend)
+    if skeleton is not None:
+        ys, xs = np.nonzero(skeleton)
+        geometry.__dict__["_skeleton"] = (skeleton, np.stack([xs, ys], axis=1))
+    return geometry.metrics_px()
+
+
+def drift(metrics, reference):
+    return {
+        name: (metrics[name] - reference[name]) / reference[name] if reference[name] else 0.0
+        for name in ("length", "max_width", "avg_width")
+    }
+
+
+def time_skeleton(mask, layout, backend, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        skeleton, _ = extract_skeleton(mask, layout, backend)
+        times.append(time.perf_counter() - t0)
+    return skeleton, min(times)
+
+
+def load_masks(sizes, sample_dir):
+    masks = {}
+    for path in sorted(glob.glob(os.path.join(sample_dir, "*"))):
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is not None:
+            masks[os.path.basename(path)] = (image > 127).astype(np.uint8)
+    for size in sizes:
+        masks[f"synthetic_{size}"] = generate_crack_mask(size, size, crack_width=max(3, size // 150), branches=3, seed=size)
+    return masks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skeletonization backend parity and speed")
+    parser.add_argument("--backends", nargs="+", default=["zhang_suen", "guo_hall", "opencv"], choices=list(BACKENDS))
+    parser.add_argument("--check", nargs="*", default=["zhang_suen"], help="backends held to the tolerances")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1024, 4096, 8192])
+    parser.add_argument("--samples", default=os.path.join("data", "Test_images_GT"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance-px", type=float, default=2.0)
+    parser.add_argument("--max-misplaced", type=float, default=0.1)
+    parser.add_argument("--max-drift", type=float, default=0.12, help="max relative change of any metric")
+    parser.add_argument("--max-legacy-drift", type=float, default=0.7,
+                        help="max relative change of any metric against the legacy pipeline")
+    parser.add_argument("--baseline", default=BASELINE, help="recorded metrics of the checked backends")
+    parser.add_argument("--max-baseline-drift", type=float, default=0.01,
+                        help="max relative change of any metric against --baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="re-record --baseline instead of checking it")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    recorded = {}
+
+    rows, failures = [], set()
+    for name, mask in load_masks(args.sizes, args.samples).items():
+        layout = roi_layout(mask)
+        reference, ref_seconds = time_skeleton(mask, layout, REFERENCE, 1 if mask.size > 4096 ** 2 else args.repeat)
+        ref_metrics = metrics_with(mask, REFERENCE, reference)
+        print(f"\n🧪 {name} ({mask.shape[1]}x{mask.shape[0]}): {REFERENCE} {ref_seconds * 1000:.1f} ms, "
+              f"{int(reference.sum())} skeleton px")
+
+        legacy = legacy_skeleton(mask)
+        candidates = [("legacy", legacy, None)]
+        for backend in args.backends:
+            try:
+                skeleton, seconds = time_skeleton(mask, layout, backend, args.repeat)
+            except ImportError as e:
+                print(f"   ⚠️ skipping {backend}: {e}")
+                continue
+            candidates.append((backend, skeleton, seconds))
+
+        for backend, skeleton, seconds in candidates:
+            metrics = metrics_with(mask, backend, skeleton)
+            if backend == "legacy":
+                legacy_metrics = metrics
+            d = drift(metrics, ref_metrics)
+            row = {
+                "mask": name,
+                "backend": backend,
+                "pixels": int(skeleton.sum()),
+                "misplaced": misplaced_fraction(skeleton, reference, args.tolerance_px),
+                "drift": d,
+                "seconds": seconds,
+                "speedup": ref_seconds / seconds if seconds else None,
+            }
+            rows.append(row)
+            timing = f"{seconds * 1000:8.1f} ms {row['speedup']:5.1f}x" if seconds else " " * 18
+            print(f"   {backend:10s} {timing}  misplaced={row['misplaced']:.4f}  "
+                  + "  ".join(f"Δ{k}={v:+.2%}" for k, v in d.items()))
+            if backend not in args.check:
+                continue
+            if row["misplaced"] > args.max_misplaced or max(abs(v) for v in d.values()) > args.max_drift:
+                failures.add(backend)
+
+            row["legacy_drift"] = drift(metrics, legacy_metrics)
+            checks = [("legacy", row["legacy_drift"], args.max_legacy_drift)]
+            recorded.setdefault(backend, {})[name] = {k: float(metrics[k]) for k in ("length", "max_width", "avg_width")}
+            if name in baseline.get(backend, {}):
+                row["baseline_drift"] = drift(metrics, baseline[backend][name])
+                checks.append(("baseline", row["baseline_drift"], args.max_baseline_drift))
+            for label, values, bound in checks:
+                exceeded = max(abs(v) for v in values.values()) > bound
+                print(f"   {'':10s} {'vs ' + label:>18s}  " + "  ".join(f"Δ{k}={v:+.2%}" for k, v in values.items())
+                      + ("  ❌" if exceeded else ""))
+                if exceeded:
+                    failures.add(backend)
+
+    if args.json:
+        if os.path.dirname(args.json):
+            os.makedirs(os.path.dirname(args.json), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(recorded, f, indent=2, sort_keys=True)
+        print(f"\n📝 recorded metrics of {', '.join(sorted(recorded))} to {args.baseline}")
+
+    if failures:
+        print(f"\n❌ parity check failed for: {', '.join(sorted(failures))}")
+        sys.exit(1)
+    print(f"\n✅ {', '.join(b for b in args.check if b in args.backends)} within tolerance of {REFERENCE}, "
+          f"the legacy pipeline and the recorded baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,17 @@
 import os
 import json
-from openai import OpenAI
 from dotenv import load_dotenv
 from agent.executor import execute_plan
+from tools.openai_client import get_openai_client
 from tools.path_utils import get_test_image_paths, get_test_image_by_index
-from MCP.visualize_tools import visualize_crack_result
 from agent.gpt_intent_parser import generate_composite_plan
 from agent.object_memory_manager import ObjectMemoryManager
 from agent.session_manager import SessionManager
+from tools.mask_format import find_mask, mask_suffix
 
 
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 session = SessionManager()
 logger = session.get_logger()
@@ -20,6 +19,16 @@ memory = session.get_memory()
 object_store = ObjectMemoryManager()
 
 DEFAULT_METRICS = ["max_width", "avg_width", "length", "area"]
+MASK_OUTPUT_DIR = os.path.join("outputs", "masks")
+
+
+def resolve_mask_path(img_path: str, segmented: bool) -> str:
+    """Mask of ``img_path``: where a planned segmentation writes it, else an existing mask in any format."""
+    if segmented:
+        from MCP.segment import mask_output_path  # pulls in torch; only needed when a segment step runs
+        return mask_output_path(img_path)
+    stem = os.path.splitext(os.path.basename(img_path))[0]
+    return find_mask(MASK_OUTPUT_DIR, stem) or os.path.join(MASK_OUTPUT_DIR, stem + mask_suffix())
 
 
 def generate_agent_reply(user_input: str, plan: dict, results: list) -> str:
@@ -36,7 +45,7 @@ def generate_agent_reply(user_input: str, plan: dict, results: list) -> str:
         f"✅ Results: {json.dumps(results, ensure_ascii=False)}\n\n"
         "Provide the answer only, no additional explanations or formatting."
     )
-    response = client.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
             {"role": "system", "content": "You are a professional crack image analysis AI that returns concise summaries."},
@@ -47,7 +56,7 @@ def generate_agent_reply(user_input: str, plan: dict, results: list) -> str:
 
 
 def chat_fallback(user_input: str) -> str:
-    response = client.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
             {"role": "system", "content": "You are an AI agent focused on crack image analysis."},
@@ -104,6 +113,7 @@ if __name__ == "__main__":
 
         tool_plan = []
         results = []
+        segmented = set()  # image indices with a segment step planned so far
         all_images = get_test_image_paths()
         index_to_image_name = {
             i: os.path.basename(p).replace(".jpg", "").replace(".png", "").replace(".jpeg", "")
@@ -135,31 +145,19 @@ if __name__ == "__main__":
                 print(f"⚠️ step [{action}] missing image indices")
                 continue
 
+            if action == "segment":
+                segmented.update(indices)
+
+            segment_paths = []
             for i in indices:
                 img_path = get_test_image_by_index(i)
                 name = index_to_image_name[i]
                 object_store.register_image(img_path)
-                mask_name = os.path.basename(img_path).replace(".jpg", ".png").replace(".jpeg", ".png")
-                mask_path = os.path.join("outputs/masks", mask_name)
+                mask_path = resolve_mask_path(img_path, i in segmented)
 
                 if action == "segment":
-                    if os.path.exists(mask_path):
-                        print(f"♻️ Mask already exists, skipping segment: {mask_path}")
-                        results.append({
-                            "tool": "segment_crack_image",
-                            "status": "success",
-                            "summary": "Mask already exists on disk, skipping",
-                            "outputs": {"mask_path": mask_path},
-                            "visualizations": None,
-                            "args": {"image_path": img_path},
-                            "subject": name
-                        })
-                        continue
-                    tool_plan.append({
-                        "tool": "segment_crack_image",
-                        "args": {"image_path": img_path},
-                        "subject": name
-                    })
+                    # the segmentation cache skips inference for unchanged images and weights
+                    segment_paths.append((img_path, name))
 
                 elif action == "quantify":
                     if memory.has_metrics(name, metrics, pixel_size):
@@ -210,6 +208,7 @@ if __name__ == "__main__":
                     })
 
                 elif action == "visualize":
+                    from MCP.visualize_tools import visualize_crack_result  # pulls in matplotlib / cv2
                     vis_paths = visualize_crack_result(subject_name=name, memory=memory, visual_types=visual_types)
                     results.append({
                         "tool": "visualize_crack_result",
@@ -221,6 +220,21 @@ if __name__ == "__main__":
                         "subject": name
                     })
 
+            # multi-image segmentation ("segment all") runs as one batched step
+            if len(segment_paths) > 1:
+                tool_plan.append({
+                    "tool": "segment_crack_images",
+                    "args": {"image_paths": [p for p, _ in segment_paths]},
+                    "subject": "batch"
+                })
+            elif segment_paths:
+                img_path, name = segment_paths[0]
+                tool_plan.append({
+                    "tool": "segment_crack_image",
+                    "args": {"image_path": img_path},
+                    "subject": name
+                })
+
         if not tool_plan and results:
             print("♻️ All steps hit in memory; no tools executed.")
         else:
@@ -0,0 +1,237 @@
+"""Inference backends for the crack segmentation UNet.
+
+``load_backend`` returns a callable mapping a float (B, 3, H, W) batch in
+[0, 1] to (B, 1, H, W) logits, whatever runs underneath:
+
+- ``eager``: the checkpoint as a plain ``nn.Module`` (reference behaviour).
+- ``torchscript``: BatchNorm folded into the convolutions, traced and frozen,
+  run in channels_last layout.
+- ``onnx``: the folded model exported to ONNX and run with ONNX Runtime
+  (optional dependency: ``pip install onnxruntime``).
+
+Exported artifacts are written next to each other in ``artifact_dir`` and
+re-exported whenever the checkpoint is newer than the artifact. Every export
+is checked against the eager model (``check_parity``); an artifact whose
+logits drift by more than ``PARITY_ATOL`` is deleted and the export fails.
+"""
+import copy
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from model.unet import UNet
+
+BACKENDS = ("eager", "torchscript", "onnx")
+DEFAULT_ARTIFACT_DIR = os.path.join("outputs", "models")
+EXPORT_SIZE = (896, 896)
+# exported logits must match eager within PARITY_ATOL on a PARITY_SIZE batch
+PARITY_SIZE = (256, 256)
+PARITY_ATOL = float(os.getenv("CRACK_EXPORT_ATOL", 1e-3))
+
+
+def configure_threads(intra_op: Optional[int] = None, inter_op: Optional[int] = None):
+    """Set PyTorch intra-/inter-op thread pools; ``None`` keeps the default."""
+    if intra_op:
+        torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # only allowed before the first parallel op in this process
+            print(f"⚠️ inter-op threads already initialised; keeping {torch.get_num_interop_threads()}")
+
+
+def load_unet(checkpoint_path: str, device: torch.device = torch.device("cpu")) -> nn.Module:
+    model = UNet(in_channels=3, num_classes=1)
+    model.load_state_dict(torch.load(checkpoint_path, map_location=device))
+    model.to(device)
+    model.eval()
+    return model
+
+
+def fold_batchnorm(model: nn.Module) -> nn.Module:
+    """Return an eval-mode copy with every Conv2d -> BatchNorm2d pair fused into one conv."""
+    model = copy.deepcopy(model).eval()
+    for module in model.modules():
+        if not isinstance(module, nn.Sequential):
+            continue
+        children = list(module.named_children())
+        for (conv_name, conv), (bn_name, bn) in zip(children, children[1:]):
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                setattr(module, conv_name, fuse_conv_bn_eval(conv, bn))
+                setattr(module, bn_name, nn.Identity())
+    return model
+
+
+def export_torchscript(model: nn.Module, path: str, input_size: Tuple[int, int] = EXPORT_SIZE) -> str:
+    """Fold BatchNorm, trace, freeze and save a TorchScript module."""
+    folded = fold_batchnorm(model).to(memory_format=torch.channels_last)
+    device = next(folded.parameters()).device
+    example = torch.zeros(1, 3, *input_size, device=device).to(memory_format=torch.channels_last)
+    with torch.inference_mode():
+        traced = torch.jit.trace(folded, example)
+    frozen = torch.jit.freeze(traced)
+    _makedirs_for(path)
+    frozen.save(path)
+    return path
+
+
+def export_onnx(model: nn.Module, path: str, input_size: Tuple[int, int] = EXPORT_SIZE, opset: int = 17) -> str:
+    """Fold BatchNorm and export to ONNX with dynamic batch and spatial axes."""
+    folded = fold_batchnorm(model).cpu()
+    example = torch.zeros(1, 3, *input_size)
+    _makedirs_for(path)
+    torch.onnx.export(
+        folded, example, path,
+        input_names=["image"], output_names=["logits"],
+        dynamic_axes={"image": {0: "batch", 2: "height", 3: "width"}, "logits": {0: "batch", 2: "height", 3: "width"}},
+        opset_version=opset,
+        dynamo=False
+    )
+    return path
+
+
+def artifact_path(checkpoint_path: str, backend: str, artifact_dir: str = DEFAULT_ARTIFACT_DIR) -> str:
+    stem = os.path.splitext(os.path.basename(checkpoint_path))[0]
+    ext = {"torchscript": ".ts", "onnx": ".onnx"}[backend]
+    return os.path.join(artifact_dir, stem + ext)
+
+
+def check_parity(reference, candidate, size: Tuple[int, int] = PARITY_SIZE, atol: float = PARITY_ATOL, seed: int = 0) -> float:
+    """Max |logit difference| of two backends on a fixed random batch; raises ``RuntimeError`` above ``atol``."""
+    batch = torch.rand(1, 3, *size, generator=torch.Generator().manual_seed(seed))
+    max_abs = (candidate(batch).float().cpu() - reference(batch).float().cpu()).abs().max().item()
+    if not max_abs <= atol:  # also catches NaN
+        raise RuntimeError(f"{getattr(candidate, 'name', candidate)} logits differ from eager by {max_abs:.2e} (> {atol:.0e})")
+    return max_abs
+
+
+def export_model(checkpoint_path: str, artifact_dir: str = DEFAULT_ARTIFACT_DIR, backends=("torchscript", "onnx"),
+                 verify: bool = True) -> dict:
+    """Export a checkpoint to the requested artifact formats; returns ``{backend: path}``.
+
+    With ``verify`` each artifact is loaded and checked against the eager
+    model with ``check_parity``; a failing artifact is removed before the
+    error propagates.
+    """
+    model = load_unet(checkpoint_path)
+    exporters = {"torchscript": export_torchscript, "onnx": export_onnx}
+    loaders = {"torchscript": TorchScriptBackend, "onnx": OnnxRuntimeBackend}
+    paths = {}
+    for b in backends:
+        path = exporters[b](model, artifact_path(checkpoint_path, b, artifact_dir))
+        if verify:
+            try:
+                check_parity(EagerBackend(model), loaders[b](path))
+            except Exception:
+                os.remove(path)
+                raise
+        paths[b] = path
+    return paths
+
+
+class EagerBackend:
+    """Plain ``nn.Module`` forward pass."""
+
+    name = "eager"
+
+    def __init__(self, model: nn.Module, channels_last: bool = False):
+        self.channels_last = channels_last
+        self.model = model.to(memory_format=torch.channels_last) if channels_last else model
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        if self.channels_last:
+            batch = batch.contiguous(memory_format=torch.channels_last)
+        with torch.inference_mode():
+            return self.model(batch)
+
+
+class TorchScriptBackend(EagerBackend):
+    """Frozen TorchScript graph with folded BatchNorm, fed channels_last input."""
+
+    name = "torchscript"
+
+    def __init__(self, path: str, device: torch.device = torch.device("cpu")):
+        super().__init__(torch.jit.load(path, map_location=device), channels_last=True)
+
+
+class OnnxRuntimeBackend:
+    """ONNX Runtime session with explicit thread settings."""
+
+    name = "onnx"
+
+    def __init__(self, path: str, intra_op: Optional[int] = None, inter_op: Optional[int] = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The 'onnx' backend requires onnxruntime: pip install onnxruntime") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op:
+            options.intra_op_num_threads = intra_op
+        if inter_op:
+            options.inter_op_num_threads = inter_op
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        providers = [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in ort.get_available_providers()]
+        self.session = ort.InferenceSession(path, options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        array = np.ascontiguousarray(batch.detach().cpu().numpy(), dtype=np.float32)
+        logits = self.session.run(None, {self.input_name: array})[0]
+        return torch.from_numpy(logits).to(batch.device)
+
+
+def load_backend(
+    checkpoint_path: str,
+    backend: str = "eager",
+    device: torch.device = torch.device("cpu"),
+    artifact_dir: str = DEFAULT_ARTIFACT_DIR,
+    intra_op: Optional[int] = None,
+    inter_op: Optional[int] = None
+):
+    """Build an inference callable for ``checkpoint_path``, exporting artifacts if stale.
+
+    Args:
+        backend: one of ``BACKENDS``.
+        intra_op: threads used inside one operator (PyTorch or ONNX Runtime).
+        inter_op: threads used across independent operators.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported inference backend: {backend}. Available: {list(BACKENDS)}")
+    configure_threads(intra_op, inter_op)
+
+    if backend == "eager":
+        return EagerBackend(load_unet(checkpoint_path, device))
+
+    path = artifact_path(checkpoint_path, backend, artifact_dir)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(checkpoint_path):
+        print(f"🔧 exporting {backend} artifact: {path}")
+        export_model(checkpoint_path, artifact_dir, backends=(backend,))
+
+    if backend == "torchscript":
+        return TorchScriptBackend(path, device)
+    return OnnxRuntimeBackend(path, intra_op, inter_op)
+
+
+def _makedirs_for(path: str):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the UNet checkpoint to TorchScript / ONNX")
+    parser.add_argument("--checkpoint", default="checkpoints/unet_best.pth")
+    parser.add_argument("--output-dir", default=DEFAULT_ARTIFACT_DIR)
+    parser.add_argument("--backends", nargs="+", default=["torchscript", "onnx"], choices=["torchscript", "onnx"])
+    args = parser.parse_args()
+
+    for name, out in export_model(args.checkpoint, args.output_dir, args.backends).items():
+        print(f"✅ {name}: {out}")
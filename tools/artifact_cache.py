@@ -0,0 +1,160 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def hash_bytes(*parts) -> str:
+    """SHA-256 over several byte / str / array parts, usable as a cache key."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            h.update(str((part.shape, part.dtype.str)).encode("utf-8"))
+            part = np.ascontiguousarray(part).tobytes()
+        elif isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    """Content-addressed on-disk cache of numpy artifacts with LRU eviction.
+
+    Each entry is an ``.npz`` file under ``root`` holding a dict of arrays;
+    ``root/manifest.sqlite`` records key, size and last access for every
+    entry. Files are written to a temp name and atomically renamed, and the
+    manifest is a WAL-mode SQLite database, so several threads or processes
+    may share one cache directory. A cache object inherited by a forked
+    process opens its own manifest connection on first use. When the total size exceeds
+    ``max_bytes`` the least recently used entries are deleted.
+
+    Args:
+        root: cache directory.
+        max_bytes: size budget for all entries.
+        compress: write entries with ``np.savez_compressed``.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1 << 30, compress: bool = True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        self._connect()
+
+    def _connect(self):
+        os.makedirs(self.root, exist_ok=True)  # may have been cleared while this process ran
+        self._pid = os.getpid()
+        self._conn = sqlite3.connect(os.path.join(self.root, "manifest.sqlite"), check_same_thread=False, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, size INTEGER, created REAL, last_used REAL, meta TEXT)"
+        )
+        self._conn.commit()
+
+    def _check_fork(self):
+        # SQLite connections must not be used across fork; the child opens its
+        # own, with a fresh lock in case a parent thread held it at fork time
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._connect()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.npz")
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """Return the arrays stored under ``key`` or ``None``."""
+        self._check_fork()
+        try:
+            with np.load(self._path(key), allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (FileNotFoundError, OSError, ValueError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+            with self._conn:
+                self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return arrays
+
+    def put(self, key: str, arrays: Dict[str, np.ndarray], meta: str = ""):
+        """Store ``arrays`` under ``key``, replacing any previous entry."""
+        self._check_fork()
+        buffer = io.BytesIO()
+        (np.savez_compressed if self.compress else np.savez)(buffer, **arrays)
+        payload = buffer.getvalue()
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            self.stats["writes"] += 1
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, size, created, last_used, meta) VALUES (?, ?, ?, ?, ?)",
+                    (key, len(payload), now, now, meta)
+                )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            victims.append(key)
+            total -= size
+        with self._conn:
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in victims])
+        for key in victims:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        self.stats["evictions"] += len(victims)
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get_stats(self) -> Dict[str, int]:
+        self._check_fork()
+        row = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {**self.stats, "entries": row[0], "bytes": row[1]}
+
+    def clear(self):
+        self._check_fork()
+        with self._lock:
+            keys = [r[0] for r in self._conn.execute("SELECT key FROM entries")]
+            with self._conn:
+                self._conn.execute("DELETE FROM entries")
+            for key in keys:
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,272 @@
+"""Compact on-disk formats for binary crack masks.
+
+- ``png``: 8-bit PNG at 0/255 (default, viewable anywhere).
+- ``packbits``: ``.bmask``, one bit per pixel, rows padded to whole bytes
+  (``np.packbits`` along each row).
+- ``rle``: ``.rle``, per-row run lengths stored as the columns where a crack
+  run starts and ends, plus a row index.
+
+Both compact files start with a 16-byte header (magic, version, encoding,
+height, width) followed by raw little-endian arrays, so they can be
+memory-mapped and a band of rows decoded without touching the rest of the
+file. Select the format written by segmentation with ``CRACK_MASK_FORMAT``.
+
+    python -m tools.mask_format outputs/masks --to rle --remove
+    python -m tools.mask_format outputs/masks --to packbits --output-dir outputs/masks_bits
+"""
+import argparse
+import os
+import struct
+import sys
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MASK_FORMAT = os.getenv("CRACK_MASK_FORMAT", "png")
+FORMAT_SUFFIXES = {"png": ".png", "packbits": ".bmask", "rle": ".rle"}
+MASK_SUFFIXES = list(FORMAT_SUFFIXES.values())
+
+_MAGIC = b"CMSK"
+_VERSION = 1
+_ENCODINGS = {"packbits": 1, "rle": 2}
+# magic, version, encoding, height, width
+_HEADER = struct.Struct("<4sHHII")
+
+
+def mask_suffix(fmt: Optional[str] = None) -> str:
+    """File suffix for ``fmt`` (defaults to ``MASK_FORMAT``)."""
+    fmt = fmt or MASK_FORMAT
+    if fmt not in FORMAT_SUFFIXES:
+        raise ValueError(f"Unsupported mask format: {fmt}. Available: {list(FORMAT_SUFFIXES)}")
+    return FORMAT_SUFFIXES[fmt]
+
+
+def mask_format_of(path: str) -> str:
+    """Format of a mask file, from its suffix; anything unknown is read as an image."""
+    ext = os.path.splitext(path)[1].lower()
+    return next((fmt for fmt, suffix in FORMAT_SUFFIXES.items() if suffix == ext), "png")
+
+
+def is_compact_mask(path: str) -> bool:
+    return mask_format_of(path) != "png"
+
+
+# === encoders ===
+
+def encode_packbits(mask: np.ndarray) -> np.ndarray:
+    """(H, ceil(W / 8)) uint8 rows of packed bits, most significant bit first."""
+    return np.packbits(mask > 0, axis=1)
+
+
+def decode_packbits(packed: np.ndarray, width: int) -> np.ndarray:
+    return np.unpackbits(packed, axis=1, count=width)
+
+
+def encode_rle(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Row-wise runs: ``(row_ptr, toggles)``.
+
+    ``toggles[row_ptr[y]:row_ptr[y + 1]]`` holds the columns where row ``y``
+    switches between background and crack, starting with background, so
+    pairs ``(start, end)`` are the half-open crack runs of that row.
+    """
+    height, width = mask.shape[:2]
+    padded = np.zeros((height, width + 2), dtype=bool)
+    padded[:, 1:-1] = mask > 0
+    # flatnonzero + divmod is several times faster than a 2-D nonzero
+    rows, toggles = np.divmod(np.flatnonzero(padded[:, 1:] != padded[:, :-1]), width + 1)
+    row_ptr = np.zeros(height + 1, dtype=np.uint64)
+    np.cumsum(np.bincount(rows, minlength=height), out=row_ptr[1:])
+    return row_ptr, toggles.astype(np.uint32)
+
+
+def decode_rle(row_ptr: np.ndarray, toggles: np.ndarray, width: int) -> np.ndarray:
+    """Rebuild rows from ``encode_rle`` output; ``row_ptr`` may cover a band of rows."""
+    height = len(row_ptr) - 1
+    mask = np.zeros(height * width, dtype=np.uint8)
+    rows = np.repeat(np.arange(height, dtype=np.int64), np.diff(row_ptr.astype(np.int64)))
+    flat = rows * width + np.asarray(toggles, dtype=np.int64)
+    # every row holds whole (start, end) pairs; fill the runs' pixels only
+    starts, ends = flat[0::2], flat[1::2]
+    lengths = ends - starts
+    if len(lengths):
+        first = np.cumsum(lengths) - lengths
+        mask[np.arange(lengths.sum()) - np.repeat(first - starts, lengths)] = 1
+    return mask.reshape(height, width)
+
+
+# === files ===
+
+def _rle_dtypes(shape: Tuple[int, int]) -> Tuple[np.dtype, np.dtype]:
+    """Smallest (row_ptr, toggles) dtypes that fit a mask of ``shape``; derived from the header alone."""
+    height, width = shape
+    ptr = np.dtype("<u4") if height * (width + 1) < 2 ** 32 else np.dtype("<u8")
+    col = np.dtype("<u2") if width < 2 ** 16 else np.dtype("<u4")
+    return ptr, col
+
+
+def _write_header(f, encoding: str, shape: Tuple[int, int]):
+    f.write(_HEADER.pack(_MAGIC, _VERSION, _ENCODINGS[encoding], shape[0], shape[1]))
+
+
+def read_header(path: str) -> Tuple[str, Tuple[int, int]]:
+    """``(encoding, (height, width))`` of a compact mask file."""
+    with open(path, "rb") as f:
+        raw = f.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        raise ValueError(f"Truncated mask file: {path}")
+    magic, version, code, height, width = _HEADER.unpack(raw)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"Not a compact mask file (v{_VERSION}): {path}")
+    encoding = next((name for name, c in _ENCODINGS.items() if c == code), None)
+    if encoding is None:
+        raise ValueError(f"Unknown mask encoding {code} in {path}")
+    return encoding, (height, width)
+
+
+def save_mask(path: str, mask: np.ndarray, fmt: Optional[str] = None) -> str:
+    """Write a 0/1 (or boolean) mask; the format follows ``fmt`` or the file suffix."""
+    fmt = fmt or mask_format_of(path)
+    mask = np.asarray(mask)
+    if fmt == "png":
+        import cv2
+        if not cv2.imwrite(path, (mask > 0).astype(np.uint8) * 255):
+            raise RuntimeError(f"Mask save failed: {path}")
+        return path
+
+    with open(path, "wb") as f:
+        _write_header(f, fmt, mask.shape[:2])
+        if fmt == "packbits":
+            f.write(encode_packbits(mask).tobytes())
+        else:
+            row_ptr, toggles = encode_rle(mask)
+            ptr_dtype, col_dtype = _rle_dtypes(mask.shape[:2])
+            f.write(row_ptr.astype(ptr_dtype).tobytes())
+            f.write(toggles.astype(col_dtype).tobytes())
+    return path
+
+
+def _open_arrays(path: str, encoding: str, shape: Tuple[int, int], mmap: bool):
+    height, width = shape
+    read = (lambda dtype, offset, count: np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))) if mmap \
+        else (lambda dtype, offset, count: np.fromfile(path, dtype=dtype, count=count, offset=offset))
+    if encoding == "packbits":
+        row_bytes = (width + 7) // 8
+        return read(np.uint8, _HEADER.size, height * row_bytes).reshape(height, row_bytes)
+    ptr_dtype, col_dtype = _rle_dtypes(shape)
+    row_ptr = read(ptr_dtype, _HEADER.size, height + 1)
+    toggles = read(col_dtype, _HEADER.size + ptr_dtype.itemsize * (height + 1), int(row_ptr[-1]))
+    return row_ptr, toggles
+
+
+def load_mask(path: str, threshold: int = 127) -> np.ndarray:
+    """Read any supported mask file as an (H, W) uint8 0/1 array."""
+    if not is_compact_mask(path):
+        import cv2
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError(f"Invalid image format: {path}")
+        return (image > threshold).astype(np.uint8)
+
+    encoding, shape = read_header(path)
+    if encoding == "packbits":
+        return decode_packbits(_open_arrays(path, encoding, shape, mmap=False), shape[1])
+    row_ptr, toggles = _open_arrays(path, encoding, shape, mmap=False)
+    return decode_rle(row_ptr, toggles, shape[1])
+
+
+def load_mask_rows(path: str, y0: int, y1: int) -> np.ndarray:
+    """Decode rows ``y0:y1`` of a compact mask through a memory map, without reading the rest."""
+    encoding, (height, width) = read_header(path)
+    y0 = min(max(0, y0), height)
+    y1 = min(max(y0, y1), height)
+    if encoding == "packbits":
+        packed = _open_arrays(path, encoding, (height, width), mmap=True)
+        return decode_packbits(np.asarray(packed[y0:y1]), width)
+    row_ptr, toggles = _open_arrays(path, encoding, (height, width), mmap=True)
+    band = np.asarray(row_ptr[y0:y1 + 1])
+    return decode_rle(band, np.asarray(toggles[int(band[0]):int(band[-1])]), width)
+
+
+def mask_shape(path: str) -> Tuple[int, int]:
+    """(height, width) of a mask file; compact files only read their header."""
+    if is_compact_mask(path):
+        return read_header(path)[1]
+    return load_mask(path).shape
+
+
+def find_mask(directory: str, name: str) -> Optional[str]:
+    """Path of the mask called ``name`` in ``directory`` in any supported format, preferring ``MASK_FORMAT``."""
+    for suffix in dict.fromkeys([mask_suffix()] + MASK_SUFFIXES):
+        path = os.path.join(directory, name + suffix)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def list_masks(directory: str) -> List[str]:
+    """One mask path per name in ``directory``, sorted by file name, preferring ``MASK_FORMAT``."""
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f"Folder not found: {directory}")
+    preferred = mask_suffix()
+    rank = {suffix: i for i, suffix in enumerate([preferred] + [x for x in MASK_SUFFIXES if x != preferred])}
+    best = {}
+    for name in os.listdir(directory):
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        if ext in rank and (stem not in best or rank[ext] < rank[best[stem][1]]):
+            best[stem] = (name, ext)
+    return [os.path.join(directory, name).replace(os.sep, "/") for name, _ in sorted(best.values())]
+
+
+# === conversion ===
+
+def convert_mask(src: str, fmt: str, output_dir: Optional[str] = None) -> str:
+    """Re-encode one mask file as ``fmt``; returns the new path."""
+    stem = os.path.splitext(os.path.basename(src))[0]
+    dst = os.path.join(output_dir or os.path.dirname(src), stem + mask_suffix(fmt))
+    mask = load_mask(src)
+    tmp = f"{dst}.{os.getpid()}.tmp{mask_suffix(fmt)}"
+    save_mask(tmp, mask, fmt)
+    os.replace(tmp, dst)
+    return dst
+
+
+def convert_directory(source: str, fmt: str, output_dir: Optional[str] = None, remove: bool = False) -> List[Tuple[str, str, int, int]]:
+    """Convert every mask in ``source`` that is not already ``fmt``.
+
+    Returns ``(src, dst, src_bytes, dst_bytes)`` per converted file.
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    converted = []
+    for name in sorted(os.listdir(source)):
+        src = os.path.join(source, name)
+        if not os.path.isfile(src) or not name.lower().endswith(tuple(MASK_SUFFIXES)) or mask_format_of(src) == fmt:
+            continue
+        src_bytes = os.path.getsize(src)
+        dst = convert_mask(src, fmt, output_dir)
+        converted.append((src, dst, src_bytes, os.path.getsize(dst)))
+        if remove:
+            os.remove(src)
+    return converted
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Convert mask files between PNG, packbits and RLE")
+    parser.add_argument("source", help="mask directory")
+    parser.add_argument("--to", dest="fmt", default="rle", choices=list(FORMAT_SUFFIXES))
+    parser.add_argument("--output-dir", default=None, help="defaults to the source directory")
+    parser.add_argument("--remove", action="store_true", help="delete each source file after converting it")
+    args = parser.parse_args(argv)
+
+    converted = convert_directory(args.source, args.fmt, args.output_dir, args.remove)
+    before = sum(c[2] for c in converted)
+    after = sum(c[3] for c in converted)
+    print(f"✅ converted {len(converted)} masks to {args.fmt}")
+    if converted:
+        print(f"📦 {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB ({after / max(before, 1):.0%} of the original size)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
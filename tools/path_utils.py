@@ -1,6 +1,7 @@
 from pathlib import Path
 from typing import List, Tuple
 import re
+from tools.mask_format import list_masks
 
 def list_image_paths(folder: str, suffixes: List[str] = [".jpg", ".png", ".jpeg"]) -> List[str]:
     """Generic function returning image paths within a folder (POSIX style)."""
@@ -37,13 +38,15 @@ def generate_segment_plan_from_paths(image_paths: list) -> list:
 
 def get_comparison_image_pairs() -> List[Tuple[str, str]]:
     """Pair GT and predicted mask paths from data/Test_images_GT and outputs/masks.
+    Predicted masks may be PNG or compact ``tools.mask_format`` files; read
+    them with ``tools.mask_format.load_mask``.
     Returns a list of tuples ``(gt_path, pred_path)``."""
     gt_paths = list_image_paths("data/Test_images_GT", suffixes=[".png"])
-    pred_paths = list_image_paths("outputs/masks", suffixes=[".png"])
+    pred_paths = list_masks("outputs/masks")
 
-    # pair by file name
-    gt_dict = {Path(p).name: p for p in gt_paths}
-    pred_dict = {Path(p).name: p for p in pred_paths}
+    # pair by image name
+    gt_dict = {Path(p).stem: p for p in gt_paths}
+    pred_dict = {Path(p).stem: p for p in pred_paths}
 
     pairs = []
     for name in gt_dict:
@@ -0,0 +1,119 @@
+"""Vectorized overlay rendering.
+
+Point markers are expanded to their disk footprint with array offsets and
+written with one fancy-indexing assignment; vector fields are drawn with
+one batched ``cv2.polylines`` call. Colors are painted (or alpha blended)
+only at the covered pixels, in one pass.
+
+    base = to_bgr(image)
+    layers = render_layers(base, {
+        "skeleton": lambda img: draw_points(img, points, (0, 0, 255)),
+        "normals": lambda img: draw_vectors(img, points, normals, scale=10),
+    })
+"""
+from typing import Callable, Dict, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+Color = Tuple[int, int, int]
+
+
+def to_bgr(image: np.ndarray) -> np.ndarray:
+    """Return a 3-channel BGR copy of a grayscale or BGR image."""
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image.copy()
+
+
+def _disk_offsets(radius: int) -> np.ndarray:
+    # same footprint as cv2.circle(..., thickness=-1), so the union matches per-point drawing
+    kernel = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=np.uint8)
+    cv2.circle(kernel, (radius, radius), radius, 1, thickness=-1)
+    return np.argwhere(kernel)[:, ::-1] - radius  # [dx, dy]
+
+
+def point_pixels(shape: Sequence[int], points: np.ndarray, radius: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Unique ``(rows, cols)`` covered by filled disks around ``points`` given as [x, y].
+
+    Cost scales with the number of points, not the image size.
+    """
+    height, width = shape[:2]
+    pts = np.asarray(points).reshape(-1, 2).astype(np.intp)
+    if radius > 0:
+        pts = (pts[:, None, :] + _disk_offsets(radius)[None]).reshape(-1, 2)
+    inside = (pts[:, 0] >= 0) & (pts[:, 0] < width) & (pts[:, 1] >= 0) & (pts[:, 1] < height)
+    flat = np.unique(pts[inside, 1] * width + pts[inside, 0])
+    return np.divmod(flat, width)
+
+
+def points_mask(shape: Sequence[int], points: np.ndarray, radius: int = 1) -> np.ndarray:
+    """Boolean (H, W) mask of filled disks around ``points`` given as [x, y]."""
+    mask = np.zeros(tuple(shape[:2]), dtype=bool)
+    mask[point_pixels(shape, points, radius)] = True
+    return mask
+
+
+def paint(image: np.ndarray, where, color: Color, alpha: float = 1.0) -> np.ndarray:
+    """Set (or blend by ``alpha``) ``color`` into ``image`` at ``where``, in place.
+
+    ``where`` is a boolean (H, W) mask or a ``(rows, cols)`` index pair.
+    """
+    if alpha >= 1.0:
+        image[where] = color
+    elif alpha > 0.0:
+        pixels = image[where].astype(np.float32)
+        blended = pixels * (1 - alpha) + np.asarray(color, dtype=np.float32) * alpha
+        image[where] = np.clip(np.rint(blended), 0, 255).astype(image.dtype)
+    return image
+
+
+def draw_points(image: np.ndarray, points: np.ndarray, color: Color, radius: int = 1, alpha: float = 1.0) -> np.ndarray:
+    """Draw filled disks at ``points`` ([x, y]) in place."""
+    return paint(image, point_pixels(image.shape, points, radius), color, alpha)
+
+
+def arrow_polylines(origins: np.ndarray, vectors: np.ndarray, scale: float = 1.0, tip_length: float = 0.3) -> np.ndarray:
+    """(N, 5, 2) int32 polylines tracing shaft and head of each arrow.
+
+    Endpoints and heads follow ``cv2.arrowedLine``: the tip is truncated to
+    integer pixels and both barbs sit at 45 degrees to the shaft.
+    """
+    start = np.asarray(origins).astype(np.int64)
+    end = (start + np.asarray(vectors, dtype=np.float64) * scale).astype(np.int64)
+    delta = (start - end).astype(np.float64)
+    tip_size = np.hypot(delta[:, 0], delta[:, 1]) * tip_length
+    angle = np.arctan2(delta[:, 1], delta[:, 0])
+    barbs = [
+        np.rint(end + tip_size[:, None] * np.stack([np.cos(angle + s), np.sin(angle + s)], axis=1)).astype(np.int64)
+        for s in (np.pi / 4, -np.pi / 4)
+    ]
+    # start -> tip -> barb -> tip -> barb: one polyline per arrow
+    return np.stack([start, end, barbs[0], end, barbs[1]], axis=1).astype(np.int32)
+
+
+def draw_vectors(
+    image: np.ndarray,
+    origins: np.ndarray,
+    vectors: np.ndarray,
+    scale: float = 10,
+    color: Color = (0, 255, 0),
+    step: int = 1,
+    tip_length: float = 0.3,
+    thickness: int = 1
+) -> np.ndarray:
+    """Draw every ``step``-th vector as an arrow in one ``cv2.polylines`` call, in place."""
+    origins, vectors = np.asarray(origins)[::step], np.asarray(vectors)[::step]
+    if len(origins):
+        cv2.polylines(image, arrow_polylines(origins, vectors, scale, tip_length), False, color, thickness)
+    return image
+
+
+def blend(base: np.ndarray, overlay: np.ndarray, alpha: float) -> np.ndarray:
+    """``base * (1 - alpha) + overlay * alpha`` in a single pass."""
+    return cv2.addWeighted(base, 1 - alpha, overlay, alpha, 0)
+
+
+def render_layers(base: np.ndarray, layers: Dict[str, Callable[[np.ndarray], np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Render each layer onto its own copy of one decoded ``base`` image."""
+    return {name: draw(base.copy()) for name, draw in layers.items()}
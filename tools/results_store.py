@@ -0,0 +1,279 @@
+import atexit
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+PREDICTED_METRICS_CSV = "outputs/csv/predicted_metrics.csv"
+# minimum seconds between CSV exports triggered by single upserts
+EXPORT_INTERVAL = float(os.getenv("CRACK_RESULTS_EXPORT_INTERVAL", 5.0))
+
+# per-thread list of captured upserts, see ``capture_upserts``
+_capture = threading.local()
+
+
+class ResultsStore:
+    """Per-image metric rows with upsert semantics, backed by SQLite.
+
+    Rows are buffered in memory and written in one transaction on ``flush``.
+    Outside a ``batch()`` block every upsert is written to SQLite at once,
+    but the CSV is re-exported at most every ``EXPORT_INTERVAL`` seconds;
+    pending rows reach the CSV on ``flush()``, on ``sync_csv`` (call it
+    before reading the CSV in-process) and at interpreter exit. Inside a
+    batch the CSV is exported once on exit.
+
+    The exported CSV keeps ``Image`` as the first column followed by metric
+    columns in first-seen order; re-upserting an image replaces its row and
+    moves it to the end.
+
+    The CSV stays the user-facing copy: the store remembers the CSV it last
+    exported, and if the file was edited since, its rows replace the
+    database on open; if it was deleted, the database is cleared.
+
+    Args:
+        db_path: SQLite file holding the rows.
+        csv_path: optional CSV kept in sync by ``export_csv``. If the database
+            is new and the CSV already exists, its rows are imported.
+    """
+
+    def __init__(self, db_path: str, csv_path: Optional[str] = None):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self._buffer: Dict[str, Dict[str, Any]] = {}
+        self._batch_depth = 0
+        self._export_on_exit = True
+        self._dirty = False
+        self._last_export = 0.0
+        self._lock = threading.RLock()
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        is_new = not os.path.exists(db_path)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (image TEXT PRIMARY KEY, seq INTEGER, data TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS columns (name TEXT PRIMARY KEY, position INTEGER)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+        if csv_path:
+            self._sync_from_csv(is_new)
+
+    def _sync_from_csv(self, is_new: bool):
+        """Pick up a CSV that was created, edited or deleted outside the store."""
+        exists = os.path.exists(self.csv_path)
+        if is_new:
+            if exists:
+                self._import_csv(self.csv_path)
+            return
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'csv_stamp'").fetchone()
+        if row is None or (exists and _file_stamp(self.csv_path) == row[0]):
+            return
+        print(f"♻️ {self.csv_path} {'changed' if exists else 'was removed'} outside the results store; "
+              f"{'re-importing it' if exists else 'clearing stored rows'}")
+        with self._conn:
+            self._conn.execute("DELETE FROM results")
+            self._conn.execute("DELETE FROM columns")
+            self._conn.execute("DELETE FROM meta WHERE key = 'csv_stamp'")
+        if exists:
+            self._import_csv(self.csv_path)
+
+    def _import_csv(self, csv_path: str):
+        import pandas as pd
+
+        df = pd.read_csv(csv_path)
+        if "Image" not in df.columns:
+            return
+        for row in df.to_dict(orient="records"):
+            image = str(row.pop("Image"))
+            self._buffer[image] = {k: v for k, v in row.items() if not pd.isna(v)}
+        self._write_buffer()
+
+    # === writes ===
+
+    def upsert(self, image_name: str, values: Dict[str, Any]):
+        """Insert or replace the row for ``image_name``."""
+        captured = getattr(_capture, "rows", None)
+        if captured is not None and self.csv_path:
+            captured.append((self.csv_path, image_name, dict(values)))
+            return
+        with self._lock:
+            self._buffer.pop(image_name, None)
+            self._buffer[image_name] = dict(values)
+            if self._batch_depth == 0:
+                self._write_buffer()
+                if time.monotonic() - self._last_export >= EXPORT_INTERVAL:
+                    self.flush()
+
+    def upsert_many(self, rows: Dict[str, Dict[str, Any]]):
+        with self.batch():
+            for image_name, values in rows.items():
+                self.upsert(image_name, values)
+
+    def _write_buffer(self):
+        if not self._buffer:
+            return
+        with self._conn:
+            seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM results").fetchone()[0]
+            position = self._conn.execute("SELECT COALESCE(MAX(position), 0) FROM columns").fetchone()[0]
+            known = {r[0] for r in self._conn.execute("SELECT name FROM columns")}
+            for image_name, values in self._buffer.items():
+                seq += 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (image, seq, data) VALUES (?, ?, ?)",
+                    (image_name, seq, json.dumps(values, ensure_ascii=False))
+                )
+                for col in values:
+                    if col not in known:
+                        position += 1
+                        known.add(col)
+                        self._conn.execute("INSERT OR IGNORE INTO columns (name, position) VALUES (?, ?)", (col, position))
+        self._buffer.clear()
+        self._dirty = True
+
+    def flush(self, export: bool = True):
+        """Write buffered rows in one transaction and export the CSV if configured."""
+        with self._lock:
+            self._write_buffer()
+            if export and self._dirty and self.csv_path:
+                self.export_csv()
+
+    @contextmanager
+    def batch(self, export: bool = True):
+        """Defer flushing until the outermost batch exits.
+
+        ``export=False`` writes rows to SQLite but leaves the CSV export to
+        the caller, e.g. when several worker processes share one store.
+        """
+        with self._lock:
+            if self._batch_depth == 0:
+                self._export_on_exit = export
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush(export=self._export_on_exit)
+
+    # === reads ===
+
+    def columns(self) -> List[str]:
+        return [r[0] for r in self._conn.execute("SELECT name FROM columns ORDER BY position")]
+
+    def get(self, image_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if image_name in self._buffer:
+                return dict(self._buffer[image_name])
+        row = self._conn.execute("SELECT data FROM results WHERE image = ?", (image_name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def has(self, image_name: str) -> bool:
+        return self.get(image_name) is not None
+
+    def images(self) -> List[str]:
+        return [r[0] for r in self._conn.execute("SELECT image FROM results ORDER BY seq")]
+
+    def export_csv(self, csv_path: Optional[str] = None) -> str:
+        """Write all rows to CSV with ``Image`` first; returns the path."""
+        csv_path = csv_path or self.csv_path
+        if not csv_path:
+            raise ValueError("No CSV path configured for export")
+        with self._lock:
+            self._write_buffer()
+            columns = self.columns()
+            if os.path.dirname(csv_path):
+                os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+            tmp_path = csv_path + ".tmp"
+            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Image"] + columns)
+                for image_name, data in self._conn.execute("SELECT image, data FROM results ORDER BY seq"):
+                    values = json.loads(data)
+                    writer.writerow([image_name] + [values.get(c, "") for c in columns])
+            os.replace(tmp_path, csv_path)
+            if csv_path == self.csv_path:
+                self._dirty = False
+                self._last_export = time.monotonic()
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_stamp', ?)",
+                                       (_file_stamp(csv_path),))
+        return csv_path
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+def _file_stamp(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+_stores: Dict[str, ResultsStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_results_store(csv_path: str = PREDICTED_METRICS_CSV) -> ResultsStore:
+    """Return the process-wide store that backs ``csv_path`` (``<csv>.sqlite``)."""
+    key = os.path.abspath(csv_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ResultsStore(os.path.splitext(csv_path)[0] + ".sqlite", csv_path=csv_path)
+            _stores[key] = store
+        return store
+
+
+def sync_csv(csv_path: str = PREDICTED_METRICS_CSV):
+    """Export rows still pending for ``csv_path`` in this process, if a store backs it."""
+    store = _stores.get(os.path.abspath(csv_path))
+    if store is not None:
+        store.flush()
+
+
+@atexit.register
+def _flush_all():
+    for store in list(_stores.values()):
+        try:
+            store.flush()
+        except Exception as e:
+            print(f"[ERROR] exporting {store.csv_path} failed: {e}")
+
+
+def reset_results_stores():
+    """Forget cached stores without closing them.
+
+    Meant for freshly forked worker processes, which must open their own
+    SQLite connections instead of reusing the parent's.
+    """
+    global _stores_lock
+    _stores.clear()
+    _stores_lock = threading.Lock()
+
+
+@contextmanager
+def capture_upserts():
+    """Collect upserts made on this thread instead of applying them.
+
+    Yields a list of ``(csv_path, image_name, values)`` that ``apply_upserts``
+    replays later, possibly in another process. Concurrent callers use it to
+    write rows in a fixed order rather than in completion order.
+    """
+    previous = getattr(_capture, "rows", None)
+    _capture.rows = rows = []
+    try:
+        yield rows
+    finally:
+        _capture.rows = previous
+
+
+def apply_upserts(rows):
+    """Replay rows collected by ``capture_upserts`` on this process's stores."""
+    for csv_path, image_name, values in rows:
+        get_results_store(csv_path).upsert(image_name, values)
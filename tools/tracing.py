@@ -0,0 +1,217 @@
+"""Lightweight span-based timing for tools and their internal stages.
+
+    with span("segment.forward", batch=8):
+        ...
+
+    @traced("quantify.csv_write")
+    def write(...): ...
+
+Each finished span is added to in-process per-stage duration samples
+(exported as a Prometheus textfile with p50/p95 by ``write_prometheus``) and
+handed to every active ``collect_spans()`` block so callers can attach
+timings to result records. Span names follow ``<component>.<stage>``.
+
+Set ``CRACK_TRACING=0`` to turn spans into no-ops. Raw spans are only logged
+when ``CRACK_TRACE_FILE`` names a JSON-lines file (e.g.
+``outputs/traces/spans.jsonl``); it is rotated to ``<file>.1`` once it
+exceeds ``CRACK_TRACE_MAX_BYTES``.
+
+Spans follow ``contextvars``, which new threads do not inherit: work handed
+to a thread pool only joins the caller's trace and ``collect_spans`` blocks
+when submitted through ``in_context``. Spans of other threads still reach
+the stage summary and the trace file.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence
+
+TRACING_ENABLED = os.getenv("CRACK_TRACING", "1") != "0"
+TRACE_FILE = os.getenv("CRACK_TRACE_FILE", "")
+TRACE_MAX_BYTES = int(os.getenv("CRACK_TRACE_MAX_BYTES", 64 * 1024 * 1024))
+METRICS_FILE = os.getenv("CRACK_TRACE_METRICS", os.path.join("outputs", "traces", "stages.prom"))
+MAX_SAMPLES = 10000  # per stage, for the percentile summary
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_collectors = contextvars.ContextVar("span_collectors", default=())
+_samples: Dict[str, deque] = {}
+_totals: Dict[str, List[float]] = {}  # name -> [count, sum_seconds]
+_lock = threading.Lock()
+_trace_fh = None
+
+
+def _write_trace(record: Dict):
+    global _trace_fh
+    if not TRACE_FILE:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _lock:
+        if _trace_fh is None or _trace_fh.closed:
+            if os.path.dirname(TRACE_FILE):
+                os.makedirs(os.path.dirname(TRACE_FILE), exist_ok=True)
+            # line-buffered append: whole lines from several processes do not interleave
+            _trace_fh = open(TRACE_FILE, "a", encoding="utf-8", buffering=1)
+        _trace_fh.write(line)
+        if TRACE_MAX_BYTES and _trace_fh.tell() > TRACE_MAX_BYTES:
+            # keep one previous file; other processes move over when they reopen
+            _trace_fh.close()
+            try:
+                os.replace(TRACE_FILE, TRACE_FILE + ".1")
+            except FileNotFoundError:
+                pass  # another process rotated it first
+
+
+def record_spans(spans: Iterable[Dict]):
+    """Add finished spans (e.g. returned by a worker process) to the stage summary."""
+    with _lock:
+        for s in spans:
+            seconds = s["duration_ms"] / 1000
+            _samples.setdefault(s["name"], deque(maxlen=MAX_SAMPLES)).append(seconds)
+            total = _totals.setdefault(s["name"], [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the enclosed block as stage ``name``; yields the span record (or ``None`` if disabled)."""
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    parent = _current_span.get()
+    record = {
+        "name": name,
+        "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex[:16],
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent["span_id"] if parent else None,
+        "start": time.time(),
+        "duration_ms": None,
+        "pid": os.getpid(),
+        "thread": threading.current_thread().name,
+        "attrs": attrs,
+    }
+    token = _current_span.set(record)
+    t0 = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        _current_span.reset(token)
+        record_spans([record])
+        for collector in _collectors.get():
+            collector.append(record)
+        _write_trace(record)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator form of ``span``; defaults to the function's qualified name."""
+    def decorator(fn):
+        stage = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def in_context(fn, detached: bool = False):
+    """Wrap ``fn`` so that, run on another thread, it records spans under the caller's current span.
+
+    Spans join the caller's trace and its ``collect_spans`` blocks. With
+    ``detached=True``, for work that may outlive the caller (e.g. a
+    background write), they keep the trace link but skip the caller's
+    collectors, which may already be closed.
+    """
+    ctx = contextvars.copy_context()
+    if detached:
+        ctx.run(_collectors.set, ())
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)  # a context can only be entered by one thread at a time
+    return wrapper
+
+
+@contextmanager
+def collect_spans():
+    """Collect every span finished inside the block (in this context) into a list."""
+    spans: List[Dict] = []
+    token = _collectors.set(_collectors.get() + (spans,))
+    try:
+        yield spans
+    finally:
+        _collectors.reset(token)
+
+
+def summarize_spans(spans: Iterable[Dict]) -> Dict[str, float]:
+    """Total milliseconds per stage name, for attaching to result records."""
+    timings: Dict[str, float] = {}
+    for s in spans:
+        timings[s["name"]] = round(timings.get(s["name"], 0.0) + s["duration_ms"], 3)
+    return timings
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def stage_summary() -> Dict[str, Dict[str, float]]:
+    """Count, total, p50 and p95 seconds per stage seen by this process."""
+    with _lock:
+        snapshot = {name: (sorted(samples), tuple(_totals[name])) for name, samples in _samples.items()}
+    summary = {}
+    for name, (values, (count, total)) in sorted(snapshot.items()):
+        summary[name] = {"count": int(count), "sum": total, "p50": _percentile(values, 50), "p95": _percentile(values, 95)}
+    return summary
+
+
+def write_prometheus(path: Optional[str] = None) -> Optional[str]:
+    """Write the stage summary in Prometheus textfile-collector format; returns the path."""
+    path = path or METRICS_FILE
+    if not path or not TRACING_ENABLED:
+        return None
+    lines = [
+        "# HELP crack_stage_duration_seconds Duration of traced pipeline stages.",
+        "# TYPE crack_stage_duration_seconds summary",
+    ]
+    for name, s in stage_summary().items():
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'crack_stage_duration_seconds{{stage="{label}",quantile="0.5"}} {s["p50"]:.6f}')
+        lines.append(f'crack_stage_duration_seconds{{stage="{label}",quantile="0.95"}} {s["p95"]:.6f}')
+        lines.append(f'crack_stage_duration_seconds_sum{{stage="{label}"}} {s["sum"]:.6f}')
+        lines.append(f'crack_stage_duration_seconds_count{{stage="{label}"}} {s["count"]}')
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+def reset_tracing():
+    """Drop collected samples; for freshly forked workers and tests."""
+    global _trace_fh, _lock
+    _lock = threading.Lock()
+    _samples.clear()
+    _totals.clear()
+    _trace_fh = None
@@ -2,6 +2,7 @@ import os
 import cv2
 import matplotlib.pyplot as plt
 from typing import Optional
+from tools.mask_format import load_mask
 
 
 def visualize_result(
@@ -35,7 +36,7 @@ def visualize_result(
         visual_items.append(("original", image))
 
     if mask_path:
-        mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+        mask = load_mask(mask_path, threshold=0)
         if overlay and image_path:
             overlay_img = image.copy()
             overlay_img[mask > 0] = [255, 0, 0]  # red overlay